@@ -0,0 +1,310 @@
+import os
+import sys
+import json
+import shutil
+import argparse
+import platform
+import subprocess
+from datetime import datetime
+
+import cv2
+import numpy as np
+import sklearn
+
+from benchmarks.synthetic import generate_dataset
+from src.preprocessing.cleaning import clean_dataset
+from src.preprocessing.crop import crop_images
+from src.preprocessing.resize import resize_images
+from src.preprocessing.grayscale import convert_to_grayscale
+from src.preprocessing.enhancement import enhance_images
+from src.preprocessing.pipeline import run_preprocessing
+from src.analysis.features_spatial import extract_spatial_features
+from src.analysis.features_fft import extract_frequency_features
+from src.analysis.features_lbp import extract_lbp_features
+from src.analysis.features import extract_features
+from src.analysis.pca import run_pca
+from src.models.classifier import train_and_evaluate_models
+from src.utils.instrumentation import RunReport
+
+SCALES = (1000, 10000, 100000)
+DATA_DIR = "benchmarks/.data"
+WORK_DIR = "benchmarks/.work"
+
+# Tolerancia por defecto: más de 15% más lento que el baseline = regresión
+TOLERANCE = 0.15
+
+
+# =====================================
+# BENCHMARKS
+# =====================================
+# Cada benchmark recibe ctx (dict con rutas y workers) y corre la función real
+# del pipeline sin caché, para medir siempre el trabajo completo.
+
+def _path(ctx, name):
+    return os.path.join(ctx["work"], name)
+
+
+def _bench_clean(ctx):
+    clean_dataset(ctx["raw"], _path(ctx, "clean"), n_workers=ctx["workers"], use_cache=False)
+
+
+def _bench_crop(ctx):
+    crop_images(_path(ctx, "clean"), _path(ctx, "cropped"), n_workers=ctx["workers"], use_cache=False)
+
+
+def _bench_resize(ctx):
+    resize_images(_path(ctx, "cropped"), _path(ctx, "resized"), n_workers=ctx["workers"], use_cache=False)
+
+
+def _bench_grayscale(ctx):
+    convert_to_grayscale(_path(ctx, "resized"), _path(ctx, "grayscale"),
+                         n_workers=ctx["workers"], use_cache=False)
+
+
+def _bench_enhance(ctx):
+    enhance_images(_path(ctx, "grayscale"), _path(ctx, "enhanced_stages"),
+                   n_workers=ctx["workers"], use_cache=False)
+
+
+def _bench_fused(ctx):
+    run_preprocessing(ctx["raw"], _path(ctx, "enhanced"), n_workers=ctx["workers"], use_cache=False)
+
+
+def _bench_spatial(ctx):
+    extract_spatial_features(_path(ctx, "enhanced"), _path(ctx, "features_spatial.csv"),
+                             n_workers=ctx["workers"])
+
+
+def _bench_fft(ctx):
+    extract_frequency_features(_path(ctx, "enhanced"), _path(ctx, "features_frequency.csv"),
+                               n_workers=ctx["workers"])
+
+
+def _bench_lbp(ctx):
+    extract_lbp_features(_path(ctx, "enhanced"), _path(ctx, "features_lbp.csv"),
+                         n_workers=ctx["workers"])
+
+
+def _bench_features(ctx):
+    extract_features(_path(ctx, "enhanced"), _path(ctx, "store"), n_workers=ctx["workers"], use_cache=False)
+
+
+def _bench_pca(ctx):
+    run_pca(_path(ctx, "store"), _path(ctx, "figures/"))
+
+
+def _bench_training(ctx):
+    # Caché de modelos vacía: se mide el entrenamiento, no la carga del disco
+    cache_dir = _path(ctx, "models_cache")
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    train_and_evaluate_models(_path(ctx, "store"), _path(ctx, "tables/"), _path(ctx, "figures/"),
+                              bundle_path=_path(ctx, "model_bundle.joblib"),
+                              n_jobs=ctx["workers"], models_cache_dir=cache_dir)
+
+
+# nombre → (función, benchmark que debe haber corrido antes o None).
+# El orden es el orden de ejecución.
+BENCHMARKS = {
+    "clean_dataset": (_bench_clean, None),
+    "crop_images": (_bench_crop, "clean_dataset"),
+    "resize_images": (_bench_resize, "crop_images"),
+    "convert_to_grayscale": (_bench_grayscale, "resize_images"),
+    "enhance_images": (_bench_enhance, "convert_to_grayscale"),
+    "run_preprocessing": (_bench_fused, None),
+    "extract_spatial_features": (_bench_spatial, "run_preprocessing"),
+    "extract_frequency_features": (_bench_fft, "run_preprocessing"),
+    "extract_lbp_features": (_bench_lbp, "run_preprocessing"),
+    "extract_features": (_bench_features, "run_preprocessing"),
+    "run_pca": (_bench_pca, "extract_features"),
+    "train_and_evaluate_models": (_bench_training, "extract_features"),
+}
+
+
+def _ensure(name, ctx, done):
+    """Corre (sin medir) los benchmarks previos que generan las entradas de name."""
+    required = BENCHMARKS[name][1]
+    if required is None or required in done:
+        return
+    _ensure(required, ctx, done)
+    print(f"⚙ Preparing inputs: {required}")
+    BENCHMARKS[required][0](ctx)
+    done.add(required)
+
+
+def run_suite(scales=SCALES, workers=(1,), names=None, resolution=(640, 480), repeat=1,
+              seed=0, data_dir=DATA_DIR, work_dir=WORK_DIR):
+    """
+    Corre los benchmarks para cada escala (número de imágenes) y cantidad de workers.
+    Cada medición se repite `repeat` veces y se guarda la más rápida.
+    Retorna una lista de resultados (un dict por benchmark/escala/workers).
+    """
+    names = list(names or BENCHMARKS)
+    results = []
+
+    for n_images in scales:
+        raw = os.path.join(data_dir, f"syn_{n_images}_{resolution[0]}x{resolution[1]}_s{seed}")
+        generate_dataset(raw, n_images, resolution, seed)
+
+        for n_workers in workers:
+            work = os.path.join(work_dir, f"{n_images}_w{n_workers}")
+            shutil.rmtree(work, ignore_errors=True)
+            ctx = {"raw": raw, "work": work, "workers": n_workers}
+            done = set()
+
+            for name in BENCHMARKS:
+                if name not in names:
+                    continue
+
+                _ensure(name, ctx, done)
+
+                best = None
+                for _ in range(repeat):
+                    report = RunReport(os.path.join(work, "reports"))
+                    with report.stage(name):
+                        BENCHMARKS[name][0](ctx)
+                    summary = report.stages[0].summary()
+                    if best is None or summary["wall_s"] < best["wall_s"]:
+                        best = summary
+
+                done.add(name)
+                results.append({
+                    "benchmark": name,
+                    "n_images": n_images,
+                    "workers": n_workers,
+                    "resolution": f"{resolution[0]}x{resolution[1]}",
+                    **{k: v for k, v in best.items() if k != "stage"},
+                })
+
+    return results
+
+
+# =====================================
+# BASELINES
+# =====================================
+
+def _git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True)
+        return out.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def environment():
+    """Datos de la máquina y versiones: un baseline solo es comparable en el mismo entorno."""
+    return {
+        "date": datetime.now().isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "scikit-learn": sklearn.__version__,
+    }
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"✔ Benchmark results saved in: {path}")
+
+
+def _key(row):
+    return row["benchmark"], row["n_images"], row["workers"], row["resolution"]
+
+
+def compare(results, baseline_path, tolerance=TOLERANCE):
+    """
+    Compara wall time contra un baseline guardado.
+    Imprime una tabla y retorna la lista de regresiones (más lento que 1 + tolerance).
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {_key(row): row for row in json.load(f)["results"]}
+
+    regressions = []
+    print(f"\n📊 Comparison against {baseline_path} (tolerance {tolerance:.0%})\n")
+    print(f"{'benchmark':<28}{'images':>8}{'workers':>8}{'base_s':>10}{'now_s':>10}{'ratio':>8}")
+
+    for row in results:
+        base = baseline.get(_key(row))
+        if base is None:
+            print(f"{row['benchmark']:<28}{row['n_images']:>8}{row['workers']:>8}{'-':>10}"
+                  f"{row['wall_s']:>10.2f}{'new':>8}")
+            continue
+
+        ratio = row["wall_s"] / base["wall_s"] if base["wall_s"] > 0 else float("inf")
+        flag = ""
+        if ratio > 1 + tolerance:
+            flag = "  ⚠ REGRESSION"
+            regressions.append({**row, "baseline_wall_s": base["wall_s"], "ratio": ratio})
+        elif ratio < 1 - tolerance:
+            flag = "  ✔ faster"
+
+        print(f"{row['benchmark']:<28}{row['n_images']:>8}{row['workers']:>8}"
+              f"{base['wall_s']:>10.2f}{row['wall_s']:>10.2f}{ratio:>8.2f}{flag}")
+
+    return regressions
+
+
+# =====================================
+# CLI
+# =====================================
+
+def _int_list(text):
+    return tuple(int(x) for x in text.split(",") if x)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pipeline on synthetic camera-trap datasets.")
+    parser.add_argument("--scales", type=_int_list, default=SCALES, help="Dataset sizes, e.g. 1000,10000")
+    parser.add_argument("--workers", type=_int_list, default=(1, os.cpu_count() or 1),
+                        help="Worker counts, e.g. 1,4,8")
+    parser.add_argument("--only", default=None,
+                        help=f"Comma-separated benchmarks (default: all). Available: {', '.join(BENCHMARKS)}")
+    parser.add_argument("--resolution", default="640x480", help="Synthetic image size WxH")
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per measurement (the fastest is kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results (default: benchmarks/results/<date>.json)")
+    parser.add_argument("--baseline", default=None, help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--data-dir", default=DATA_DIR)
+    parser.add_argument("--work-dir", default=WORK_DIR)
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else None
+    unknown = [name for name in names or [] if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    resolution = tuple(int(x) for x in args.resolution.lower().split("x"))
+    workers = tuple(dict.fromkeys(args.workers))
+
+    print(f"\n⏱ Starting BENCHMARKS | Scales: {args.scales} | Workers: {workers} | {args.resolution}\n")
+
+    results = run_suite(args.scales, workers, names, resolution, args.repeat,
+                        args.seed, args.data_dir, args.work_dir)
+
+    output = args.output or os.path.join("benchmarks/results", datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    save_results(results, output)
+
+    if args.save_baseline:
+        if not args.baseline:
+            parser.error("--save-baseline requires --baseline")
+        save_results(results, args.baseline)
+        return 0
+
+    if args.baseline:
+        regressions = compare(results, args.baseline, args.tolerance)
+        if regressions:
+            print(f"\n⚠ {len(regressions)} regression(s) found\n")
+            return 1
+        print("\n✔ No regressions\n")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+import numpy as np
+from sklearn.datasets import make_classification
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import accuracy_score, f1_score, log_loss
+from sklearn.svm import SVC
+
+from benchmarks.run import save_results
+from src.models.kernel_approx import ApproxKernelSVM
+
+SIZES = (2000, 10000, 50000)
+
+# Más filas que esto y SVC exacto tarda demasiado: se salta
+MAX_EXACT_ROWS = 20000
+
+# nombre → función que crea el modelo (todos reciben X escalado, como en train_and_evaluate_models)
+MODELS = {
+    "svc_exact": lambda: SVC(kernel="rbf", random_state=42),
+    "svc_exact_proba": lambda: SVC(kernel="rbf", probability=True, random_state=42),
+    "nystroem_sgd": lambda: ApproxKernelSVM("nystroem", solver="sgd"),
+    "rff_sgd": lambda: ApproxKernelSVM("rff", solver="sgd"),
+    "nystroem_lbfgs": lambda: ApproxKernelSVM("nystroem", solver="lbfgs"),
+}
+
+
+def feature_dataset(n_rows, n_features=60, n_classes=8, seed=0, store=None):
+    """
+    Tabla de features para el benchmark: la del feature store (muestreada/repetida
+    hasta n_rows) o una sintética con la forma de la real (60 features, 8 especies).
+    """
+    if store:
+        from src.analysis.feature_store import load_buffer, feature_columns
+        features = load_buffer(store, columns=feature_columns(store))
+        rng = np.random.default_rng(seed)
+        idx = rng.choice(len(features), n_rows, replace=n_rows > len(features))
+        return features.values[idx], features.species[idx]
+
+    return make_classification(n_samples=n_rows, n_features=n_features, n_informative=n_features // 2,
+                               n_redundant=n_features // 4, n_classes=n_classes, n_clusters_per_class=2,
+                               class_sep=1.0, random_state=seed)
+
+
+def bench_model(name, X_train, y_train, X_test, y_test):
+    model = MODELS[name]()
+
+    start = time.perf_counter()
+    model.fit(X_train, y_train)
+    fit_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    preds = model.predict(X_test)
+    predict_s = time.perf_counter() - start
+
+    row = {
+        "model": name,
+        "fit_s": fit_s,
+        "predict_s": predict_s,
+        "accuracy": accuracy_score(y_test, preds),
+        "f1_weighted": f1_score(y_test, preds, average="weighted"),
+        "log_loss": None,
+    }
+    if hasattr(model, "predict_proba") and getattr(model, "probability", True):
+        row["log_loss"] = log_loss(y_test, model.predict_proba(X_test), labels=model.classes_)
+    return row
+
+
+def run_suite(sizes=SIZES, names=None, max_exact_rows=MAX_EXACT_ROWS, seed=0, store=None):
+    """SVC exacto vs ApproxKernelSVM a varios tamaños (train 75% / test 25%, estratificado)."""
+    names = list(names or MODELS)
+    results = []
+
+    for n_rows in sizes:
+        X, y = feature_dataset(n_rows, seed=seed, store=store)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.25,
+                                                            random_state=seed, stratify=y)
+        scaler = StandardScaler().fit(X_train)
+        X_train, X_test = scaler.transform(X_train), scaler.transform(X_test)
+
+        for name in names:
+            if name.startswith("svc_exact") and len(y_train) > max_exact_rows:
+                print(f"⏭ {name} skipped at {n_rows} rows (> {max_exact_rows} train rows)")
+                continue
+            row = {"n_rows": n_rows, **bench_model(name, X_train, y_train, X_test, y_test)}
+            results.append(row)
+            log_loss_text = f"{row['log_loss']:.3f}" if row["log_loss"] is not None else "-"
+            print(f"{name:<18}{n_rows:>8}{row['fit_s']:>10.2f}{row['predict_s']:>10.2f}"
+                  f"{row['accuracy']:>10.3f}{row['f1_weighted']:>10.3f}{log_loss_text:>10}")
+
+    return results
+
+
+def _int_list(text):
+    return tuple(int(x) for x in text.split(",") if x)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exact SVC vs approximate kernel SVM: accuracy and time.")
+    parser.add_argument("--sizes", type=_int_list, default=SIZES, help="Rows per run, e.g. 2000,10000")
+    parser.add_argument("--only", default=None,
+                        help=f"Comma-separated models (default: all). Available: {', '.join(MODELS)}")
+    parser.add_argument("--max-exact-rows", type=int, default=MAX_EXACT_ROWS,
+                        help="Skip the exact SVC above this many training rows")
+    parser.add_argument("--store", default=None,
+                        help="Use a feature store / CSV instead of synthetic features (rows are resampled)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=None, help="JSON results (default: benchmarks/results/svm_<date>.json)")
+    args = parser.parse_args(argv)
+
+    names = args.only.split(",") if args.only else None
+    unknown = [name for name in names or [] if name not in MODELS]
+    if unknown:
+        parser.error(f"unknown model(s): {', '.join(unknown)}")
+
+    print(f"\n⏱ SVM BENCHMARK | Sizes: {args.sizes}\n")
+    print(f"{'model':<18}{'rows':>8}{'fit_s':>10}{'pred_s':>10}{'acc':>10}{'f1':>10}{'logloss':>10}")
+
+    results = run_suite(args.sizes, names, args.max_exact_rows, args.seed, args.store)
+
+    output = args.output or os.path.join("benchmarks/results",
+                                         "svm_" + datetime.now().strftime("%Y%m%d_%H%M%S") + ".json")
+    save_results(results, output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
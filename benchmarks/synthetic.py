@@ -0,0 +1,122 @@
+import os
+import cv2
+import numpy as np
+
+from src.utils.parallel import parallel_map, resolve_workers
+
+# Especies sintéticas: (nombre, tamaño relativo del animal, textura)
+SPECIES = (
+    ("antelope_duiker", 0.18, 6),
+    ("bird", 0.07, 3),
+    ("blank", 0.0, 0),
+    ("civet_genet", 0.12, 9),
+    ("hog", 0.20, 4),
+    ("leopard", 0.16, 14),
+    ("monkey_prosimian", 0.10, 7),
+    ("rodent", 0.06, 5),
+)
+
+# Fracción de archivos dañados / demasiado pequeños (ejercitan la limpieza)
+CORRUPT_RATIO = 0.01
+TINY_RATIO = 0.01
+
+
+def _seed(seed, species_idx, i):
+    return (seed * 1_000_003 + species_idx * 100_003 + i) % (2 ** 32)
+
+
+def synthetic_image(rng, size=(640, 480), animal_scale=0.15, texture=6):
+    """
+    Imagen parecida a una de cámara trampa:
+    fondo con gradiente (cielo/suelo) + ruido de vegetación, algunas fotos nocturnas
+    en grises (IR), un "animal" elíptico con textura y la franja negra inferior
+    con el timestamp (la que elimina el recorte del 10%).
+    """
+    w, h = size
+    night = rng.random() < 0.3
+
+    top = rng.integers(90, 200, 3)
+    bottom = rng.integers(20, 110, 3)
+    t = np.linspace(0, 1, h, dtype=np.float32)[:, None, None]
+    img = top * (1 - t) + bottom * t
+    img = np.broadcast_to(img, (h, w, 3)).astype(np.float32)
+
+    # Vegetación: ruido a baja resolución escalado
+    noise = rng.normal(0, 25, (h // 16 + 1, w // 16 + 1)).astype(np.float32)
+    noise = cv2.resize(noise, (w, h), interpolation=cv2.INTER_CUBIC)
+    img = img + noise[..., None] * np.array([0.6, 1.0, 0.7], np.float32)
+    img = img + rng.normal(0, 6, (h, w, 3)).astype(np.float32)
+
+    if animal_scale > 0:
+        cx, cy = int(rng.integers(w // 5, 4 * w // 5)), int(rng.integers(h // 3, 4 * h // 5))
+        axes = (max(2, int(w * animal_scale)), max(2, int(h * animal_scale * 0.6)))
+        mask = np.zeros((h, w), np.uint8)
+        cv2.ellipse(mask, (cx, cy), axes, float(rng.uniform(-20, 20)), 0, 360, 255, -1)
+
+        color = rng.integers(30, 160, 3).astype(np.float32)
+        yy, xx = np.mgrid[0:h, 0:w]
+        stripes = 25 * np.sin((xx + yy * 0.5) * (texture / max(axes[0], 1)))
+        animal = color[None, None, :] + stripes[..., None]
+        img = np.where(mask[..., None] > 0, animal, img)
+
+    if night:
+        gray = cv2.cvtColor(np.clip(img, 0, 255).astype(np.uint8), cv2.COLOR_BGR2GRAY)
+        img = cv2.cvtColor(gray, cv2.COLOR_GRAY2BGR).astype(np.float32) * 0.6
+
+    img = np.clip(img, 0, 255).astype(np.uint8)
+
+    # Franja del timestamp
+    bar = max(1, int(h * 0.06))
+    img[h - bar:] = 0
+    cv2.putText(img, f"2024-{rng.integers(1, 13):02d}-{rng.integers(1, 29):02d} 0{rng.integers(0, 10)}:00",
+                (10, h - bar // 4), cv2.FONT_HERSHEY_SIMPLEX, bar / 40, (255, 255, 255), 1)
+
+    return img
+
+
+def _generate_one(task):
+    path, species_idx, i, size, seed = task
+    rng = np.random.default_rng(_seed(seed, species_idx, i))
+    _, scale, texture = SPECIES[species_idx]
+
+    kind = rng.random()
+    if kind < CORRUPT_RATIO:
+        with open(path, "wb") as f:
+            f.write(b"\xff\xd8\xff\xe0 not a jpeg")
+        return
+
+    img = synthetic_image(rng, size, scale, texture)
+    if kind < CORRUPT_RATIO + TINY_RATIO:
+        img = cv2.resize(img, (120, 90))
+
+    cv2.imwrite(path, img, [cv2.IMWRITE_JPEG_QUALITY, 90])
+
+
+def generate_dataset(output_dir, n_images, size=(640, 480), seed=0, n_workers=None):
+    """
+    Genera un dataset sintético (una carpeta por especie, mismo formato que
+    Data/raw/train_features) de forma determinística: mismo seed → mismos archivos.
+    Si la carpeta ya tiene el dataset completo, no se regenera.
+    """
+    tasks = []
+    for i in range(n_images):
+        species_idx = i % len(SPECIES)
+        species = SPECIES[species_idx][0]
+        path = os.path.join(output_dir, species, f"SYN{i:07d}.jpg")
+        tasks.append((path, species_idx, i, tuple(size), seed))
+
+    done_marker = os.path.join(output_dir, ".complete")
+    if os.path.exists(done_marker):
+        return output_dir
+
+    for species, _, _ in SPECIES:
+        os.makedirs(os.path.join(output_dir, species), exist_ok=True)
+
+    print(f"🧪 Generating {n_images} synthetic images {size[0]}x{size[1]} "
+          f"in {output_dir} | Workers: {resolve_workers(n_workers)}")
+    parallel_map(_generate_one, tasks, n_workers)
+
+    with open(done_marker, "w") as f:
+        f.write(f"{n_images} {size} {seed}\n")
+
+    return output_dir
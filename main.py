@@ -4,32 +4,12 @@ import os
 # Añadir ruta raíz del proyecto al PYTHONPATH
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-# ===== IMPORTS DEL PIPELINE =====
-
-# --- Preprocessing ---
-from src.preprocessing.cleaning import clean_dataset
-from src.preprocessing.crop import crop_images
-from src.preprocessing.resize import resize_images
-from src.preprocessing.grayscale import convert_to_grayscale
-from src.preprocessing.enhancement import enhance_images
-
-# --- Feature extraction ---
-from src.analysis.features_spatial import extract_spatial_features
-from src.analysis.features_fft import extract_frequency_features
-from src.analysis.features_lbp import extract_lbp_features
-
-# --- Stats / correlación ---
-from src.analysis.stats import (
-    load_all_features,
-    compute_statistics,
-    compute_correlations
-)
-
-# --- PCA ---
-from src.analysis.pca import run_pca
-
-# --- CLASSIFICATION + VISUALIZATIONS ---
-from src.models.classifier import train_and_evaluate_models
+# ===== ETAPAS DEL PIPELINE =====
+# Cada etapa importa sus módulos recién cuando se ejecuta (ver wildlife/stages.py),
+# así matplotlib, sklearn, skimage, etc. solo se cargan si su etapa está activada.
+# El mismo pipeline se puede correr por línea de comandos:
+#     python -m wildlife run --stages preprocessing,features
+from wildlife.stages import PipelineContext, run_pipeline
 
 
 def main():
@@ -39,96 +19,107 @@ def main():
     # ==================================
 
     # --- PREPROCESSING (solo si necesitas rehacer todo) ---
-    RUN_CLEANING = True
-    RUN_CROP = True
-    RUN_RESIZE = True
-    RUN_GRAYSCALE = True
-    RUN_ENHANCEMENT = True
+    # FUSED: decodifica cada imagen una sola vez y hace las 5 etapas en memoria.
+    # Si está en False se usan las etapas separadas (RUN_CLEANING ... RUN_ENHANCEMENT).
+    RUN_FUSED_PREPROCESSING = True
+    SAVE_INTERMEDIATES = False   # guardar clean/cropped/resized/grayscale (debug)
+    # Salida del preprocesamiento fusionado: "files" (un JPG por imagen), "tensors"
+    # (shards .npy con memmap, sin decodificar en la extracción) o "both"
+    PREPROCESSED_FORMAT = "files"
+
+    RUN_CLEANING = False
+    RUN_CROP = False
+    RUN_RESIZE = False
+    RUN_CROP_RESIZE = False      # crop + resize juntos (decodificación reducida); reemplaza 2) y 3)
+    RUN_GRAYSCALE = False
+    RUN_ENHANCEMENT = False
 
     # --- FEATURE EXTRACTION (se dejan en False si ya están hechos) ---
-    RUN_FEATURE_SPATIAL = True
-    RUN_FEATURE_FFT = True
-    RUN_FEATURE_LBP = True
+    # Una sola pasada: cada imagen se lee una vez para spatial + FFT + LBP
+    RUN_FEATURES = True
+    # Features por tiles multi-escala sobre la imagen recortada a resolución completa
+    # (animales chicos como rodent/bird); reemplaza la extracción sobre 256x256
+    TILED_FEATURES = False
+
+    # Extractores por separado (un CSV cada uno + merge en load_all_features)
+    RUN_FEATURE_SPATIAL = False
+    RUN_FEATURE_FFT = False
+    RUN_FEATURE_LBP = False
 
     # --- ANALYSIS (estadísticas + correlación) ---
     RUN_STATS = True
     RUN_CORR = True
+    # Streaming: estadísticas/correlación con momentos acumulados (solo lee lo nuevo del store)
+    STATS_STREAMING = False
 
     # --- PCA ---
     RUN_PCA = True
+    # Streaming: scaler + IncrementalPCA por bloques (para tablas que no entran en memoria)
+    PCA_STREAMING = False
 
     # --- CLASSIFICATION + MODEL PLOTS ---
     RUN_CLASSIFICATION = True   
-
-    # ==================================
-    #             RUTAS
-    # ==================================
-
-    raw_data_path = "Data/raw/train_features"
-    clean_path = "Data/processed/clean"
-    cropped_path = "Data/processed/cropped"
-    resized_path = "Data/processed/resized"
-    grayscale_path = "Data/processed/grayscale"
-    enhanced_path = "Data/processed/enhanced"
+    # Búsqueda de hiperparámetros (successive halving + StratifiedKFold) antes de entrenar;
+    # leaderboard en Results/tables/model_search_leaderboard.csv
+    MODEL_SEARCH = False
+    # SVM: "exact" (SVC), "approx" (Nyström + regresión logística, escala a todo el dataset)
+    # o "auto" (approx desde 30k filas de train)
+    SVM_MODE = "auto"
+
+    # --- FIGURAS ---
+    # "deferred": las etapas solo guardan los datos de cada figura (Results/figures/specs/)
+    #             y se dibujan al final en paralelo (RUN_FIGURES)
+    # "inline":   se dibujan en cada etapa | "off": solo métricas, sin figuras
+    FIGURES = "deferred"
+    RUN_FIGURES = True
+
+    # --- PARALELISMO (None = todos los núcleos, 1 = secuencial) ---
+    N_WORKERS = None
+
+    # --- CACHÉ: solo procesar imágenes nuevas/modificadas (o si cambian parámetros) ---
+    USE_CACHE = True
+
+    # --- REPORTE DE LA CORRIDA (Results/run_reports/run_<fecha>.json/.csv) ---
+    # Profilers por etapa, p. ej. {"features": "cprofile"} o {"pca": "pyinstrument"}
+    PROFILE_STAGES = {}
 
     # ==================================
     #               PIPELINE
     # ==================================
-
-    # --- 1) CLEANING ---
-    if RUN_CLEANING:
-        clean_dataset(raw_data_path, clean_path)
-
-    # --- 2) CROPPING ---
-    if RUN_CROP:
-        crop_images(clean_path, cropped_path)
-
-    # --- 3) RESIZE ---
-    if RUN_RESIZE:
-        resize_images(cropped_path, resized_path, size=(256, 256))
-
-    # --- 4) GRAYSCALE ---
-    if RUN_GRAYSCALE:
-        convert_to_grayscale(resized_path, grayscale_path)
-
-    # --- 5) ENHANCEMENT ---
-    if RUN_ENHANCEMENT:
-        enhance_images(grayscale_path, enhanced_path)
-
-    # --- 6) SPATIAL FEATURES ---
-    if RUN_FEATURE_SPATIAL:
-        extract_spatial_features(enhanced_path)
-
-    # --- 7) FFT FEATURES ---
-    if RUN_FEATURE_FFT:
-        extract_frequency_features(enhanced_path)
-
-    # --- 8) LBP FEATURES ---
-    if RUN_FEATURE_LBP:
-        extract_lbp_features(enhanced_path)
-
-    # ==================================
-    #   UNIR FEATURES PARA ANALYSIS / PCA / CLASSIFICATION
-    # ==================================
-
-    if RUN_STATS or RUN_CORR or RUN_PCA or RUN_CLASSIFICATION:
-        df_all = load_all_features()
-
-    # --- 9) DESCRIPTIVE STATISTICS ---
-    if RUN_STATS:
-        compute_statistics(df_all)
-
-    # --- 10) CORRELATION MATRIX ---
-    if RUN_CORR:
-        compute_correlations(df_all)
-
-    # --- 11) PCA ---
-    if RUN_PCA:
-        run_pca()
-
-    # --- 12) CLASSIFICATION + PLOTS ---
-    if RUN_CLASSIFICATION:
-        train_and_evaluate_models()
+    # Rutas: wildlife.stages.PATHS (Data/raw/train_features, Data/processed/..., Data/features/...)
+
+    switches = {
+        # 0) FUSED PREPROCESSING (1-5 en una sola pasada)
+        "preprocessing": RUN_FUSED_PREPROCESSING,
+        "cleaning": RUN_CLEANING,
+        "crop": RUN_CROP,
+        "resize": RUN_RESIZE,
+        "crop_resize": RUN_CROP_RESIZE,
+        "grayscale": RUN_GRAYSCALE,
+        "enhancement": RUN_ENHANCEMENT,
+        # 6-8) ALL FEATURES (single pass)
+        "features": RUN_FEATURES and not TILED_FEATURES,
+        "features_tiled": RUN_FEATURES and TILED_FEATURES,
+        "features_spatial": RUN_FEATURE_SPATIAL,
+        "features_fft": RUN_FEATURE_FFT,
+        "features_lbp": RUN_FEATURE_LBP,
+        # 9-12) ANALYSIS / PCA / CLASSIFICATION
+        "stats": RUN_STATS,
+        "correlation": RUN_CORR,
+        "pca": RUN_PCA,
+        "classification": RUN_CLASSIFICATION,
+        "figures": RUN_FIGURES,
+    }
+
+    ctx = PipelineContext([name for name, enabled in switches.items() if enabled],
+                          n_workers=N_WORKERS, use_cache=USE_CACHE,
+                          preprocessed_format=PREPROCESSED_FORMAT,
+                          save_intermediates=SAVE_INTERMEDIATES,
+                          stats_streaming=STATS_STREAMING, pca_streaming=PCA_STREAMING,
+                          figures=FIGURES, model_search=MODEL_SEARCH,
+                          svm_mode=SVM_MODE, tiled=TILED_FEATURES)
+
+    run_pipeline(ctx, profile=PROFILE_STAGES)
 
 
 # ==================================
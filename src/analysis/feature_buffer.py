@@ -0,0 +1,237 @@
+import sys
+import numpy as np
+import pandas as pd
+
+# Capacidad inicial (filas) de un buffer; al llenarse se duplica
+INITIAL_CAPACITY = 1024
+
+
+class FeatureBuffer:
+    """
+    Tabla de features compacta, en columnas float32 preasignadas que crecen al agregar filas:
+    - values: array (capacidad, n_columnas) en orden Fortran → cada columna es contigua,
+      y values[:n] es la matriz X que usan PCA/estadísticas/entrenamiento sin convertir
+    - species: código entero por fila (int32) + lista de nombres (species_names)
+    - filenames: strings internados (sys.intern), sin un dict por fila
+    Ocupa la mitad que el camino float64 (dicts → DataFrame → CSV → float64).
+    """
+
+    def __init__(self, columns, capacity=INITIAL_CAPACITY):
+        self.columns = list(columns)
+        self._index = {col: j for j, col in enumerate(self.columns)}
+        self._values = np.empty((max(1, capacity), len(self.columns)), dtype=np.float32, order="F")
+        self._codes = np.empty(max(1, capacity), dtype=np.int32)
+        self.species_names = []
+        self._species_codes = {}
+        self.filenames = []
+        self.n = 0
+
+    def __len__(self):
+        return self.n
+
+    # =====================================
+    # CRECIMIENTO
+    # =====================================
+
+    def _reserve(self, n_rows):
+        """Se asegura de que entren n_rows filas más (duplicando la capacidad si hace falta)."""
+        needed = self.n + n_rows
+        capacity = len(self._codes)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+
+        values = np.empty((capacity, len(self.columns)), dtype=np.float32, order="F")
+        values[:self.n] = self._values[:self.n]
+        codes = np.empty(capacity, dtype=np.int32)
+        codes[:self.n] = self._codes[:self.n]
+        self._values, self._codes = values, codes
+
+    def species_code(self, species):
+        """Código entero de una especie (se agrega si es nueva)."""
+        code = self._species_codes.get(species)
+        if code is None:
+            code = self._species_codes[species] = len(self.species_names)
+            self.species_names.append(species)
+        return code
+
+    # =====================================
+    # ESCRITURA
+    # =====================================
+
+    def append_block(self, filenames, species, columns):
+        """
+        Agrega varias filas de una vez. columns es dict columna → array de largo len(filenames)
+        (lo que retorna un extractor por lote); se escribe directo en el buffer.
+        Columnas que no vienen quedan en NaN.
+        """
+        n_rows = len(filenames)
+        self._reserve(n_rows)
+        start, stop = self.n, self.n + n_rows
+
+        if len(columns) < len(self.columns):
+            self._values[start:stop] = np.nan
+        for col, arr in columns.items():
+            self._values[start:stop, self._index[col]] = arr
+
+        if isinstance(species, str):
+            self._codes[start:stop] = self.species_code(species)
+        else:
+            self._codes[start:stop] = [self.species_code(sp) for sp in species]
+        self.filenames.extend(sys.intern(str(name)) for name in filenames)
+        self.n = stop
+        return start
+
+    def append(self, filename, species, values):
+        """Agrega una fila (values: dict columna → valor)."""
+        return self.append_block([filename], species, {col: [v] for col, v in values.items()})
+
+    def set_rows(self, rows, columns):
+        """Escribe columnas (dict columna → array) en filas ya agregadas (índices o slice)."""
+        for col, arr in columns.items():
+            self._values[rows, self._index[col]] = arr
+
+    def indices(self, columns):
+        """Posición de cada columna en values."""
+        return [self._index[col] for col in columns]
+
+    def extend(self, other):
+        """Agrega todas las filas de otro buffer (columnas por nombre, especies recodificadas)."""
+        if not len(other):
+            return
+        self._reserve(len(other))
+        start, stop = self.n, self.n + len(other)
+
+        if other.columns == self.columns:
+            self._values[start:stop] = other.values
+        else:
+            self._values[start:stop] = np.nan
+            for j, col in enumerate(other.columns):
+                self._values[start:stop, self._index[col]] = other.values[:, j]
+
+        mapping = np.array([self.species_code(sp) for sp in other.species_names], dtype=np.int32)
+        self._codes[start:stop] = mapping[other.codes] if len(mapping) else 0
+        self.filenames.extend(other.filenames)
+        self.n = stop
+
+    # =====================================
+    # LECTURA
+    # =====================================
+
+    @property
+    def values(self):
+        """Matriz (n, columnas) float32; vista del buffer, sin copiar."""
+        return self._values[:self.n]
+
+    X = values
+
+    @property
+    def codes(self):
+        return self._codes[:self.n]
+
+    @property
+    def species(self):
+        """Especie de cada fila como array de strings (para reportes y etiquetas)."""
+        return np.asarray(self.species_names, dtype=str)[self.codes] if self.n else np.array([], dtype=str)
+
+    def column(self, name):
+        return self._values[:self.n, self._index[name]]
+
+    def select(self, columns):
+        """Matriz con esas columnas (vista si son todas, si no una copia float32)."""
+        if list(columns) == self.columns:
+            return self.values
+        return self.values[:, self.indices(columns)]
+
+    def take(self, rows):
+        """Nuevo buffer con las filas indicadas (índices o máscara)."""
+        rows = np.arange(self.n)[rows] if np.asarray(rows).dtype == bool else np.asarray(rows, dtype=np.int64)
+        out = FeatureBuffer(self.columns, capacity=len(rows))
+        out._values[:len(rows)] = self.values[rows]
+        out._codes[:len(rows)] = self.codes[rows]
+        out.species_names = list(self.species_names)
+        out._species_codes = dict(self._species_codes)
+        out.filenames = [self.filenames[i] for i in rows]
+        out.n = len(rows)
+        return out
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes + self.codes.nbytes
+
+    # =====================================
+    # CONVERSIONES
+    # =====================================
+
+    def to_frame(self):
+        """DataFrame filename, species (categórica), features float32 (CSV y compatibilidad)."""
+        df = pd.DataFrame(self.values, columns=self.columns, copy=False)
+        df.insert(0, "species", pd.Categorical.from_codes(self.codes, self.species_names))
+        df.insert(0, "filename", self.filenames)
+        return df
+
+    def to_arrow(self):
+        """Tabla Arrow con el mismo esquema que el feature store (float32 + species dictionary)."""
+        import pyarrow as pa
+
+        arrays = {
+            "filename": pa.array(self.filenames, type=pa.string()),
+            "species": pa.DictionaryArray.from_arrays(pa.array(self.codes, type=pa.int32()),
+                                                      pa.array(self.species_names, type=pa.string())),
+        }
+        for j, col in enumerate(self.columns):
+            arrays[col] = pa.array(self._values[:self.n, j], type=pa.float32())
+        return pa.table(arrays)
+
+    @classmethod
+    def from_frame(cls, df, columns=None):
+        """Buffer a partir de un DataFrame (filename opcional, species, features)."""
+        if columns is None:
+            columns = [col for col in df.select_dtypes(include=[np.number]).columns]
+        buffer = cls(columns, capacity=len(df))
+        filenames = df["filename"].astype(str).tolist() if "filename" in df.columns else [""] * len(df)
+        buffer.append_block(filenames, df["species"].astype(str).tolist(),
+                            {col: df[col].to_numpy(dtype=np.float32) for col in columns})
+        return buffer
+
+    @classmethod
+    def from_rows(cls, rows, columns):
+        """Buffer a partir de dicts de features (p. ej. compute_features en inferencia)."""
+        buffer = cls(columns, capacity=len(rows))
+        buffer.append_block([row.get("filename", "") for row in rows],
+                            [str(row.get("species", "")) for row in rows],
+                            {col: np.array([row[col] for row in rows], dtype=np.float32) for col in columns})
+        return buffer
+
+    @classmethod
+    def from_table(cls, table, columns=None):
+        """
+        Buffer a partir de una tabla Arrow del feature store, columna por columna
+        (float32 → buffer sin pasar por pandas; species como códigos del diccionario).
+        """
+        import pyarrow as pa
+
+        names = [name for name in table.column_names if name not in ("filename", "species")]
+        columns = list(columns) if columns is not None else names
+        buffer = cls(columns, capacity=table.num_rows)
+        n = table.num_rows
+
+        for j, col in enumerate(columns):
+            buffer._values[:n, j] = table.column(col).to_numpy()
+
+        species = table.column("species")
+        if not pa.types.is_dictionary(species.type):
+            species = species.dictionary_encode()
+        species = species.unify_dictionaries().combine_chunks() if species.num_chunks > 1 else species.chunk(0)
+        dictionary = [str(name) for name in species.dictionary.to_pylist()]
+        for name in dictionary:
+            buffer.species_code(name)
+        buffer._codes[:n] = species.indices.to_numpy(zero_copy_only=False)
+
+        if "filename" in table.column_names:
+            buffer.filenames = [sys.intern(name) for name in table.column("filename").to_pylist()]
+        else:
+            buffer.filenames = [""] * n
+        buffer.n = n
+        return buffer
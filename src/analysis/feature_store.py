@@ -0,0 +1,190 @@
+import os
+import re
+import glob
+import uuid
+import shutil
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from src.analysis.feature_buffer import FeatureBuffer
+
+# Carpeta por defecto del feature store (Parquet particionado por especie)
+DEFAULT_STORE = "Data/features/store"
+
+# Filas por bloque al recorrer el store sin cargarlo entero
+BATCH_ROWS = 65536
+
+ID_COLUMNS = ["filename", "species"]
+
+# part-<secuencia>-<token>-<i>.parquet: la secuencia ordena los archivos según las escrituras
+PART_PATTERN = re.compile(r"part-(\d{6})-")
+
+
+def _to_table(df):
+    """
+    Convierte el DataFrame de features a una tabla Arrow tipada:
+    - features numéricas → float32
+    - species → categórica (dictionary)
+    - filename → string
+    Un FeatureBuffer ya tiene ese esquema y se convierte columna por columna.
+    """
+    if isinstance(df, FeatureBuffer):
+        return df.to_arrow()
+
+    arrays = {
+        "filename": pa.array(df["filename"].astype(str), type=pa.string()),
+        "species": pa.array(df["species"].astype(str)).dictionary_encode(),
+    }
+
+    for col in df.columns:
+        if col in ID_COLUMNS:
+            continue
+        arrays[col] = pa.array(np.asarray(df[col], dtype=np.float32), type=pa.float32())
+
+    return pa.table(arrays)
+
+
+def write_features(df, store_path=DEFAULT_STORE, append=False):
+    """
+    Guarda features (DataFrame o FeatureBuffer) en el store (Parquet particionado por especie: species=<nombre>/part-*.parquet).
+    - append=False reemplaza el contenido anterior del store
+    - append=True agrega un nuevo archivo por especie sin tocar lo existente
+    """
+    if not append and os.path.exists(store_path):
+        shutil.rmtree(store_path)
+
+    os.makedirs(store_path, exist_ok=True)
+
+    if len(df) == 0:
+        return
+
+    # Nombre único por escritura → los appends nunca pisan archivos anteriores;
+    # la secuencia deja los archivos (y el recorrido por bloques) en el orden de escritura
+    token = uuid.uuid4().hex[:12]
+    pq.write_to_dataset(
+        _to_table(df),
+        root_path=store_path,
+        partition_cols=["species"],
+        basename_template=f"part-{_next_part(store_path):06d}-{token}-{{i}}.parquet",
+        existing_data_behavior="overwrite_or_ignore"
+    )
+
+
+def _next_part(store_path):
+    """Siguiente número de secuencia de los archivos del store."""
+    seqs = [int(m.group(1)) for path in glob.glob(os.path.join(store_path, "*", "part-*.parquet"))
+            if (m := PART_PATTERN.match(os.path.basename(path)))]
+    return max(seqs, default=-1) + 1
+
+
+def _sorted_rows(table):
+    """
+    Filas ordenadas por (species, filename): el orden depende solo del contenido, no de
+    los archivos del store (tras un append sería el orden de los part-*.parquet), así
+    train_test_split(random_state=...) da siempre el mismo split. Es el mismo orden
+    que list_images (especies y archivos ordenados).
+    """
+    keys = pa.table({"species": table.column("species").cast(pa.string()),
+                     "filename": table.column("filename")})
+    order = pc.sort_indices(keys, sort_keys=[("species", "ascending"), ("filename", "ascending")])
+    return table.take(order)
+
+
+def _dataset(store_path):
+    # Archivos en orden de nombre (especie, secuencia) → recorrido por bloques reproducible
+    files = sorted(ds.dataset(store_path, format="parquet", partitioning="hive").files)
+    return ds.dataset(files, format="parquet", partitioning=ds.partitioning(flavor="hive"),
+                      partition_base_dir=store_path)
+
+
+def store_columns(store_path=DEFAULT_STORE):
+    """Nombres de las columnas de features del store (sin filename/species)."""
+    schema = pq.ParquetDataset(store_path).schema
+    return [name for name in schema.names if name not in ID_COLUMNS]
+
+
+def read_features(store_path=DEFAULT_STORE, columns=None, species=None):
+    """
+    Lee features del store (memory-mapped).
+    - columns: solo estas columnas + filename/species (proyección: las demás no se leen del disco)
+    - species: lista de especies a leer (filtro por partición)
+    species siempre se retorna como columna categórica.
+    Filas ordenadas por (species, filename) (ver _sorted_rows).
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ID_COLUMNS))
+
+    filters = [("species", "in", list(species))] if species is not None else None
+
+    table = pq.read_table(store_path, columns=columns, filters=filters, memory_map=True)
+    df = _sorted_rows(table).to_pandas()
+    df["species"] = df["species"].astype("category")
+
+    # Mismo orden que en el CSV: filename, species, features
+    ordered = [col for col in ID_COLUMNS if col in df.columns]
+    ordered += [col for col in df.columns if col not in ID_COLUMNS]
+    return df[ordered]
+
+
+def load_features(path=DEFAULT_STORE, columns=None):
+    """
+    Carga el dataset de features desde el store (carpeta Parquet) o desde un CSV.
+    Así las etapas de análisis aceptan cualquiera de los dos formatos.
+    """
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path)
+        if columns is not None:
+            df = df[list(dict.fromkeys(list(columns) + ["species"]))]
+        return df
+
+    return read_features(path, columns=columns)
+
+
+def load_buffer(path=DEFAULT_STORE, columns=None):
+    """
+    Igual que load_features pero en un FeatureBuffer: las columnas float32 del store
+    se copian directo al buffer (sin DataFrame) y species queda como códigos.
+    Con columns solo se leen esas features (+ species y filename).
+    Filas ordenadas por (species, filename) (ver _sorted_rows).
+    """
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path)
+        return FeatureBuffer.from_frame(df, columns)
+
+    read_columns = None if columns is None else list(dict.fromkeys(list(columns) + ID_COLUMNS))
+    table = pq.read_table(path, columns=read_columns, memory_map=True)
+    return FeatureBuffer.from_table(_sorted_rows(table), columns)
+
+
+def feature_columns(path=DEFAULT_STORE):
+    """Columnas de features (numéricas) de un store o CSV."""
+    if path.lower().endswith(".csv"):
+        df = pd.read_csv(path, nrows=5)
+        return list(df.select_dtypes(include=[np.number]).columns)
+
+    return store_columns(path)
+
+
+def iter_features(path=DEFAULT_STORE, columns=None, batch_size=BATCH_ROWS):
+    """
+    Recorre el store (o un CSV) en bloques de a lo sumo batch_size filas,
+    sin cargar todo en memoria. Cada bloque es un DataFrame con las columnas
+    pedidas + species (como string).
+    """
+    if columns is not None:
+        columns = list(dict.fromkeys(list(columns) + ["species"]))
+
+    if path.lower().endswith(".csv"):
+        yield from pd.read_csv(path, usecols=columns, chunksize=batch_size)
+        return
+
+    for batch in _dataset(path).to_batches(columns=columns, batch_size=batch_size):
+        if batch.num_rows == 0:
+            continue
+        df = batch.to_pandas()
+        df["species"] = df["species"].astype(str)
+        yield df
@@ -0,0 +1,309 @@
+import os
+import cv2
+import numpy as np
+
+from src.analysis.features_spatial import spatial_features, spatial_features_batch, SPATIAL_PARAMS
+from src.analysis.features_fft import frequency_features, frequency_features_batch, FFT_PARAMS
+from src.analysis.features_lbp import lbp_features, lbp_features_batch, LBP_PARAMS
+from src.analysis.feature_buffer import FeatureBuffer
+from src.analysis.feature_store import DEFAULT_STORE, write_features, load_buffer
+from src.utils.cache import StageCache, params_key, hash_bytes
+from src.utils.imageio import read_bytes, decode_image
+from src.utils.instrumentation import count
+from src.utils.prefetch import io_pipeline
+from src.utils.parallel import list_images, parallel_map, resolve_workers
+from src.utils.tensor_store import is_tensor_store, open_tensor_store
+
+# Extractores disponibles: nombre → (función(img_gris) -> dict de features, parámetros,
+#                                    función por lote o None).
+# La función por lote recibe un array (N, h, w) y retorna dict columna → array de largo N.
+# Deben ser funciones de módulo para poder enviarse a los workers.
+# Los parámetros se usan como llave de la caché: si cambian, ese extractor se recalcula.
+EXTRACTORS = {
+    "spatial": (spatial_features, SPATIAL_PARAMS, spatial_features_batch),
+    "frequency": (frequency_features, FFT_PARAMS, frequency_features_batch),
+    "lbp": (lbp_features, LBP_PARAMS, lbp_features_batch),
+}
+
+DEFAULT_EXTRACTORS = ("spatial", "frequency", "lbp")
+
+# Imágenes por lote enviado a cada worker
+BATCH_SIZE = 64
+
+
+def register_extractor(name, func, params=None, batch_func=None):
+    """Agrega (o reemplaza) un extractor de features."""
+    EXTRACTORS[name] = (func, params or {}, batch_func)
+
+
+def _run_extractor(func, batch_func, imgs, block=None):
+    """
+    Corre un extractor sobre varias imágenes (dict idx → img).
+    Con función por lote, agrupa las imágenes por tamaño y procesa cada grupo de una vez.
+    block: las mismas imágenes ya apiladas en un array (N, h, w), p. ej. una vista
+    del tensor store; se usa tal cual, sin copiarlas con np.stack.
+    Retorna (idxs, dict columna → array float32 alineado con idxs).
+    """
+    if batch_func is None:
+        idxs = list(imgs)
+        rows = [func(imgs[i]) for i in idxs]
+        return idxs, {col: np.array([row[col] for row in rows], dtype=np.float32) for col in rows[0]}
+
+    if block is not None:
+        values = batch_func(block)
+        return sorted(imgs), {col: np.asarray(arr, dtype=np.float32) for col, arr in values.items()}
+
+    by_shape = {}
+    for i, img in imgs.items():
+        by_shape.setdefault(img.shape, []).append(i)
+
+    idxs, parts = [], []
+    for group in by_shape.values():
+        idxs += group
+        parts.append(batch_func(np.stack([imgs[i] for i in group])))
+
+    values = {col: np.concatenate([np.asarray(part[col], dtype=np.float32) for part in parts])
+              for col in parts[0]}
+    return idxs, values
+
+
+def compute_features(images, extractors=DEFAULT_EXTRACTORS):
+    """
+    Corre los extractores sobre imágenes ya decodificadas (lista de arrays en grises).
+    Retorna una lista con un dict de features por imagen (mismo orden).
+    Útil para inferencia, donde las imágenes no vienen de una carpeta.
+    """
+    imgs = dict(enumerate(images))
+    rows = [{} for _ in images]
+
+    for name in extractors:
+        func, _, batch_func = EXTRACTORS[name]
+        idxs, values = _run_extractor(func, batch_func, imgs)
+        for col, arr in values.items():
+            for j, i in enumerate(idxs):
+                rows[i][col] = arr[j]
+
+    return rows
+
+
+def _cached_columns(names, stale, known_columns):
+    # Columnas de los extractores vigentes (no stale), en el orden de los extractores
+    return [col for name in names if name not in stale for col in known_columns[name]]
+
+
+def _extract_batch(batch):
+    """
+    Worker: procesa un lote de imágenes.
+    Cada imagen se decodifica UNA vez y todos los extractores trabajan sobre ella
+    (los que tienen versión por lote procesan todo el lote junto).
+    Si el contenido no cambió (known_hash) solo corre los extractores pendientes
+    y reutiliza los valores cacheados del resto.
+    Las imágenes vienen de un archivo (source = ruta) o del tensor store
+    (source = (carpeta del store, posición, hash)); en ese caso no se decodifica nada:
+    se toman vistas del memmap y, si el lote es contiguo, todo el lote de una vez.
+    Los extractores escriben directo en un FeatureBuffer float32 del lote (sin un dict por fila).
+    Retorna (digests, ok por imagen, extractores calculados por imagen,
+             columnas por extractor, FeatureBuffer con las filas ok en orden).
+    """
+    extractors, tasks, known_columns = batch
+
+    # Los archivos del lote se leen por adelantado en hilos mientras se procesa
+    with io_pipeline([task[2] for task in tasks if isinstance(task[2], str)]):
+        return _extract_tasks(extractors, tasks, known_columns)
+
+
+def _extract_tasks(extractors, tasks, known_columns):
+    names = [name for name, _, _ in extractors]
+    digests, ok, stale_by_img, reused, imgs = [], [], [], [], {}
+
+    for i, (species, file, source, known_hash, stale, cached_values) in enumerate(tasks):
+        if isinstance(source, str):
+            data = read_bytes(source)
+            digest = hash_bytes(data)
+        else:
+            store_path, pos, digest = source
+            data = None
+        digests.append(digest)
+
+        reused.append(digest == known_hash)
+        if not reused[i]:
+            stale = names
+        stale_by_img.append(stale)
+        ok.append(True)
+
+        if stale:
+            if data is None:
+                img = open_tensor_store(store_path).image(pos)
+                count(images=1, bytes_read=img.nbytes)
+            else:
+                img = decode_image(data, cv2.IMREAD_GRAYSCALE)
+
+            if img is None:
+                ok[i] = False
+            else:
+                imgs[i] = img
+
+    # Lote completo y contiguo dentro de un shard del tensor store → una sola vista
+    block = None
+    sources = [task[2] for task in tasks]
+    if len(imgs) == len(tasks) and not any(isinstance(src, str) for src in sources):
+        store_path, first = sources[0][0], sources[0][1]
+        if all(src[0] == store_path and src[1] == first + j for j, src in enumerate(sources)):
+            block = open_tensor_store(store_path).block(first, first + len(tasks))
+
+    computed = {}
+    for name, func, batch_func in extractors:
+        pending = {i: img for i, img in imgs.items() if name in stale_by_img[i]}
+        if pending:
+            pending_block = block if len(pending) == len(tasks) else None
+            computed[name] = _run_extractor(func, batch_func, pending, pending_block)
+
+    columns_by_extractor = {name: list(values) for name, (_, values) in computed.items()}
+    columns = [col for name in names for col in columns_by_extractor.get(name, known_columns.get(name, []))]
+
+    # Filas del lote: primero los valores cacheados, después lo calculado (por columna)
+    valid = [i for i in range(len(tasks)) if ok[i]]
+    position = {i: j for j, i in enumerate(valid)}
+    buffer = FeatureBuffer(columns, capacity=len(valid))
+    buffer.append_block([tasks[i][1] for i in valid], [tasks[i][0] for i in valid], {})
+
+    for i in valid:
+        if reused[i]:
+            cached_columns = _cached_columns(names, stale_by_img[i], known_columns)
+            buffer.values[position[i], buffer.indices(cached_columns)] = tasks[i][5]
+
+    for idxs, values in computed.values():
+        buffer.set_rows([position[i] for i in idxs], values)
+
+    computed_by_img = [[name for name in computed if ok[i] and name in stale_by_img[i]]
+                       for i in range(len(tasks))]
+    return digests, ok, computed_by_img, columns_by_extractor, buffer
+
+
+def extract_features(input_dir, output_path=DEFAULT_STORE,
+                     extractors=DEFAULT_EXTRACTORS, n_workers=None, use_cache=True,
+                     batch_size=BATCH_SIZE):
+    """
+    Extracción de features en una sola pasada:
+    cada imagen se lee una vez y todos los extractores trabajan sobre el mismo array,
+    generando una sola fila por imagen (filename, species, features...).
+    Reemplaza correr extract_spatial/frequency/lbp por separado + load_all_features.
+
+    output_path puede ser el feature store (carpeta Parquet, por defecto) o un .csv.
+    input_dir puede ser una carpeta de imágenes (una subcarpeta por especie) o un
+    tensor store generado por run_preprocessing(output_format="tensors").
+
+    Con use_cache=True se reutilizan las filas de la corrida anterior: solo se calculan
+    las imágenes nuevas o modificadas, y los extractores cuyos parámetros cambiaron.
+    Si solo hay imágenes nuevas, al store se le agregan esas filas (append).
+    Las imágenes se envían a los workers en lotes de batch_size.
+    Retorna un FeatureBuffer (columnas float32, species como códigos).
+    """
+    funcs = tuple((name, EXTRACTORS[name][0], EXTRACTORS[name][2]) for name in extractors)
+    keys_by_extractor = {name: params_key(EXTRACTORS[name][1]) for name in extractors}
+    is_csv = output_path.lower().endswith(".csv")
+
+    print("\n🧩 Starting FEATURE EXTRACTION (single pass)...")
+    print(f"Input directory: {input_dir}")
+    print(f"Extractors: {', '.join(extractors)}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
+
+    manifest_path = os.path.splitext(output_path)[0] + ".manifest.json"
+    cache = StageCache(manifest_path, {"stage": "features"}, enabled=use_cache)
+    columns_by_extractor = cache.meta.setdefault("columns", {})
+
+    # Filas calculadas en la corrida anterior (buffer float32 + posición de cada imagen)
+    previous, previous_pos = None, {}
+    if use_cache and cache.entries and os.path.exists(output_path):
+        previous = load_buffer(output_path)
+        previous_pos = {f"{species}/{file}": pos for pos, (species, file)
+                        in enumerate(zip(previous.species, previous.filenames))}
+
+    if is_tensor_store(input_dir):
+        store = open_tensor_store(input_dir)
+        images = [(species, file, (input_dir, pos, digest)) for pos, (species, file, digest)
+                  in enumerate(zip(store.species, store.filenames, store.hashes))]
+    else:
+        images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
+
+    tasks = []
+    for key, (species, file, path) in zip(keys, images):
+        entry = cache.entry(key)
+        pos = previous_pos.get(key)
+
+        fresh = []
+        if entry is not None and pos is not None:
+            done = entry.get("extractors", {})
+            fresh = [name for name in extractors
+                     if done.get(name) == keys_by_extractor[name] and name in columns_by_extractor]
+
+        if fresh:
+            stale = [name for name in extractors if name not in fresh]
+            cached_cols = _cached_columns(extractors, stale, columns_by_extractor)
+            cached_values = previous.values[pos, previous.indices(cached_cols)]
+            tasks.append((species, file, path, entry["hash"], stale, cached_values))
+        else:
+            tasks.append((species, file, path, None, None, None))
+
+    known_columns = {name: columns_by_extractor[name] for name in extractors if name in columns_by_extractor}
+    batches = [(funcs, tasks[i:i + batch_size], known_columns) for i in range(0, len(tasks), batch_size)]
+    results = parallel_map(_extract_batch, batches, n_workers)
+
+    buffers = []
+    new_rows = []          # posición (en la tabla final) de las imágenes que no estaban antes
+    n_rows = 0
+    only_new = True        # True si todo lo anterior sigue igual (se puede hacer append)
+    for b, (digests, ok, computed, columns, buffer) in enumerate(results):
+        columns_by_extractor.update(columns)
+        buffers.append(buffer)
+
+        for j, digest in enumerate(digests):
+            key, task = keys[b * batch_size + j], tasks[b * batch_size + j]
+            if not ok[j]:
+                cache.record(key, digest, reason="Unreadable/Corrupted")
+                only_new = only_new and key not in previous_pos
+                continue
+
+            if task[3] == digest and not computed[j]:
+                cache.mark_cached()
+            elif key in previous_pos:
+                only_new = False
+            else:
+                new_rows.append(n_rows)
+
+            cache.record(key, digest, extractors=keys_by_extractor)
+            n_rows += 1
+
+    # Imágenes que desaparecieron del dataset → hay que reescribir
+    if len(previous_pos) + len(new_rows) != n_rows:
+        only_new = False
+
+    cache.save(keys)
+    print(cache.summary(len(images)))
+
+    # Mismo orden de columnas siempre: extractores en orden (filename y species aparte)
+    ordered_cols = []
+    for name in extractors:
+        ordered_cols += columns_by_extractor.get(name, [])
+
+    features = FeatureBuffer(ordered_cols, capacity=n_rows)
+    for buffer in buffers:
+        features.extend(buffer)
+
+    # Crear carpeta si no existe
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    if is_csv:
+        features.to_frame().to_csv(output_path, index=False)
+    elif previous_pos and only_new:
+        if new_rows:
+            write_features(features.take(new_rows), output_path, append=True)
+            print(f"Appended {len(new_rows)} new rows to the feature store")
+        else:
+            print("Feature store already up to date")
+    else:
+        write_features(features, output_path)
+
+    print(f"✔ All features saved in: {output_path}\n")
+    return features
@@ -1,63 +1,122 @@
 import os
 import cv2
 import numpy as np
+from functools import lru_cache
 import pandas as pd
+from operator import itemgetter
 
-def extract_frequency_features(input_dir, output_csv="Data/features/features_frequency.csv"):
-    data_list = []
-
-    print("\n📡 Starting FREQUENCY FEATURE EXTRACTION...\n")
-
-    for species in os.listdir(input_dir):
-        species_path = os.path.join(input_dir, species)
-        if not os.path.isdir(species_path):
-            continue
-
-        for file in os.listdir(species_path):
-            if not file.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
-
-            img_path = os.path.join(species_path, file)
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            if img is None:
-                continue
-
-            # FFT
-            f = np.fft.fft2(img)
-            fshift = np.fft.fftshift(f)
-            magnitude = np.abs(fshift)
-
-            spectral_energy = np.sum(magnitude ** 2)
-
-            h, w = img.shape
-            cy, cx = h // 2, w // 2
-            radius = min(cx, cy) // 4
-
-            y, x = np.ogrid[:h, :w]
-            dist = np.sqrt((x - cx)**2 + (y - cy)**2)
-            low_mask = dist <= radius
-            high_mask = dist > radius
-
-            low_freq_energy = np.sum(magnitude[low_mask] ** 2)
-            high_freq_energy = np.sum(magnitude[high_mask] ** 2)
-            high_low_ratio = high_freq_energy / (low_freq_energy + 1e-8)
-
-            # Dominant frequency
-            flat = magnitude.flatten()
-            idx_max = np.argmax(flat)
-            y_peak, x_peak = np.unravel_index(idx_max, magnitude.shape)
-            dist_peak = np.sqrt((x_peak - cx)**2 + (y_peak - cy)**2)
-            dominant_freq = dist_peak / np.sqrt(cx**2 + cy**2)
-
-            data_list.append({
-                "filename": file,
-                "species": species,
-                "spectral_energy": spectral_energy,
-                "low_freq_energy": low_freq_energy,
-                "high_freq_energy": high_freq_energy,
-                "high_low_ratio": high_low_ratio,
-                "dominant_frequency": dominant_freq
-            })
+from src.utils.imageio import read_image
+from src.utils.parallel import list_images, parallel_map, resolve_workers
+
+# Radio de baja frecuencia = min(cx, cy) // LOW_FREQ_DIVISOR
+LOW_FREQ_DIVISOR = 4
+
+# Número de anillos del perfil radial de energía (fft_ring_0 ... fft_ring_{N-1})
+N_RINGS = 8
+
+# Parámetros del extractor (si cambian, la caché de features se invalida)
+FFT_PARAMS = {"version": 2, "low_freq_divisor": LOW_FREQ_DIVISOR, "n_rings": N_RINGS}
+
+
+@lru_cache(maxsize=16)
+def _spectrum_geometry(h, w, n_rings=N_RINGS):
+    """
+    Geometría del medio espectro de rfft2 para imágenes h x w (se calcula una vez por tamaño).
+    Usa las frecuencias sin fftshift: la distancia al centro es la misma que con fftshift.
+    Retorna:
+    - dist: distancia de cada coeficiente al centro (h, w//2+1)
+    - weights: matriz (h*(w//2+1), 3 + n_rings) con pesos para total / low / high / anillos.
+      Las columnas con espejo en el espectro completo cuentan doble, así las energías
+      son iguales a las del fft2 completo.
+    - max_dist: distancia del centro a la esquina (para normalizar)
+    """
+    cy, cx = h // 2, w // 2
+    radius = min(cx, cy) // LOW_FREQ_DIVISOR
+
+    ky = np.fft.fftfreq(h, d=1.0 / h)
+    kx = np.arange(w // 2 + 1)
+    dist = np.sqrt(kx[None, :] ** 2 + ky[:, None] ** 2)
+
+    mirror = np.full(w // 2 + 1, 2.0)
+    mirror[0] = 1.0
+    if w % 2 == 0:
+        mirror[-1] = 1.0  # columna de Nyquist no tiene espejo
+    mirror = np.broadcast_to(mirror, dist.shape)
+
+    max_dist = np.sqrt(cx ** 2 + cy ** 2)
+    ring = np.minimum((dist / max_dist * n_rings).astype(int), n_rings - 1)
+
+    weights = np.zeros((dist.size, 3 + n_rings))
+    weights[:, 0] = mirror.ravel()
+    weights[:, 1] = (mirror * (dist <= radius)).ravel()
+    weights[:, 2] = (mirror * (dist > radius)).ravel()
+    weights[np.arange(dist.size), 3 + ring.ravel()] = mirror.ravel()
+
+    return dist, weights, max_dist
+
+
+def frequency_features_batch(images):
+    """
+    Características de frecuencia para un lote de imágenes del mismo tamaño (N, h, w).
+    Un solo rfft2 para todo el lote y todas las energías con un producto de matrices.
+    Retorna dict columna → array de largo N.
+    """
+    images = np.asarray(images)
+    n, h, w = images.shape
+    dist, weights, max_dist = _spectrum_geometry(h, w)
+
+    spectrum = np.fft.rfft2(images, axes=(1, 2))
+    power = np.square(spectrum.real) + np.square(spectrum.imag)
+    power = power.reshape(n, -1)
+
+    energies = power @ weights
+    spectral_energy = energies[:, 0]
+    low_freq_energy = energies[:, 1]
+    high_freq_energy = energies[:, 2]
+    rings = energies[:, 3:]
+
+    # Dominant frequency (la magnitud y la potencia tienen el mismo máximo)
+    idx_max = np.argmax(power, axis=1)
+    dominant_freq = dist.ravel()[idx_max] / max_dist
+
+    features = {
+        "spectral_energy": spectral_energy,
+        "low_freq_energy": low_freq_energy,
+        "high_freq_energy": high_freq_energy,
+        "high_low_ratio": high_freq_energy / (low_freq_energy + 1e-8),
+        "dominant_frequency": dominant_freq
+    }
+
+    # Perfil radial: fracción de la energía en cada anillo
+    for i in range(rings.shape[1]):
+        features[f"fft_ring_{i}"] = rings[:, i] / (spectral_energy + 1e-8)
+
+    return features
+
+
+def frequency_features(img):
+    """Características en el dominio de la frecuencia (FFT) de una imagen en grises."""
+    batch = frequency_features_batch(img[np.newaxis])
+    return {name: values[0] for name, values in batch.items()}
+
+
+def _frequency_one(task):
+    """Worker: lee una imagen y retorna su fila de features (o None)."""
+    species, file, img_path = task
+
+    img = read_image(img_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+
+    return {"filename": file, "species": species, **frequency_features(img)}
+
+
+def extract_frequency_features(input_dir, output_csv="Data/features/features_frequency.csv", n_workers=None):
+    print("\n📡 Starting FREQUENCY FEATURE EXTRACTION...")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
+
+    rows = parallel_map(_frequency_one, list_images(input_dir), n_workers, prefetch=itemgetter(2))
+    data_list = [row for row in rows if row is not None]
 
     df = pd.DataFrame(data_list)
 
@@ -2,48 +2,185 @@ import os
 import cv2
 import numpy as np
 import pandas as pd
-from skimage.feature import local_binary_pattern
-from skimage.measure import shannon_entropy
+from operator import itemgetter
+from functools import lru_cache
+
+from src.utils.imageio import read_image
+from src.utils.parallel import list_images, parallel_map, resolve_workers
 
 RADIUS = 1
 POINTS = 8 * RADIUS
 METHOD = "uniform"
 
-def extract_lbp_features(input_dir, output_csv="Data/features/features_lbp.csv"):
-    data_list = []
+# Radios a calcular en la misma pasada (P = 8 * R para cada uno).
+# Las columnas del primer radio no llevan sufijo; las demás terminan en _r{R}.
+RADII = (RADIUS,)
+
+# Imágenes por bloque dentro de un lote (buffers float64 pequeños → caben en caché)
+LBP_BLOCK = 4
+
+# Parámetros del extractor (si cambian, la caché de features se invalida)
+LBP_PARAMS = {"version": 2, "radii": list(RADII), "points_per_radius": 8, "method": METHOD}
+
+
+@lru_cache(maxsize=8)
+def _neighbor_offsets(points, radius):
+    """Posición (fila, columna) de los P vecinos en el círculo, redondeada como en skimage."""
+    angles = 2 * np.pi * np.arange(points, dtype=np.float64) / points
+    rp = np.round(-radius * np.sin(angles), 5)
+    cp = np.round(radius * np.cos(angles), 5)
+    return tuple(zip(rp, cp))
+
+
+def lbp_codes(images, points=POINTS, radius=RADIUS):
+    """
+    Etiquetas LBP "uniform" (uint8) para un lote de imágenes uint8 (N, h, w).
+    Mismo resultado que skimage.feature.local_binary_pattern(img, P, R, "uniform"),
+    pero vectorizado sobre todo el lote:
+    - vecinos en posiciones enteras se comparan directo en uint8
+    - vecinos fuera de la grilla usan interpolación bilineal (borde = 0, como skimage)
+    - la etiqueta sale de contadores acumulados vecino a vecino, sin tabla de 2^P códigos
+      (a R=3, P=24, la tabla ocupaba GB): número de unos y transiciones 0/1 entre vecinos
+      consecutivos (sin la vuelta circular); <= 2 transiciones → número de unos, si no P + 1
+    """
+    images = np.asarray(images)
+    n, h, w = images.shape
+    pad = int(np.ceil(radius)) + 1
+
+    padded = np.pad(images, ((0, 0), (pad, pad), (pad, pad)))
+    padded_f = None
+
+    ones = np.zeros((n, h, w), dtype=np.uint8)
+    changes = np.zeros((n, h, w), dtype=np.uint8)
+    previous = None
+
+    def shifted(arr, dy, dx):
+        return arr[:, pad + dy:pad + dy + h, pad + dx:pad + dx + w]
+
+    rows = np.arange(h, dtype=np.float64)
+    cols = np.arange(w, dtype=np.float64)
+
+    for i, (rp, cp) in enumerate(_neighbor_offsets(points, radius)):
+        if rp == int(rp) and cp == int(cp):
+            neighbor_ge = shifted(padded, int(rp), int(cp)) >= images
+        else:
+            if padded_f is None:
+                # Buffers reutilizados por todos los vecinos interpolados
+                padded_f = padded.astype(np.float64)
+                center = images.astype(np.float64)
+                top = np.empty((n, h, w))
+                bottom = np.empty((n, h, w))
+                tmp = np.empty((n, h, w))
+
+            # Pesos por fila/columna calculados igual que skimage (r + rp - floor(r + rp)),
+            # con las mismas operaciones en el mismo orden → resultado bit a bit igual
+            minr, maxr = int(np.floor(rp)), int(np.ceil(rp))
+            minc, maxc = int(np.floor(cp)), int(np.ceil(cp))
+            dr = ((rows + rp) - np.floor(rows + rp))[:, None]
+            dc = (cols + cp) - np.floor(cols + cp)
+
+            # top = (1 - dc) * top_left + dc * top_right
+            np.multiply(shifted(padded_f, minr, minc), 1 - dc, out=top)
+            np.multiply(shifted(padded_f, minr, maxc), dc, out=tmp)
+            top += tmp
+            # bottom = (1 - dc) * bottom_left + dc * bottom_right
+            np.multiply(shifted(padded_f, maxr, minc), 1 - dc, out=bottom)
+            np.multiply(shifted(padded_f, maxr, maxc), dc, out=tmp)
+            bottom += tmp
+            # texture = (1 - dr) * top + dr * bottom
+            top *= 1 - dr
+            bottom *= dr
+            top += bottom
+            top -= center
+            neighbor_ge = top >= 0
+
+        ones += neighbor_ge
+        if previous is not None:
+            changes += neighbor_ge != previous
+        previous = neighbor_ge
+
+    return np.where(changes <= 2, ones, np.uint8(points + 1))
+
+
+def _value_entropy(hist):
+    """
+    Entropía (base 2) de los valores distintos de cada fila, igual que
+    skimage.measure.shannon_entropy(hist) en la versión anterior de este extractor.
+    """
+    n, n_bins = hist.shape
+    ordered = np.sort(hist, axis=1)
+
+    new_value = np.ones_like(ordered, dtype=bool)
+    new_value[:, 1:] = ordered[:, 1:] != ordered[:, :-1]
+    group = np.cumsum(new_value, axis=1) - 1
+
+    counts = np.bincount((group + np.arange(n)[:, None] * n_bins).ravel(),
+                         minlength=n * n_bins).reshape(n, n_bins)
+    p = counts / n_bins
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return -np.sum(np.where(p > 0, p * np.log2(p), 0.0), axis=1)
+
+
+def lbp_features_batch(images, radii=RADII):
+    """
+    Características de textura (LBP) para un lote de imágenes (N, h, w).
+    El histograma tiene siempre P + 2 bins (fijo para cada P, R),
+    así todas las imágenes tienen el mismo significado por bin.
+    Retorna dict columna → array de largo N.
+    """
+    images = np.asarray(images, dtype=np.uint8)
+    n = images.shape[0]
+    features = {}
+
+    for k, radius in enumerate(radii):
+        points = 8 * radius
+        n_bins = points + 2
+        suffix = "" if k == 0 else f"_r{radius}"
+
+        # El lote se procesa en bloques pequeños para que los buffers quepan en caché
+        counts = np.empty((n, n_bins), dtype=np.int64)
+        for start in range(0, n, LBP_BLOCK):
+            block = images[start:start + LBP_BLOCK]
+            labels = lbp_codes(block, points, radius)
+
+            # Un solo bincount por bloque (cada imagen en su rango de bins)
+            m = block.shape[0]
+            offsets = (np.arange(m) * n_bins)[:, None, None]
+            counts[start:start + m] = np.bincount((labels + offsets).ravel(),
+                                                  minlength=m * n_bins).reshape(m, n_bins)
+
+        hist = counts / images[0].size
+
+        features[f"lbp_uniform_ratio{suffix}"] = hist[:, :-1].sum(axis=1)
+        features[f"lbp_entropy{suffix}"] = _value_entropy(hist + 1e-12)
+        features[f"lbp_dom_bin_ratio{suffix}"] = hist.max(axis=1) / hist.sum(axis=1)
+
+    return features
+
 
-    print("\n🔬 Starting LBP FEATURE EXTRACTION...\n")
+def lbp_features(img):
+    """Características de textura (LBP) de una imagen en escala de grises."""
+    batch = lbp_features_batch(img[np.newaxis])
+    return {name: values[0] for name, values in batch.items()}
 
-    for species in os.listdir(input_dir):
-        species_path = os.path.join(input_dir, species)
-        if not os.path.isdir(species_path):
-            continue
 
-        for file in os.listdir(species_path):
-            if not file.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
+def _lbp_one(task):
+    """Worker: lee una imagen y retorna su fila de features (o None)."""
+    species, file, img_path = task
 
-            img_path = os.path.join(species_path, file)
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            if img is None:
-                continue
+    img = read_image(img_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
 
-            lbp = local_binary_pattern(img, POINTS, RADIUS, METHOD)
+    return {"filename": file, "species": species, **lbp_features(img)}
 
-            n_bins = int(lbp.max() + 1)
-            hist, _ = np.histogram(lbp.ravel(), bins=n_bins, range=(0, n_bins), density=True)
 
-            uniform_ratio = hist[:-1].sum()
-            entropy = shannon_entropy(hist + 1e-12)
-            dom_bin_ratio = hist.max() / hist.sum()
+def extract_lbp_features(input_dir, output_csv="Data/features/features_lbp.csv", n_workers=None):
+    print("\n🔬 Starting LBP FEATURE EXTRACTION...")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
 
-            data_list.append({
-                "filename": file,
-                "species": species,
-                "lbp_uniform_ratio": uniform_ratio,
-                "lbp_entropy": entropy,
-                "lbp_dom_bin_ratio": dom_bin_ratio
-            })
+    rows = parallel_map(_lbp_one, list_images(input_dir), n_workers, prefetch=itemgetter(2))
+    data_list = [row for row in rows if row is not None]
 
     df = pd.DataFrame(data_list)
 
@@ -2,45 +2,120 @@ import os
 import cv2
 import numpy as np
 import pandas as pd
-from skimage.measure import shannon_entropy
+from operator import itemgetter
 
-def extract_spatial_features(input_dir, output_csv="Data/features/features_spatial.csv"):
-    data_list = []
+from src.utils.imageio import read_image
+from src.utils.parallel import list_images, parallel_map, resolve_workers
 
+CANNY_LOW = 100
+CANNY_HIGH = 200
+
+# Percentiles de la magnitud del gradiente (|dx| + |dy|, la misma norma L1 que usa Canny)
+GRADIENT_PERCENTILES = (50, 90)
+
+# Medias por región: grilla REGION_GRID x REGION_GRID (region_mean_0 ... arriba-izquierda primero)
+REGION_GRID = 3
+
+# Parámetros del extractor (si cambian, la caché de features se invalida)
+SPATIAL_PARAMS = {"version": 2, "canny": [CANNY_LOW, CANNY_HIGH],
+                  "gradient_percentiles": list(GRADIENT_PERCENTILES), "region_grid": REGION_GRID}
+
+# Valor máximo de |dx| + |dy| con Sobel 3x3 sobre uint8 (4 * 255 por eje)
+_MAX_GRADIENT = 2 * 4 * 255
+
+
+def _region_means(images):
+    """Media de cada región de la grilla para un lote (N, h, w) → (N, REGION_GRID²)."""
+    n, h, w = images.shape
+    rows = np.linspace(0, h, REGION_GRID + 1).astype(int)
+    cols = np.linspace(0, w, REGION_GRID + 1).astype(int)
+
+    sums = np.add.reduceat(images, rows[:-1], axis=1, dtype=np.int64)
+    sums = np.add.reduceat(sums, cols[:-1], axis=2)
+    areas = np.outer(np.diff(rows), np.diff(cols))
+    return (sums / areas).reshape(n, -1)
+
+
+def spatial_features_batch(images):
+    """
+    Características espaciales para un lote de imágenes uint8 del mismo tamaño (N, h, w).
+    - media, desviación y entropía salen de un solo histograma de 256 bins por imagen
+      (sin np.unique: no se ordenan los píxeles)
+    - Sobel 3x3 una vez por imagen: con esas derivadas se corre Canny (mismo resultado
+      que cv2.Canny(img)) y se sacan los percentiles de la magnitud del gradiente
+    - medias por región (grilla REGION_GRID x REGION_GRID) con sumas por bloques
+    Retorna dict columna → array de largo N.
+    """
+    images = np.asarray(images)
+    n, h, w = images.shape
+    n_pixels = h * w
+
+    hist = np.empty((n, 256), dtype=np.float64)
+    edge_pixels = np.empty(n, dtype=np.float64)
+    gradient = np.empty((n, len(GRADIENT_PERCENTILES)), dtype=np.float64)
+    ranks = np.array(GRADIENT_PERCENTILES) / 100 * (n_pixels - 1)
+
+    for i in range(n):
+        img = images[i]
+        hist[i] = cv2.calcHist([img], [0], None, [256], [0, 256]).ravel()
+
+        dx = cv2.Sobel(img, cv2.CV_16S, 1, 0, ksize=3, borderType=cv2.BORDER_REPLICATE)
+        dy = cv2.Sobel(img, cv2.CV_16S, 0, 1, ksize=3, borderType=cv2.BORDER_REPLICATE)
+        edge_pixels[i] = cv2.countNonZero(cv2.Canny(dx, dy, CANNY_LOW, CANNY_HIGH))
+
+        # Percentiles por histograma de la magnitud (entera): sin ordenar los píxeles
+        magnitude = np.abs(dx.astype(np.int32)) + np.abs(dy)
+        cumulative = np.cumsum(np.bincount(magnitude.ravel(), minlength=_MAX_GRADIENT + 1))
+        gradient[i] = np.searchsorted(cumulative, ranks, side="right")
+
+    levels = np.arange(256, dtype=np.float64)
+    mean = hist @ levels / n_pixels
+    variance = hist @ np.square(levels) / n_pixels - np.square(mean)
+
+    p = hist / n_pixels
+    with np.errstate(divide="ignore", invalid="ignore"):
+        entropy = -np.sum(np.where(p > 0, p * np.log2(p), 0.0), axis=1)
+
+    features = {
+        "mean_intensity": mean,
+        "contrast": np.sqrt(np.maximum(variance, 0.0)),
+        "entropy": entropy,
+        "edge_density": edge_pixels / n_pixels,
+    }
+
+    for j, q in enumerate(GRADIENT_PERCENTILES):
+        features[f"gradient_p{q}"] = gradient[:, j]
+
+    regions = _region_means(images)
+    for j in range(regions.shape[1]):
+        features[f"region_mean_{j}"] = regions[:, j]
+
+    return features
+
+
+def spatial_features(img):
+    """Características espaciales de una imagen en escala de grises."""
+    return {col: values[0] for col, values in spatial_features_batch(img[np.newaxis]).items()}
+
+
+def _spatial_one(task):
+    """Worker: lee una imagen y retorna su fila de features (o None)."""
+    species, file, img_path = task
+
+    img = read_image(img_path, cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return None
+
+    return {"filename": file, "species": species, **spatial_features(img)}
+
+
+def extract_spatial_features(input_dir, output_csv="Data/features/features_spatial.csv", n_workers=None):
     print("\n📊 Starting SPATIAL FEATURE EXTRACTION...")
-    print(f"Input directory: {input_dir}\n")
-
-    for species in os.listdir(input_dir):
-        species_path = os.path.join(input_dir, species)
-
-        if not os.path.isdir(species_path):
-            continue
-
-        for file in os.listdir(species_path):
-            if not file.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
-
-            img_path = os.path.join(species_path, file)
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-
-            if img is None:
-                continue
-
-            # Features
-            mean_intensity = np.mean(img)
-            contrast = np.std(img)
-            entropy = shannon_entropy(img)
-            edges = cv2.Canny(img, 100, 200)
-            edge_density = np.sum(edges > 0) / edges.size
-
-            data_list.append({
-                "filename": file,
-                "species": species,
-                "mean_intensity": mean_intensity,
-                "contrast": contrast,
-                "entropy": entropy,
-                "edge_density": edge_density
-            })
+    print(f"Input directory: {input_dir}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
+
+    rows = parallel_map(_spatial_one, list_images(input_dir), n_workers, prefetch=itemgetter(2))
+    data_list = [row for row in rows if row is not None]
 
     df = pd.DataFrame(data_list)
 
@@ -0,0 +1,285 @@
+import os
+import json
+import cv2
+import numpy as np
+
+from src.analysis.feature_buffer import FeatureBuffer
+from src.analysis.features import DEFAULT_EXTRACTORS, EXTRACTORS, _run_extractor
+from src.analysis.feature_store import write_features, load_buffer
+from src.preprocessing.crop import crop_image
+from src.preprocessing.enhancement import enhancement_params, init_worker_engine, get_worker_engine
+from src.utils.cache import StageCache, CACHED, params_key, hash_bytes
+from src.utils.imageio import read_bytes, decode_image
+from src.utils.parallel import list_images, parallel_imap, resolve_workers
+
+# Feature store de las features por tiles (mismas columnas base, una por escala y pooling)
+DEFAULT_TILED_STORE = "Data/features/store_tiled"
+
+# Tiles de TILE_SIZE x TILE_SIZE con paso TILE_STRIDE sobre cada nivel de la pirámide;
+# cada nivel es la mitad del anterior (N_SCALES niveles, el primero a resolución completa)
+TILE_SIZE = 128
+TILE_STRIDE = 128
+N_SCALES = 3
+
+# Cómo se combinan los tiles de una escala en una fila por imagen:
+# "mean" describe la escena; "max" conserva lo que aparece en un solo tile (animal chico)
+POOLING = ("mean", "max")
+
+# Tiles por lote enviado a los extractores (memoria: TILE_BATCH x TILE_SIZE² bytes)
+TILE_BATCH = 64
+
+# Recorte inferior (franja del timestamp), igual que el preprocesamiento
+CROP_RATIO = 0.10
+
+TILED_PARAMS = {"version": 1, "tile_size": TILE_SIZE, "stride": TILE_STRIDE, "n_scales": N_SCALES,
+                "pooling": list(POOLING), "crop_ratio": CROP_RATIO}
+
+# Configuración efectiva de cada store por tiles: <store>.tiling.json (la lee la clasificación
+# para guardarla en el bundle, así la inferencia extrae exactamente las mismas features)
+TILING_SUFFIX = ".tiling.json"
+
+
+def _starts(length, tile, stride):
+    # Posiciones de los tiles en un eje; el último se ajusta al borde (sin padding)
+    starts = list(range(0, length - tile + 1, stride))
+    if starts[-1] != length - tile:
+        starts.append(length - tile)
+    return starts
+
+
+def iter_tiles(img, tile_size=TILE_SIZE, stride=TILE_STRIDE, n_scales=N_SCALES):
+    """
+    Genera (escala, tile) recorriendo la pirámide nivel por nivel.
+    Cada nivel se calcula a partir del anterior (INTER_AREA a la mitad) y solo hay un
+    nivel en memoria a la vez; los tiles son vistas del nivel (no se copian).
+    Un nivel más chico que el tile se usa entero, redimensionado al tamaño del tile.
+    """
+    level = img
+    for scale in range(n_scales):
+        if scale:
+            level = cv2.resize(level, (max(1, level.shape[1] // 2), max(1, level.shape[0] // 2)),
+                               interpolation=cv2.INTER_AREA)
+        h, w = level.shape
+
+        if h < tile_size or w < tile_size:
+            yield scale, cv2.resize(level, (tile_size, tile_size), interpolation=cv2.INTER_LINEAR)
+            continue
+
+        for y in _starts(h, tile_size, stride):
+            for x in _starts(w, tile_size, stride):
+                yield scale, level[y:y + tile_size, x:x + tile_size]
+
+
+class _TilePool:
+    """Acumula, por escala, la suma / máximo / cantidad de tiles de cada feature."""
+
+    def __init__(self, n_scales):
+        self.n_scales = n_scales
+        self.columns = None
+        self.sums = self.maxs = None
+        self.counts = np.zeros(n_scales, dtype=np.int64)
+
+    def add(self, scales, values):
+        if self.columns is None:
+            self.columns = list(values)
+            self.sums = np.zeros((self.n_scales, len(self.columns)))
+            self.maxs = np.full((self.n_scales, len(self.columns)), -np.inf)
+
+        block = np.column_stack([values[col] for col in self.columns]).astype(np.float64)
+        np.add.at(self.sums, scales, block)
+        np.maximum.at(self.maxs, scales, block)
+        self.counts += np.bincount(scales, minlength=self.n_scales)
+
+    def result(self, pooling=POOLING):
+        """(columnas, valores float32): s{escala}_{pooling}_{feature}, por escala y pooling."""
+        pooled = {"mean": self.sums / np.maximum(self.counts, 1)[:, None], "max": self.maxs}
+        columns, values = [], []
+        for scale in range(self.n_scales):
+            for pool in pooling:
+                columns += [f"s{scale}_{pool}_{col}" for col in self.columns]
+                values.append(pooled[pool][scale])
+        return columns, np.concatenate(values).astype(np.float32)
+
+
+def tiled_features(img, extractors=DEFAULT_EXTRACTORS, tile_size=TILE_SIZE, stride=TILE_STRIDE,
+                   n_scales=N_SCALES, pooling=POOLING, tile_batch=TILE_BATCH):
+    """
+    Features de una imagen en grises (ya recortada y mejorada, a resolución completa)
+    sobre una pirámide de tiles, combinadas por escala (pooling).
+    Los tiles se procesan en lotes de tile_batch: los de todas las escalas comparten el
+    mismo lote (mismo tamaño), así cada extractor corre una vez por lote y reutiliza
+    su geometría (espectro, LUT de LBP) entre escalas. Nunca hay más de un lote de
+    tiles + un nivel de la pirámide en memoria.
+    Retorna (columnas, valores float32).
+    """
+    pool = _TilePool(n_scales)
+    funcs = [(EXTRACTORS[name][0], EXTRACTORS[name][2]) for name in extractors]
+
+    chunk_scales, chunk = [], []
+    tiles = iter_tiles(img, tile_size, stride, n_scales)
+
+    while True:
+        item = next(tiles, None)
+        if item is not None:
+            chunk_scales.append(item[0])
+            chunk.append(item[1])
+        if chunk and (item is None or len(chunk) == tile_batch):
+            block = np.stack(chunk)
+            values = {}
+            for func, batch_func in funcs:
+                values.update(_run_extractor(func, batch_func, dict(enumerate(block)), block)[1])
+            pool.add(np.asarray(chunk_scales), values)
+            chunk_scales, chunk = [], []
+        if item is None:
+            break
+
+    return pool.result(pooling)
+
+
+def load_tiled_input(data, crop_ratio=CROP_RATIO, engine=None, min_width=200, min_height=200):
+    """
+    Bytes de la imagen → grises a resolución completa, recortada y mejorada
+    (mismas validaciones y mejora de contraste que el preprocesamiento, sin resize).
+    Retorna (imagen o None, motivo).
+    """
+    gray = decode_image(data, cv2.IMREAD_GRAYSCALE)
+    if gray is None:
+        return None, "Unreadable/Corrupted"
+
+    h, w = gray.shape
+    if w < min_width or h < min_height:
+        return None, f"Too small ({w}x{h})"
+    if np.std(gray) < 2:
+        return None, "Almost blank (low variance)"
+
+    cropped = np.ascontiguousarray(crop_image(gray, crop_ratio))
+    return (engine.apply(cropped) if engine is not None else cropped), "OK"
+
+
+def save_tiling(output_path, tiling):
+    """Guarda la configuración con que se extrajo el store por tiles."""
+    path = output_path.rstrip("/\\") + TILING_SUFFIX
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(tiling, f, indent=2)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_tiling(output_path=DEFAULT_TILED_STORE):
+    """
+    Configuración efectiva del store por tiles (la de extract_tiled_features).
+    Stores anteriores sin el archivo se extrajeron con los valores por defecto.
+    """
+    path = output_path.rstrip("/\\") + TILING_SUFFIX
+    if not os.path.exists(path):
+        return dict(TILED_PARAMS)
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _tiled_one(task):
+    """
+    Worker: una imagen completa → fila de features por tiles.
+    Retorna (digest, motivo, columnas, valores); CACHED si el contenido no cambió.
+    """
+    path, known_hash, extractors, tiling = task
+    data = read_bytes(path)
+    digest = hash_bytes(data)
+    if digest == known_hash:
+        return digest, CACHED, None, None
+
+    img, reason = load_tiled_input(data, tiling["crop_ratio"], get_worker_engine())
+    if img is None:
+        return digest, reason, None, None
+
+    columns, values = tiled_features(img, extractors, tiling["tile_size"], tiling["stride"],
+                                     tiling["n_scales"], tiling["pooling"])
+    return digest, reason, columns, values
+
+
+def extract_tiled_features(input_dir, output_path=DEFAULT_TILED_STORE, extractors=DEFAULT_EXTRACTORS,
+                           tile_size=TILE_SIZE, stride=TILE_STRIDE, n_scales=N_SCALES, pooling=POOLING,
+                           crop_ratio=CROP_RATIO, n_workers=None, use_cache=True,
+                           apply_equalization=True, apply_clahe=True, apply_normalization=True,
+                           clip_limit=2.0, tile_grid_size=(8, 8)):
+    """
+    Modo de extracción por tiles, para animales chicos que el resize a 256x256 reduce
+    a unos pocos píxeles: spatial + FFT + LBP sobre una pirámide de tiles de cada imagen
+    recortada a resolución completa (input_dir: imágenes crudas, una carpeta por especie).
+    Cada escala se resume con POOLING (mean/max sobre sus tiles) → una fila por imagen.
+
+    Las imágenes corren en paralelo (n_workers) y en streaming: a lo sumo unas pocas
+    imágenes en vuelo por worker, y dentro de cada una los tiles se recorren por lotes.
+    Con use_cache=True solo se procesan imágenes nuevas o modificadas.
+    La configuración usada (tiles, extractores, mejora de contraste) queda en
+    output_path + TILING_SUFFIX (ver load_tiling).
+    Retorna un FeatureBuffer (mismo formato que extract_features).
+    """
+    enhancement = enhancement_params(apply_equalization, apply_clahe, apply_normalization,
+                                     clip_limit, tile_grid_size)
+    tiling = {"version": TILED_PARAMS["version"], "tile_size": tile_size, "stride": stride,
+              "n_scales": n_scales, "pooling": list(pooling), "crop_ratio": crop_ratio,
+              "extractors": list(extractors), "enhancement": enhancement}
+    params = {"stage": "features_tiled", **tiling,
+              "extractors": {name: params_key(EXTRACTORS[name][1]) for name in extractors}}
+
+    print("\n🧱 Starting TILED FEATURE EXTRACTION (multi-scale)...")
+    print(f"Input directory: {input_dir}")
+    print(f"Tiles: {tile_size}px, stride {stride} | Scales: {n_scales} | Pooling: {', '.join(pooling)}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
+
+    manifest_path = output_path.rstrip("/\\") + ".manifest.json"
+    cache = StageCache(manifest_path, params, enabled=use_cache)
+
+    # Filas de la corrida anterior (para las imágenes que no cambiaron)
+    previous, previous_pos = None, {}
+    if use_cache and cache.entries and os.path.exists(output_path):
+        previous = load_buffer(output_path)
+        previous_pos = {f"{species}/{file}": pos for pos, (species, file)
+                        in enumerate(zip(previous.species, previous.filenames))}
+
+    images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
+    # Se salta una imagen si no cambió y su fila sigue en el store (o si ya estaba rechazada)
+    tasks = [(path, cache.known_hash(key) if key in previous_pos or cache.reason(key) != "OK" else None,
+              tuple(extractors), tiling)
+             for key, (_, _, path) in zip(keys, images)]
+
+    features = None
+    results = parallel_imap(_tiled_one, tasks, n_workers, initializer=init_worker_engine,
+                            initargs=(apply_equalization, apply_clahe, apply_normalization,
+                                      clip_limit, tile_grid_size))
+
+    for key, (species, file, _), (digest, reason, columns, values) in zip(keys, images, results):
+        if reason == CACHED:
+            if cache.reason(key) != "OK":
+                cache.mark_cached()
+                continue
+            columns, values = previous.columns, previous.values[previous_pos[key]]
+            cache.mark_cached()
+        else:
+            cache.record(key, digest, reason)
+            if reason != "OK":
+                continue
+
+        if features is None:
+            features = FeatureBuffer(columns, capacity=len(images))
+        row = features.append_block([file], species, {})
+        features.values[row] = values
+
+    cache.save(keys)
+    print(cache.summary(len(images)))
+
+    if features is None:
+        features = FeatureBuffer([], capacity=1)
+
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    if output_path.lower().endswith(".csv"):
+        features.to_frame().to_csv(output_path, index=False)
+    else:
+        write_features(features, output_path)
+    save_tiling(output_path, tiling)
+
+    print(f"✔ Tiled features ({len(features.columns)} columns) saved in: {output_path}\n")
+    return features
@@ -0,0 +1,239 @@
+import os
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+from src.analysis.feature_store import BATCH_ROWS, feature_columns
+from src.utils.parallel import parallel_map
+
+# Estadísticos por feature de descriptive_statistics.csv (mismo orden que el groupby)
+STATISTICS = ("mean", "std", "min", "max")
+
+
+def state_path_for(path):
+    """Archivo de estado de las estadísticas de un store/CSV (al lado, como el manifest)."""
+    return path.rstrip("/\\") + ".stats.npz"
+
+
+class FeatureMoments:
+    """
+    Acumulador de momentos por especie, combinable (Welford / Chan et al.):
+    - n, media, co-momentos (matriz de covarianza × (n-1)), mínimo y máximo por feature
+    - update(X, species) suma un bloque de filas; merge(other) suma otro acumulador
+      (p. ej. el de otro worker o el de los datos nuevos del día)
+    Con esto descriptive_statistics.csv y correlation_matrix.csv salen sin tener
+    la tabla entera en memoria, y un refresh solo procesa las filas nuevas.
+    Las filas con algún NaN se ignoran.
+    """
+
+    def __init__(self, columns):
+        self.columns = list(columns)
+        self.groups = {}     # especie → dict(n, mean, m2, min, max)
+        self.sources = []    # archivos ya sumados (ver update_moments)
+
+    # --------- acumulación ---------
+
+    @staticmethod
+    def _combine(a, b):
+        n = a["n"] + b["n"]
+        delta = b["mean"] - a["mean"]
+        return {
+            "n": n,
+            "mean": a["mean"] + delta * (b["n"] / n),
+            "m2": a["m2"] + b["m2"] + np.outer(delta, delta) * (a["n"] * b["n"] / n),
+            "min": np.fmin(a["min"], b["min"]),
+            "max": np.fmax(a["max"], b["max"]),
+        }
+
+    def _add_group(self, species, group):
+        if species in self.groups:
+            group = self._combine(self.groups[species], group)
+        self.groups[species] = group
+
+    def update(self, X, species):
+        """Suma un bloque: X (filas × columnas) y la especie de cada fila."""
+        X = np.asarray(X, dtype=np.float64)
+        species = np.asarray(species).astype(str)
+
+        finite = ~np.isnan(X).any(axis=1)
+        X, species = X[finite], species[finite]
+
+        for sp in np.unique(species):
+            block = X[species == sp]
+            mean = block.mean(axis=0)
+            centered = block - mean
+            self._add_group(sp, {
+                "n": len(block),
+                "mean": mean,
+                "m2": centered.T @ centered,
+                "min": block.min(axis=0),
+                "max": block.max(axis=0),
+            })
+        return self
+
+    def update_frame(self, df):
+        return self.update(df[self.columns].to_numpy(dtype=np.float64), df["species"].to_numpy())
+
+    def update_buffer(self, buffer, batch_size=BATCH_ROWS):
+        """Suma un FeatureBuffer por bloques (solo un bloque a la vez pasa a float64)."""
+        X = buffer.select(self.columns)
+        species = np.asarray(buffer.species_names, dtype=str)
+        for start in range(0, len(buffer), batch_size):
+            stop = start + batch_size
+            self.update(X[start:stop], species[buffer.codes[start:stop]])
+        return self
+
+    def merge(self, other):
+        """Suma otro acumulador con las mismas columnas (resultado de otro worker/lote)."""
+        if other.columns != self.columns:
+            raise ValueError("Cannot merge moments computed over different feature columns")
+        for species, group in other.groups.items():
+            self._add_group(species, group)
+        self.sources.extend(other.sources)
+        return self
+
+    def total(self):
+        """Momentos de todas las especies juntas (ValueError si no hay filas)."""
+        if not self.groups:
+            raise ValueError("No feature rows accumulated (empty store or every image rejected)")
+        total = None
+        for group in self.groups.values():
+            total = group if total is None else self._combine(total, group)
+        return total
+
+    # --------- resultados ---------
+
+    def statistics(self):
+        """Misma tabla que df.groupby("species")[cols].agg(["mean", "std", "min", "max"])."""
+        species = sorted(self.groups)
+        rows = []
+        for sp in species:
+            g = self.groups[sp]
+            std = np.sqrt(np.diag(g["m2"]) / (g["n"] - 1)) if g["n"] > 1 else np.full(len(self.columns), np.nan)
+            rows.append(np.column_stack([g["mean"], std, g["min"], g["max"]]).ravel())
+
+        columns = pd.MultiIndex.from_product([self.columns, STATISTICS])
+        return pd.DataFrame(rows, index=pd.Index(species, name="species"), columns=columns)
+
+    def correlation(self):
+        """Misma tabla que df[cols].corr() (Pearson sobre todas las filas)."""
+        if not self.groups:
+            # Sin filas: igual que pandas, matriz de NaN
+            return pd.DataFrame(np.nan, index=self.columns, columns=self.columns)
+        total = self.total()
+        std = np.sqrt(np.diag(total["m2"]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            corr = total["m2"] / np.outer(std, std)
+        corr = np.clip(corr, -1.0, 1.0)
+        np.fill_diagonal(corr, np.where(std > 0, 1.0, np.nan))
+        return pd.DataFrame(corr, index=self.columns, columns=self.columns)
+
+    # --------- persistencia ---------
+
+    def save(self, path):
+        species = sorted(self.groups)
+        k = len(self.columns)
+
+        def stack(key, shape):
+            if not species:
+                return np.empty(shape)
+            return np.array([self.groups[sp][key] for sp in species])
+
+        np.savez(
+            path,
+            columns=np.array(self.columns, dtype=str),
+            species=np.array(species, dtype=str),
+            sources=np.array(self.sources, dtype=str),
+            n=np.array([self.groups[sp]["n"] for sp in species], dtype=np.int64),
+            mean=stack("mean", (0, k)),
+            m2=stack("m2", (0, k, k)),
+            min=stack("min", (0, k)),
+            max=stack("max", (0, k)),
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as state:
+            moments = cls(state["columns"].tolist())
+            moments.sources = state["sources"].tolist()
+            for i, sp in enumerate(state["species"].tolist()):
+                moments.groups[sp] = {
+                    "n": int(state["n"][i]),
+                    "mean": state["mean"][i],
+                    "m2": state["m2"][i],
+                    "min": state["min"][i],
+                    "max": state["max"][i],
+                }
+        return moments
+
+
+# =====================================
+# STREAMING DESDE EL STORE
+# =====================================
+
+def _source_id(path, root):
+    # Los part-*.parquet del store no se modifican nunca (cada escritura crea archivos nuevos)
+    st = os.stat(path)
+    return f"{os.path.relpath(path, root)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+def _list_sources(input_path):
+    if input_path.lower().endswith(".csv"):
+        return [input_path]
+    return sorted(ds.dataset(input_path, format="parquet", partitioning="hive").files)
+
+
+def _source_moments(task):
+    """Worker: momentos de un archivo del store (o del CSV entero), leído por bloques."""
+    input_path, root, source, columns, batch_size = task
+    moments = FeatureMoments(columns)
+
+    if source.lower().endswith(".csv"):
+        for df in pd.read_csv(source, usecols=columns + ["species"], chunksize=batch_size):
+            moments.update_frame(df)
+    else:
+        dataset = ds.dataset([source], format="parquet",
+                             partitioning=ds.partitioning(flavor="hive"), partition_base_dir=input_path)
+        for batch in dataset.to_batches(columns=columns + ["species"], batch_size=batch_size):
+            moments.update_frame(batch.to_pandas())
+
+    moments.sources.append(_source_id(source, root))
+    return moments
+
+
+def update_moments(input_path, state_path=None, n_workers=None, batch_size=BATCH_ROWS):
+    """
+    Momentos por especie de todo el store (o CSV), reusando el estado guardado:
+    - solo se leen los archivos que no estaban en el estado (appends del store)
+    - si algún archivo del estado ya no existe o cambió (store reescrito, otras
+      columnas), se recalcula desde cero
+    Los archivos nuevos se procesan en paralelo y se combinan con merge().
+    Guarda el estado actualizado en state_path (por defecto al lado del store).
+    """
+    state_path = state_path or state_path_for(input_path)
+    columns = feature_columns(input_path)
+    sources = _list_sources(input_path)
+    root = os.path.dirname(input_path) if input_path.lower().endswith(".csv") else input_path
+    current = {_source_id(source, root): source for source in sources}
+
+    moments = None
+    if os.path.isfile(state_path):
+        moments = FeatureMoments.load(state_path)
+        if moments.columns != columns or not set(moments.sources) <= set(current):
+            print("Stats state is stale (store rewritten or columns changed): recomputing")
+            moments = None
+
+    if moments is None:
+        moments = FeatureMoments(columns)
+
+    done = set(moments.sources)
+    pending = [source for sid, source in current.items() if sid not in done]
+    print(f"Stats sources: {len(current)} | new: {len(pending)}")
+
+    tasks = [(input_path, root, source, columns, batch_size) for source in pending]
+    for part in parallel_map(_source_moments, tasks, n_workers):
+        moments.merge(part)
+
+    os.makedirs(os.path.dirname(state_path) or ".", exist_ok=True)
+    moments.save(state_path)
+    return moments
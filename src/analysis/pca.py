@@ -1,95 +1,238 @@
 import os
+import joblib
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from sklearn.preprocessing import StandardScaler
-from sklearn.decomposition import PCA
-from mpl_toolkits.mplot3d import Axes3D
+from sklearn.decomposition import PCA, IncrementalPCA
 
+from src.analysis.feature_store import (
+    BATCH_ROWS,
+    DEFAULT_STORE,
+    load_buffer,
+    feature_columns,
+    iter_features
+)
+from src.visualization.figures import figure
 
-def run_pca(
-        input_csv="Data/features/features_all.csv",
-        figures_path="Results/figures/"
-    ):
+
+# Proyección ajustada (scaler + PCA + columnas) para reusarla sin volver a ajustar
+DEFAULT_PROJECTION = "Results/models/pca_projection.joblib"
+
+# Puntos máximos en los scatter (muestreo estratificado por especie)
+MAX_PLOT_POINTS = 20000
+MIN_POINTS_PER_SPECIES = 50
+
+
+def _plot_quota(species_counts, max_points=MAX_PLOT_POINTS):
     """
-    Corre PCA completo:
-    - Normaliza los datos
-    - PCA 2D y 3D
-    - Varianza explicada
-    Guarda gráficas en Results/figures/
+    Puntos a graficar por especie: proporcional a su tamaño, con un mínimo
+    para que las especies chicas no desaparezcan del gráfico.
     """
+    total = sum(species_counts.values())
+    quota = {}
+    for species, n in species_counts.items():
+        share = int(max_points * n / total) if total > max_points else n
+        quota[species] = min(n, max(share, MIN_POINTS_PER_SPECIES))
+    return quota
 
-    print("\n📉 Starting PCA analysis...\n")
 
-    os.makedirs(figures_path, exist_ok=True)
+class _StratifiedSample:
+    """
+    Muestra aleatoria por especie en streaming (bottom-k con prioridades aleatorias):
+    cada fila recibe una prioridad y se quedan las quota[especie] menores.
+    """
+
+    def __init__(self, quota, random_state=0):
+        self.quota = quota
+        self.rng = np.random.default_rng(random_state)
+        self.kept = {}   # especie → (prioridades, filas)
+
+    def add(self, rows, species):
+        priorities = self.rng.random(len(rows))
+        for sp in np.unique(species):
+            idx = species == sp
+            p, r = priorities[idx], rows[idx]
+            if sp in self.kept:
+                p = np.concatenate([self.kept[sp][0], p])
+                r = np.concatenate([self.kept[sp][1], r])
+            k = self.quota.get(sp, MIN_POINTS_PER_SPECIES)
+            if len(p) > k:
+                keep = np.argpartition(p, k)[:k]
+                p, r = p[keep], r[keep]
+            self.kept[sp] = (p, r)
+
+    def result(self):
+        """(filas, especies) de la muestra, en orden de especie."""
+        if not self.kept:
+            return np.empty((0, 0)), np.empty(0, dtype=object)
+        species = sorted(self.kept)
+        rows = np.concatenate([self.kept[sp][1] for sp in species])
+        labels = np.concatenate([np.full(len(self.kept[sp][1]), sp, dtype=object) for sp in species])
+        return rows, labels
+
+
+def _rebatch(frames, feature_cols, batch_size):
+    """
+    Junta los bloques del store en lotes de ~batch_size filas (los bloques por archivo
+    pueden ser chicos y IncrementalPCA necesita al menos n_components filas por lote).
+    Retorna (X float64, species) por lote.
+    """
+    pending, n = [], 0
+    for df in frames:
+        pending.append(df)
+        n += len(df)
+        if n >= batch_size:
+            chunk = pd.concat(pending, ignore_index=True)
+            yield chunk[feature_cols].to_numpy(dtype=np.float64), chunk["species"].astype(str).to_numpy()
+            pending, n = [], 0
+
+    if pending:
+        chunk = pd.concat(pending, ignore_index=True)
+        yield chunk[feature_cols].to_numpy(dtype=np.float64), chunk["species"].astype(str).to_numpy()
+
+
+def save_projection(scaler, pca, feature_cols, projection_path=DEFAULT_PROJECTION):
+    os.makedirs(os.path.dirname(projection_path) or ".", exist_ok=True)
+    joblib.dump({"columns": list(feature_cols), "scaler": scaler, "pca": pca}, projection_path)
+
+
+def load_projection(projection_path=DEFAULT_PROJECTION):
+    return joblib.load(projection_path)
 
-    # =============== LOAD FEATURES ===============
-    df = pd.read_csv(input_csv)
 
-    # Separar features numéricos y etiquetas
-    feature_cols = df.select_dtypes(include=[np.number]).columns
-    X = df[feature_cols]
-    y = df["species"]
+def project(df, projection):
+    """Proyecta un DataFrame de features con una proyección guardada (sin reajustar)."""
+    X = df[projection["columns"]].to_numpy(dtype=np.float64)
+    return projection["pca"].transform(projection["scaler"].transform(X))
+
+
+def _fit_streaming(input_path, feature_cols, n_components, batch_size, max_plot_points, random_state):
+    """
+    PCA sin cargar la tabla entera (tres pasadas por el store, en bloques):
+    1) StandardScaler.partial_fit + conteo por especie
+    2) IncrementalPCA.partial_fit sobre los datos normalizados
+    3) proyección + muestra estratificada para los gráficos
+    """
+    def batches():
+        return _rebatch(iter_features(input_path, feature_cols, batch_size), feature_cols, batch_size)
 
-    # =============== NORMALIZE ===============
     scaler = StandardScaler()
-    X_scaled = scaler.fit_transform(X)
+    species_counts = {}
+    for X, species in batches():
+        scaler.partial_fit(X)
+        for sp, n in zip(*np.unique(species, return_counts=True)):
+            species_counts[sp] = species_counts.get(sp, 0) + int(n)
 
-    # =============== PCA FIT ===============
-    pca = PCA(n_components=10)   # puedes subirlo si quieres más PCs
-    pcs = pca.fit_transform(X_scaled)
+    n_rows = sum(species_counts.values())
+    print(f"Rows: {n_rows} (streaming, batches of {batch_size})")
 
-    # Mostrar varianza explicada
-    explained = pca.explained_variance_ratio_
-    print("Variance ratio:", explained)
+    pca = IncrementalPCA(n_components=n_components)
+    for X, _ in batches():
+        if len(X) >= n_components:
+            pca.partial_fit(scaler.transform(X))
 
+    sample = _StratifiedSample(_plot_quota(species_counts, max_plot_points), random_state)
+    for X, species in batches():
+        sample.add(pca.transform(scaler.transform(X)), species)
+
+    pcs, y = sample.result()
+    return scaler, pca, pcs, y
+
+
+def _plot_projection(pcs, y, explained, figures_path):
     # =============== PCA 2D ===============
-    plt.figure(figsize=(8, 6))
-    for species in np.unique(y):
-        idx = y == species
-        plt.scatter(pcs[idx, 0], pcs[idx, 1], label=species, s=20)
-
-    plt.title("PCA - 2D Projection")
-    plt.xlabel("PC1")
-    plt.ylabel("PC2")
-    plt.legend(fontsize=8)
-    plt.tight_layout()
-    plt.savefig(os.path.join(figures_path, "pca_2d.png"))
-    plt.close()
+    figure("scatter", os.path.join(figures_path, "pca_2d.png"),
+           {"points": pcs[:, :2], "labels": y.astype(str)},
+           title="PCA - 2D Projection", xlabel="PC1", ylabel="PC2", figsize=[8, 6])
 
     print("✔ PCA 2D saved!")
 
     # =============== PCA 3D ===============
-    fig = plt.figure(figsize=(10, 8))
-    ax = fig.add_subplot(111, projection="3d")
-
-    for species in np.unique(y):
-        idx = y == species
-        ax.scatter(pcs[idx, 0], pcs[idx, 1], pcs[idx, 2], label=species, s=20)
-
-    ax.set_title("PCA - 3D Projection")
-    ax.set_xlabel("PC1")
-    ax.set_ylabel("PC2")
-    ax.set_zlabel("PC3")
-    ax.legend(fontsize=7)
-    plt.tight_layout()
-    plt.savefig(os.path.join(figures_path, "pca_3d.png"))
-    plt.close()
+    figure("scatter", os.path.join(figures_path, "pca_3d.png"),
+           {"points": pcs[:, :3], "labels": y.astype(str)},
+           title="PCA - 3D Projection", xlabel="PC1", ylabel="PC2", zlabel="PC3",
+           figsize=[10, 8], legend_fontsize=7)
 
     print("✔ PCA 3D saved!")
 
     # =============== VARIANCE PLOT ===============
-    plt.figure(figsize=(8, 5))
-    plt.plot(np.cumsum(explained) * 100, marker='o')
-    plt.xlabel("Number of Components")
-    plt.ylabel("Cumulative Explained Variance (%)")
-    plt.title("PCA - Cumulative Variance")
-    plt.grid(True)
-    plt.tight_layout()
-    plt.savefig(os.path.join(figures_path, "pca_variance.png"))
-    plt.close()
+    figure("line", os.path.join(figures_path, "pca_variance.png"),
+           {"y": np.cumsum(explained) * 100},
+           title="PCA - Cumulative Variance", xlabel="Number of Components",
+           ylabel="Cumulative Explained Variance (%)", marker="o", grid=True, figsize=[8, 5])
 
     print("✔ PCA variance plot saved!\n")
 
+
+def run_pca(
+        input_path=DEFAULT_STORE,
+        figures_path="Results/figures/",
+        n_components=10,
+        streaming=False,
+        batch_size=BATCH_ROWS,
+        projection_path=DEFAULT_PROJECTION,
+        max_plot_points=MAX_PLOT_POINTS,
+        random_state=0,
+        features=None
+    ):
+    """
+    Corre PCA completo:
+    - Normaliza los datos
+    - PCA 2D y 3D
+    - Varianza explicada
+    Guarda gráficas en Results/figures/ y la proyección ajustada
+    (scaler + PCA) en projection_path para reusarla con project().
+    Con streaming=True la tabla se recorre en bloques de batch_size filas
+    (StandardScaler.partial_fit + IncrementalPCA): la memoria no depende del
+    tamaño del dataset.
+    Los scatter usan a lo sumo ~max_plot_points puntos (muestra estratificada por especie).
+    features: FeatureBuffer ya cargado (p. ej. compartido con stats) en vez de leer input_path;
+    X se usa en float32 tal cual, sin convertir.
+    Retorna (pcs, explained); en modo streaming pcs es solo la muestra graficada.
+    """
+
+    print("\n📉 Starting PCA analysis...\n")
+
+    os.makedirs(figures_path, exist_ok=True)
+
+    # Solo se leen las columnas necesarias (features numéricos + species)
+    feature_cols = features.columns if features is not None else feature_columns(input_path)
+
+    if streaming:
+        scaler, pca, pcs, y = _fit_streaming(input_path, feature_cols, n_components,
+                                             batch_size, max_plot_points, random_state)
+        plot_pcs, plot_y = pcs, y
+    else:
+        # =============== LOAD FEATURES ===============
+        if features is None:
+            features = load_buffer(input_path, columns=feature_cols)
+
+        # Separar features numéricos (float32) y etiquetas
+        X = features.select(feature_cols)
+        y = features.species
+
+        # =============== NORMALIZE ===============
+        scaler = StandardScaler()
+        X_scaled = scaler.fit_transform(X)
+
+        # =============== PCA FIT ===============
+        pca = PCA(n_components=n_components)   # puedes subirlo si quieres más PCs
+        pcs = pca.fit_transform(X_scaled)
+
+        # =============== PLOT SAMPLE ===============
+        species_counts = dict(zip(*np.unique(y, return_counts=True)))
+        sample = _StratifiedSample(_plot_quota(species_counts, max_plot_points), random_state)
+        sample.add(pcs, y)
+        plot_pcs, plot_y = sample.result()
+
+    # Mostrar varianza explicada
+    explained = pca.explained_variance_ratio_
+    print("Variance ratio:", explained)
+
+    save_projection(scaler, pca, feature_cols, projection_path)
+    print(f"✔ PCA projection saved in: {projection_path}")
+
+    _plot_projection(plot_pcs, plot_y, explained, figures_path)
+
     print("✨ PCA Completed Successfully!")
     return pcs, explained
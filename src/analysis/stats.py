@@ -1,8 +1,32 @@
 import os
 import pandas as pd
 import numpy as np
-import seaborn as sns
-import matplotlib.pyplot as plt
+
+from src.analysis import feature_store
+from src.analysis.feature_buffer import FeatureBuffer
+from src.analysis.feature_store import DEFAULT_STORE
+from src.analysis.moments import FeatureMoments
+from src.visualization.figures import figure
+
+def load_features(input_path=DEFAULT_STORE):
+    """
+    Carga el dataset de features ya unido (generado por extract_features),
+    desde el feature store (Parquet) o desde un CSV.
+    """
+
+    print(f"\n📂 Loading features from: {input_path}\n")
+    return feature_store.load_features(input_path)
+
+
+def load_feature_buffer(input_path=DEFAULT_STORE):
+    """
+    Como load_features, pero en un FeatureBuffer (columnas float32 + códigos de especie):
+    la mitad de memoria y sin conversión para estadísticas, PCA y entrenamiento.
+    """
+
+    print(f"\n📂 Loading features from: {input_path}\n")
+    return feature_store.load_buffer(input_path)
+
 
 def load_all_features(
         spatial_csv="Data/features/features_spatial.csv",
@@ -36,16 +60,24 @@ def load_all_features(
 def compute_statistics(df, tables_path="Results/tables/"):
     """
     Estadísticas descriptivas por especie (multiclase).
+    df puede ser el DataFrame de features, un FeatureBuffer o un FeatureMoments
+    (ver update_moments), que da la misma tabla sin tener todas las filas en memoria.
     """
 
     os.makedirs(tables_path, exist_ok=True)
 
     print("📊 Computing descriptive statistics...\n")
 
-    # Solo columnas numéricas
-    num_cols = df.select_dtypes(include=[np.number]).columns
+    if isinstance(df, FeatureBuffer):
+        df = FeatureMoments(df.columns).update_buffer(df)
 
-    stats = df.groupby("species")[num_cols].agg(["mean", "std", "min", "max"])
+    if isinstance(df, FeatureMoments):
+        stats = df.statistics()
+    else:
+        # Solo columnas numéricas
+        num_cols = df.select_dtypes(include=[np.number]).columns
+
+        stats = df.groupby("species")[num_cols].agg(["mean", "std", "min", "max"])
 
     stats.to_csv(os.path.join(tables_path, "descriptive_statistics.csv"))
 
@@ -56,6 +88,7 @@ def compute_statistics(df, tables_path="Results/tables/"):
 def compute_correlations(df, figures_path="Results/figures/"):
     """
     Calcula la matriz de correlaciones entre features y genera un heatmap.
+    df puede ser el DataFrame de features, un FeatureBuffer o un FeatureMoments.
     """
 
     os.makedirs(figures_path, exist_ok=True)
@@ -63,21 +96,23 @@ def compute_correlations(df, figures_path="Results/figures/"):
 
     print("📈 Generating correlation matrix...\n")
 
-    num_cols = df.select_dtypes(include=[np.number]).columns
-
     # matriz de correlación
-    corr = df[num_cols].corr()
+    if isinstance(df, FeatureBuffer):
+        df = FeatureMoments(df.columns).update_buffer(df)
+
+    if isinstance(df, FeatureMoments):
+        corr = df.correlation()
+    else:
+        num_cols = df.select_dtypes(include=[np.number]).columns
+        corr = df[num_cols].corr()
 
     # guardar CSV
     corr.to_csv("Results/tables/correlation_matrix.csv")
 
     # heatmap
-    plt.figure(figsize=(14, 12))
-    sns.heatmap(corr, cmap="coolwarm", annot=False)
-    plt.title("Feature Correlation Heatmap (Multiclass)")
-    plt.tight_layout()
-    plt.savefig(os.path.join(figures_path, "correlation_heatmap.png"))
-    plt.close()
+    figure("heatmap", os.path.join(figures_path, "correlation_heatmap.png"),
+           {"matrix": corr.to_numpy(), "rows": corr.index.astype(str), "columns": corr.columns.astype(str)},
+           title="Feature Correlation Heatmap (Multiclass)", cmap="coolwarm", figsize=[14, 12])
 
     print("✔ Correlation heatmap saved!\n")
     return corr
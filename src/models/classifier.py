@@ -1,20 +1,68 @@
 import os
 import pandas as pd
-import numpy as np
+from sklearn.base import clone
+from sklearn.calibration import CalibratedClassifierCV
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import StandardScaler
 from sklearn.metrics import classification_report, confusion_matrix
 from sklearn.ensemble import RandomForestClassifier
 from sklearn.svm import SVC
 from sklearn.linear_model import LogisticRegression
-import seaborn as sns
-import matplotlib.pyplot as plt
+
+from src.analysis.feature_store import DEFAULT_STORE, load_buffer, feature_columns
+from src.models.inference import DEFAULT_BUNDLE, save_model_bundle
+from src.models.kernel_approx import ApproxKernelSVM
+from src.models.training import DEFAULT_CACHE_DIR, train_models
+from src.visualization.figures import figure
+
+# Con svm_mode="auto", desde este número de filas de entrenamiento se usa el SVM aproximado
+# (SVC exacto escala entre cuadrático y cúbico en el número de filas). Con benchmarks.svm
+# (60 features, 1 núcleo): a 15k filas de train SVC tarda 20 s vs 12 s del aproximado y es
+# ~3.5 puntos de F1 mejor; a 30k ya son 79 s vs 16 s y a 45k, 185 s vs 33 s
+APPROX_SVM_MIN_ROWS = 30000
+
+SVM_MODES = ("auto", "exact", "approx")
+
+# Folds de la calibración (Platt) del modelo del bundle si no tiene predict_proba
+CALIBRATION_FOLDS = 5
+
+
+def calibrate_for_bundle(model, X_train, y_train, n_folds=CALIBRATION_FOLDS):
+    """
+    Modelo con probabilidades para el bundle: si no tiene predict_proba (p. ej. SVC sin
+    probability), se reentrena una copia dentro de CalibratedClassifierCV (sigmoid,
+    ensemble=False: un solo modelo sobre todo el train set + calibración con predicciones
+    out-of-fold). Con menos de 2 filas en alguna clase no se puede calibrar y se retorna
+    el modelo tal cual (predict no escribe columnas prob_*).
+    """
+    if hasattr(model, "predict_proba"):
+        return model
+
+    n_folds = min(n_folds, int(pd.Series(y_train).value_counts().min()))
+    if n_folds < 2:
+        print("⚠ Not enough rows per class to calibrate the model; the bundle has no probabilities.")
+        return model
+
+    print(f"🎯 Calibrating probabilities of the saved model ({n_folds}-fold, sigmoid)")
+    return CalibratedClassifierCV(clone(model), method="sigmoid", cv=n_folds,
+                                  ensemble=False).fit(X_train, y_train)
 
 
 def train_and_evaluate_models(
-        input_csv="Data/features/features_all.csv",
+        input_path=DEFAULT_STORE,
         results_path_tables="Results/tables/",
-        results_path_figures="Results/figures/"
+        results_path_figures="Results/figures/",
+        bundle_path=DEFAULT_BUNDLE,
+        preprocessing=None,
+        svm_probability=False,
+        n_jobs=None,
+        models_cache_dir=DEFAULT_CACHE_DIR,
+        search=False,
+        search_candidates=32,
+        search_folds=5,
+        svm_mode="auto",
+        features=None,
+        tiling=None
     ):
     """
     Entrena modelos multiclase:
@@ -22,6 +70,24 @@ def train_and_evaluate_models(
     - SVM (RBF)
     - Logistic Regression
     Evalúa y guarda métricas y matriz de confusión.
+    El mejor modelo (F1 weighted) se guarda junto con el scaler y la configuración
+    de preprocesamiento/features en bundle_path, para usarlo en inferencia.
+
+    Los modelos se entrenan en paralelo (n_jobs=None → todos los núcleos) y quedan
+    cacheados en models_cache_dir (misma data + mismos hiperparámetros → no se reentrena).
+    svm_probability=True activa la calibración de Platt del SVM (5-fold interno, mucho
+    más lento) en los tres modelos comparados. Aunque esté en False, si el SVM es el mejor
+    modelo se calibra antes de guardarlo (calibrate_for_bundle), así el bundle siempre
+    entrega probabilidades reales.
+    Con search=True los hiperparámetros de cada modelo se eligen antes con una búsqueda
+    por successive halving + StratifiedKFold sobre el train set (ver src/models/search.py);
+    el leaderboard queda en results_path_tables.
+    svm_mode: "exact" (SVC), "approx" (ApproxKernelSVM: Nyström + regresión logística,
+    lineal en filas y con probabilidades) o "auto" (approx desde APPROX_SVM_MIN_ROWS filas de train).
+    features: FeatureBuffer ya cargado en vez de leer input_path. Los modelos entrenan
+    sobre la matriz float32 del buffer, sin pasar por un DataFrame.
+    tiling: configuración de las features por tiles (se guarda en el bundle para que
+    la inferencia extraiga igual); None si son las features de la imagen 256x256.
     """
 
     print("\n🤖 Starting MULTICLASS CLASSIFICATION...\n")
@@ -32,11 +98,13 @@ def train_and_evaluate_models(
     # =====================================
     # 1. Load dataset
     # =====================================
-    df = pd.read_csv(input_csv)
+    # Solo se leen las columnas necesarias (features numéricos + species)
+    if features is None:
+        features = load_buffer(input_path, columns=feature_columns(input_path))
+    feature_cols = features.columns
 
-    feature_cols = df.select_dtypes(include=[np.number]).columns
-    X = df[feature_cols]
-    y = df["species"]
+    X = features.values
+    y = features.species
 
     # =====================================
     # 2. Train/test split
@@ -55,19 +123,41 @@ def train_and_evaluate_models(
     # =====================================
     # 4. CLASSIFIERS
     # =====================================
+    if svm_mode not in SVM_MODES:
+        raise ValueError(f"svm_mode must be one of {SVM_MODES}, got {svm_mode!r}")
+    if svm_mode == "auto":
+        svm_mode = "approx" if len(y_train) >= APPROX_SVM_MIN_ROWS else "exact"
+
+    if svm_mode == "approx":
+        svm_name, svm = "SVM_RBF_Approx", ApproxKernelSVM(random_state=42)
+    else:
+        svm_name, svm = "SVM_RBF", SVC(kernel="rbf", probability=svm_probability, random_state=42)
+
     models = {
         "RandomForest": RandomForestClassifier(n_estimators=200, random_state=42),
-        "SVM_RBF": SVC(kernel="rbf", probability=True, random_state=42),
-        "LogisticRegression": LogisticRegression(max_iter=2000, multi_class="multinomial")
+        svm_name: svm,
+        "LogisticRegression": LogisticRegression(max_iter=2000)  # lbfgs → multinomial
     }
 
-    results = {}
+    # =====================================
+    # 4b. HYPERPARAMETER SEARCH (opcional)
+    # =====================================
+    if search:
+        from src.models.search import search_models
+
+        # El scaler va dentro del Pipeline de la búsqueda (se ajusta por fold)
+        best = search_models(models, X_train, y_train, results_path_tables,
+                             n_candidates=search_candidates, n_splits=search_folds,
+                             n_jobs=n_jobs)
+        for name, params in best.items():
+            models[name].set_params(**params)
 
-    for name, model in models.items():
-        print(f"🏋️ Training model: {name}...")
-        model.fit(X_train_scaled, y_train)
+    fitted = train_models(models, X_train_scaled, y_train, X_test_scaled,
+                          n_jobs=n_jobs, cache_dir=models_cache_dir)
 
-        preds = model.predict(X_test_scaled)
+    results = {}
+
+    for name, (model, preds) in fitted.items():
 
         # Reporte de clasificación
         report = classification_report(y_test, preds, output_dict=True)
@@ -79,16 +169,20 @@ def train_and_evaluate_models(
 
         # Matriz de confusión
         cm = confusion_matrix(y_test, preds)
-        plt.figure(figsize=(10, 8))
-        sns.heatmap(cm, annot=True, fmt="d", cmap="Blues")
-        plt.title(f"Confusion Matrix - {name}")
-        plt.xlabel("Predicted")
-        plt.ylabel("True")
-        plt.tight_layout()
-        plt.savefig(os.path.join(results_path_figures, f"{name}_confusion_matrix.png"))
-        plt.close()
+        figure("heatmap", os.path.join(results_path_figures, f"{name}_confusion_matrix.png"),
+               {"matrix": cm}, title=f"Confusion Matrix - {name}", annot=True, fmt="d",
+               cmap="Blues", xlabel="Predicted", ylabel="True", figsize=[10, 8])
 
         print(f"✔ Finished: {name}")
 
+    # =====================================
+    # 5. SAVE BEST MODEL (para inferencia)
+    # =====================================
+    best_name = max(results, key=lambda name: results[name]["weighted avg"]["f1-score"])
+    # predict escribe probabilidades por clase: el modelo guardado tiene que tenerlas
+    best_model = calibrate_for_bundle(fitted[best_name][0], X_train_scaled, y_train)
+    save_model_bundle(best_model, scaler, feature_cols, best_name,
+                      bundle_path, preprocessing=preprocessing, tiling=tiling)
+
     print("\n✨ Classification Completed!\n")
     return results
@@ -0,0 +1,257 @@
+import os
+import sys
+import argparse
+import cv2
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.analysis.feature_buffer import FeatureBuffer
+from src.analysis.features import DEFAULT_EXTRACTORS, EXTRACTORS, compute_features
+from src.analysis.features_tiled import load_tiled_input, tiled_features
+from src.preprocessing.enhancement import EnhancementEngine
+from src.preprocessing.pipeline import PREPROCESSING_DEFAULTS, preprocess_bytes
+from src.utils.cache import params_key
+from src.utils.imageio import read_bytes, reencode_image
+from src.utils.prefetch import io_pipeline
+from src.utils.parallel import IMAGE_EXTENSIONS, parallel_imap, resolve_workers
+
+DEFAULT_BUNDLE = "Results/models/model_bundle.joblib"
+
+# Imágenes por lote enviado a cada worker
+BATCH_SIZE = 64
+
+
+# =====================================
+# MODEL BUNDLE
+# =====================================
+
+def save_model_bundle(model, scaler, feature_cols, model_name,
+                      bundle_path=DEFAULT_BUNDLE, preprocessing=None,
+                      extractors=DEFAULT_EXTRACTORS, tiling=None):
+    """
+    Guarda todo lo necesario para clasificar imágenes nuevas:
+    modelo entrenado, StandardScaler, orden de las columnas de features
+    y la configuración de preprocesamiento + extractores usada para entrenar.
+    tiling: configuración de extract_tiled_features si el modelo se entrenó con
+    features por tiles (ver load_tiling; None = features sobre la imagen 256x256).
+    Sus extractores reemplazan a extractors.
+    """
+    if tiling and "extractors" in tiling:
+        extractors = tiling["extractors"]
+
+    bundle = {
+        "model_name": model_name,
+        "model": model,
+        "scaler": scaler,
+        "feature_cols": list(feature_cols),
+        "classes": [str(c) for c in model.classes_],
+        "preprocessing": dict(preprocessing or PREPROCESSING_DEFAULTS),
+        "extractors": list(extractors),
+        "extractor_params": {name: params_key(EXTRACTORS[name][1]) for name in extractors},
+        "tiling": dict(tiling) if tiling else None,
+    }
+
+    os.makedirs(os.path.dirname(bundle_path) or ".", exist_ok=True)
+    joblib.dump(bundle, bundle_path)
+
+    print(f"✔ Model bundle ({model_name}) saved in: {bundle_path}")
+    return bundle_path
+
+
+def load_model_bundle(bundle_path=DEFAULT_BUNDLE):
+    """Carga el bundle y avisa si los extractores cambiaron desde el entrenamiento."""
+    bundle = joblib.load(bundle_path)
+
+    for name, key in bundle["extractor_params"].items():
+        if params_key(EXTRACTORS[name][1]) != key:
+            print(f"⚠ Extractor '{name}' changed since the model was trained; predictions may be off.")
+
+    return bundle
+
+
+# =====================================
+# PREDICTION
+# =====================================
+
+# Estado de cada worker (el bundle y CLAHE se cargan una sola vez por proceso)
+_BUNDLE = None
+_CLAHE = None
+_ENGINE = None    # mejora de contraste a resolución completa (modelos con features por tiles)
+
+
+def _init_predictor(bundle_path):
+    """Initializer de cada worker: carga el bundle y crea su objeto CLAHE."""
+    global _BUNDLE, _CLAHE, _ENGINE
+    _BUNDLE = load_model_bundle(bundle_path)
+
+    prep = _BUNDLE["preprocessing"]
+    _CLAHE = None
+    if prep["apply_clahe"]:
+        _CLAHE = cv2.createCLAHE(clipLimit=prep["clip_limit"],
+                                 tileGridSize=tuple(prep["tile_grid_size"]))
+
+    _ENGINE = None
+    tiling = _BUNDLE.get("tiling")
+    if tiling:
+        # Misma mejora de contraste que extract_tiled_features (bundles anteriores: la de prep)
+        e = tiling.get("enhancement")
+        if e:
+            _ENGINE = EnhancementEngine.create(e["equalization"], e["clahe"], e["normalization"],
+                                               e["clip_limit"], tuple(e["tile_grid_size"]))
+        else:
+            _ENGINE = EnhancementEngine(_CLAHE, prep["apply_equalization"], prep["apply_normalization"])
+
+
+def _predict_batch(paths):
+    """
+    Worker: preprocesa, extrae features y clasifica un lote de imágenes crudas.
+    Retorna una fila por imagen: path, especie predicha, probabilidad por clase (si el
+    modelo las tiene) o el motivo si la imagen fue rechazada en la validación.
+    """
+    prep = _BUNDLE["preprocessing"]
+    classes = _BUNDLE["classes"]
+    tiling = _BUNDLE.get("tiling")
+
+    rows, enhanced = [], []
+
+    # Los archivos del lote se leen por adelantado en hilos
+    with io_pipeline(paths):
+        for path in paths:
+            try:
+                data = read_bytes(path)
+            except OSError:
+                data = b""
+
+            if tiling:
+                # Features por tiles: la imagen recortada a resolución completa → una fila
+                out, reason = load_tiled_input(data, tiling["crop_ratio"], _ENGINE)
+                if out is not None:
+                    columns, values = tiled_features(out, _BUNDLE["extractors"], tiling["tile_size"],
+                                                     tiling["stride"], tiling["n_scales"], tiling["pooling"])
+                    out = dict(zip(columns, values))
+            else:
+                out, reason, _ = preprocess_bytes(
+                    data, prep["crop_ratio"], tuple(prep["size"]), clahe=_CLAHE,
+                    apply_equalization=prep["apply_equalization"],
+                    apply_normalization=prep["apply_normalization"],
+                    # bundles anteriores se entrenaron con decodificación completa
+                    reduced_decode=prep.get("reduced_decode", False)
+                )
+                # Entrenado sobre archivos: mismo encoder que write_image (la extensión del
+                # archivo original), así el modelo ve la misma pérdida que en el entrenamiento
+                if out is not None and prep.get("storage", "files") == "files":
+                    out = reencode_image(out, os.path.splitext(path)[1].lower() or ".jpg")
+
+            rows.append({"path": path, "predicted": None, "status": reason})
+            enhanced.append(out)
+
+    valid = [i for i, img in enumerate(enhanced) if img is not None]
+    if not valid:
+        return rows
+
+    if tiling:
+        feats = [enhanced[i] for i in valid]
+    else:
+        feats = compute_features([enhanced[i] for i in valid], _BUNDLE["extractors"])
+    # Mismas columnas, orden y tipo (float32) que en el feature store del entrenamiento
+    X = FeatureBuffer.from_rows(feats, _BUNDLE["feature_cols"]).values
+    if hasattr(_BUNDLE["scaler"], "feature_names_in_"):
+        # bundles anteriores se entrenaron sobre un DataFrame (con nombres de columnas)
+        X = pd.DataFrame(X, columns=_BUNDLE["feature_cols"])
+    X_scaled = _BUNDLE["scaler"].transform(X)
+
+    model = _BUNDLE["model"]
+    if not hasattr(model, "predict_proba"):
+        # Modelo sin probabilidades (bundles anteriores): solo la especie, sin columnas prob_*
+        preds = model.predict(X_scaled)
+        for j, i in enumerate(valid):
+            rows[i]["predicted"] = str(preds[j])
+        return rows
+
+    probs = model.predict_proba(X_scaled)
+    for j, i in enumerate(valid):
+        rows[i]["predicted"] = classes[int(np.argmax(probs[j]))]
+        for k, cls in enumerate(classes):
+            rows[i][f"prob_{cls}"] = probs[j, k]
+
+    return rows
+
+
+def iter_image_paths(inputs):
+    """Expande archivos y carpetas (recursivamente) a rutas de imágenes, en orden."""
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, dirs, files in os.walk(item):
+                dirs.sort()
+                for file in sorted(files):
+                    if file.lower().endswith(IMAGE_EXTENSIONS):
+                        yield os.path.join(root, file)
+        else:
+            yield item
+
+
+def _batched(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def predict_images(inputs, bundle_path=DEFAULT_BUNDLE, batch_size=BATCH_SIZE, n_workers=None):
+    """
+    Clasifica imágenes nuevas (archivos o carpetas) con el modelo guardado.
+    Las imágenes pasan por el mismo preprocesamiento y extracción de features
+    que en el entrenamiento, en lotes y en paralelo.
+    Es un generador: entrega un DataFrame por lote, en orden, a medida que están listos.
+    """
+    bundle = joblib.load(bundle_path)
+    columns = ["path", "predicted", "status"]
+    if hasattr(bundle["model"], "predict_proba"):
+        columns += [f"prob_{cls}" for cls in bundle["classes"]]
+
+    batches = _batched(iter_image_paths(inputs), batch_size)
+
+    for rows in parallel_imap(_predict_batch, batches, n_workers,
+                              initializer=_init_predictor, initargs=(bundle_path,)):
+        yield pd.DataFrame(rows, columns=columns)
+
+
+# =====================================
+# CLI
+# =====================================
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Classify new camera-trap images with a saved model bundle.")
+    parser.add_argument("inputs", nargs="+", help="Image files and/or folders")
+    parser.add_argument("--model", default=DEFAULT_BUNDLE, help="Path to the model bundle")
+    parser.add_argument("--output", default=None, help="CSV file for the predictions (default: stdout)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    args = parser.parse_args(argv)
+
+    print(f"🔮 Predicting with {args.model} | Workers: {resolve_workers(args.workers)}", file=sys.stderr)
+
+    n_images = 0
+    first = True
+    out = open(args.output, "w", encoding="utf-8", newline="") if args.output else sys.stdout
+
+    try:
+        for df in predict_images(args.inputs, args.model, args.batch_size, args.workers):
+            # Se escribe cada lote apenas está listo (streaming)
+            df.to_csv(out, index=False, header=first)
+            first = False
+            n_images += len(df)
+    finally:
+        if args.output:
+            out.close()
+
+    print(f"✔ {n_images} images classified", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+import numpy as np
+from sklearn.base import BaseEstimator, ClassifierMixin
+from sklearn.kernel_approximation import Nystroem, RBFSampler
+from sklearn.linear_model import SGDClassifier, LogisticRegression
+from sklearn.model_selection import train_test_split
+from sklearn.utils.validation import check_is_fitted
+
+# Aproximaciones del kernel RBF:
+# - "nystroem": n_components filas de referencia (se adapta a los datos, suele necesitar menos componentes)
+# - "rff":      random Fourier features (no mira los datos, solo el número de columnas)
+APPROXIMATIONS = ("nystroem", "rff")
+
+# Solvers lineales sobre las features aproximadas:
+# - "lbfgs": regresión logística multinomial en memoria (default de fit: más rápido y más preciso
+#            que SGD cuando X entra en memoria, y sus probabilidades no necesitan calibración)
+# - "sgd":   hinge loss (SVM lineal) por mini-batches → es lo que usa partial_fit (streaming)
+SOLVERS = ("lbfgs", "sgd")
+
+
+class ApproxKernelSVM(ClassifierMixin, BaseEstimator):
+    """
+    SVM RBF aproximado que escala a cientos de miles de filas:
+    X → mapa de features del kernel (Nyström o random Fourier features) → clasificador lineal.
+    El costo es lineal en el número de filas (SVC es cuadrático/cúbico).
+    fit (X en memoria) usa solver="lbfgs" por defecto; partial_fit entrena con SGD por
+    mini-batches (streaming con batches del feature store), igual que fit con solver="sgd".
+
+    Con SGD las probabilidades se calibran sobre una parte separada del train set
+    (calibration_fraction): una regresión logística multinomial sobre los scores del
+    modelo (Platt multiclase), en vez del 5-fold interno de SVC(probability=True).
+    Con lbfgs el modelo ya es una regresión logística y usa todo el train set.
+    Espera X ya escalado (StandardScaler), igual que SVC en train_and_evaluate_models.
+    """
+
+    def __init__(self, approximation="nystroem", n_components=1000, gamma="scale", solver="lbfgs",
+                 alpha=1e-5, C=10.0, n_epochs=10, batch_size=4096, calibration_fraction=0.1,
+                 random_state=42):
+        self.approximation = approximation
+        self.n_components = n_components
+        self.gamma = gamma
+        self.solver = solver
+        self.alpha = alpha
+        self.C = C
+        self.n_epochs = n_epochs
+        self.batch_size = batch_size
+        self.calibration_fraction = calibration_fraction
+        self.random_state = random_state
+
+    # =====================================
+    # MAPA DEL KERNEL
+    # =====================================
+
+    def _gamma(self, X):
+        # "scale" como en SVC: 1 / (n_features * var(X))
+        if self.gamma == "scale":
+            var = X.var()
+            return 1.0 / (X.shape[1] * var) if var > 0 else 1.0
+        return self.gamma
+
+    def _fit_feature_map(self, X):
+        # Nyström elige n_components filas al azar de X: con todo X, la muestra es de todo el set
+        if self.approximation not in APPROXIMATIONS:
+            raise ValueError(f"approximation must be one of {APPROXIMATIONS}, got {self.approximation!r}")
+        if self.approximation == "nystroem":
+            n_components = min(self.n_components, len(X))
+            feature_map = Nystroem(kernel="rbf", gamma=self._gamma(X), n_components=n_components,
+                                   random_state=self.random_state)
+        else:
+            feature_map = RBFSampler(gamma=self._gamma(X), n_components=self.n_components,
+                                     random_state=self.random_state)
+        self.feature_map_ = feature_map.fit(X)
+
+    def transform(self, X):
+        """Features aproximadas del kernel (float32 para ahorrar memoria en batches grandes)."""
+        check_is_fitted(self, "feature_map_")
+        return self.feature_map_.transform(np.asarray(X, dtype=np.float64)).astype(np.float32)
+
+    def _batches(self, n_rows, rng):
+        order = rng.permutation(n_rows)
+        for start in range(0, n_rows, self.batch_size):
+            yield order[start:start + self.batch_size]
+
+    # =====================================
+    # ENTRENAMIENTO
+    # =====================================
+
+    def partial_fit(self, X, y, classes=None):
+        """
+        Un mini-batch de SGD (streaming; siempre SGD, sin importar solver). En la primera
+        llamada hay que pasar classes (todas las clases posibles) y, si el mapa del kernel
+        no está ajustado, se ajusta con ese batch.
+        Después de los batches, calibrate(X_cal, y_cal) habilita predict_proba calibrado.
+        """
+        X = np.asarray(X, dtype=np.float64)
+
+        if not hasattr(self, "linear_"):
+            if classes is None:
+                raise ValueError("classes must be passed on the first call to partial_fit")
+            if not hasattr(self, "feature_map_"):
+                self._fit_feature_map(X)
+            self.classes_ = np.unique(classes)
+            self.linear_ = SGDClassifier(loss="hinge", alpha=self.alpha, average=True,
+                                         random_state=self.random_state)
+            self.calibrator_ = None
+
+        self.linear_.partial_fit(self.transform(X), y, classes=self.classes_)
+        return self
+
+    def fit(self, X, y):
+        if self.solver not in SOLVERS:
+            raise ValueError(f"solver must be one of {SOLVERS}, got {self.solver!r}")
+        X = np.asarray(X, dtype=np.float64)
+        y = np.asarray(y)
+
+        # SGD: parte del train set queda afuera para calibrar las probabilidades
+        X_cal = y_cal = None
+        n_classes = len(np.unique(y))
+        if (self.solver == "sgd" and self.calibration_fraction
+                and len(y) * self.calibration_fraction >= 2 * n_classes):
+            X, X_cal, y, y_cal = train_test_split(X, y, test_size=self.calibration_fraction,
+                                                  stratify=y, random_state=self.random_state)
+
+        for attr in ("linear_", "feature_map_", "calibrator_"):
+            self.__dict__.pop(attr, None)
+
+        # El mapa del kernel (y gamma="scale") se ajusta una vez sobre todo X, antes de los batches
+        self._fit_feature_map(X)
+
+        if self.solver == "lbfgs":
+            self.classes_ = np.unique(y)
+            self.linear_ = LogisticRegression(C=self.C, max_iter=1000).fit(self.transform(X), y)
+            self.calibrator_ = None
+        else:
+            rng = np.random.default_rng(self.random_state)
+            classes = np.unique(y)
+            for _ in range(self.n_epochs):
+                for idx in self._batches(len(y), rng):
+                    self.partial_fit(X[idx], y[idx], classes=classes)
+
+        if X_cal is not None:
+            self.calibrate(X_cal, y_cal)
+        return self
+
+    def calibrate(self, X, y):
+        """
+        Calibra las probabilidades con datos que el modelo no vio:
+        regresión logística multinomial sobre los scores (decision_function).
+        """
+        self.calibrator_ = LogisticRegression(max_iter=1000).fit(self._scores(X), np.asarray(y))
+        return self
+
+    # =====================================
+    # PREDICCIÓN
+    # =====================================
+
+    def _scores(self, X):
+        scores = self.linear_.decision_function(self.transform(X))
+        # Dos clases: decision_function es 1D
+        return scores[:, None] if scores.ndim == 1 else scores
+
+    def decision_function(self, X):
+        check_is_fitted(self, "linear_")
+        return self.linear_.decision_function(self.transform(X))
+
+    def predict_proba(self, X):
+        """Probabilidades calibradas (o softmax de los scores si no hubo calibración)."""
+        check_is_fitted(self, "linear_")
+        if self.calibrator_ is not None:
+            proba = self.calibrator_.predict_proba(self._scores(X))
+            # Las clases del calibrador son las vistas en la calibración: se alinean a classes_
+            out = np.zeros((len(proba), len(self.classes_)))
+            out[:, np.searchsorted(self.classes_, self.calibrator_.classes_)] = proba
+            return out
+        if isinstance(self.linear_, LogisticRegression):
+            return self.linear_.predict_proba(self.transform(X))
+
+        scores = self._scores(X)
+        if scores.shape[1] == 1:
+            scores = np.hstack([-scores, scores])
+        scores = scores - scores.max(axis=1, keepdims=True)
+        exp = np.exp(scores)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
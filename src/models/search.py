@@ -0,0 +1,188 @@
+import os
+import json
+import tempfile
+from math import floor, log
+import numpy as np
+import pandas as pd
+from scipy.stats import loguniform
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401 (habilita HalvingRandomSearchCV)
+from sklearn.model_selection import HalvingRandomSearchCV, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.svm import SVC
+from sklearn.linear_model import LogisticRegression
+
+from src.models.kernel_approx import ApproxKernelSVM
+
+from src.utils.parallel import resolve_workers
+
+# Espacio de búsqueda por modelo (mismos nombres que en train_and_evaluate_models):
+# nombre → (función que crea el estimador base, distribuciones de hiperparámetros)
+SEARCH_SPACES = {
+    "RandomForest": (
+        lambda: RandomForestClassifier(random_state=42),
+        {
+            "n_estimators": [100, 200, 400],
+            "max_depth": [None, 10, 20, 40],
+            "min_samples_leaf": [1, 2, 4],
+            "max_features": ["sqrt", "log2", 0.5],
+        },
+    ),
+    "SVM_RBF": (
+        lambda: SVC(kernel="rbf", random_state=42),
+        {
+            "C": loguniform(1e-1, 1e3),
+            "gamma": loguniform(1e-4, 1e0),
+        },
+    ),
+    "SVM_RBF_Approx": (
+        lambda: ApproxKernelSVM(random_state=42),
+        {
+            "C": loguniform(1e-1, 1e3),
+            "gamma": loguniform(1e-4, 1e0),
+            "n_components": [500, 1000, 2000],
+        },
+    ),
+    "LogisticRegression": (
+        lambda: LogisticRegression(max_iter=2000),
+        {
+            "C": loguniform(1e-3, 1e2),
+        },
+    ),
+}
+
+LEADERBOARD_NAME = "model_search_leaderboard.csv"
+
+# Con pocos datos (menos rondas de las que pide n_candidates) se permiten a lo sumo
+# esta cantidad de rondas extra de eliminación con el mínimo de filas (aggressive_elimination)
+MAX_EXTRA_ROUNDS = 2
+
+
+def register_search_space(name, make_estimator, distributions):
+    """Agrega (o reemplaza) el espacio de búsqueda de un modelo."""
+    SEARCH_SPACES[name] = (make_estimator, distributions)
+
+
+def _levels(n, factor):
+    """Cuántas potencias de factor (1, factor, factor², ...) son <= n: 1 + floor(log_factor(n)), exacto."""
+    levels, power = 0, 1
+    while power <= n:
+        levels += 1
+        power *= factor
+    return levels
+
+
+def _sklearn_levels(n, factor):
+    # La misma cuenta con floats, como en HalvingRandomSearchCV: en potencias exactas del
+    # factor da una menos (log(243, 3) = 4.999...)
+    return 1 + floor(log(n, factor))
+
+
+def halving_schedule(n_rows, n_candidates, n_splits, n_classes, factor=3):
+    """
+    Rondas de successive halving que terminan con todo el set (mismas fórmulas que
+    HalvingRandomSearchCV). La primera ronda necesita al menos 2 filas por clase en
+    cada fold; eso limita cuántas rondas entran en n_rows:
+    - si entran todas las que pide n_candidates: min_resources = n_rows / factor^(rondas-1)
+      (como min_resources="exhaust"), y la última ronda usa todas las filas
+      (salvo un resto menor que factor^(rondas-1))
+    - si no: n_candidates se recorta a lo que se puede eliminar con MAX_EXTRA_ROUNDS rondas
+      extra y esas rondas se hacen con el mínimo de filas (aggressive_elimination);
+      con datos para una sola ronda es una búsqueda al azar sobre todo el set
+    Las rondas se cuentan con enteros; si HalvingRandomSearchCV (que usa floor(log(...)))
+    contaría una menos, se corrigen sus entradas (un candidato más / una fila menos en la
+    primera ronda) para que haga las mismas rondas.
+    Retorna (n_candidates, min_resources, aggressive_elimination).
+    """
+    smallest = min(n_rows, n_splits * 2 * n_classes)
+    n_possible = _levels(n_rows // smallest, factor)
+
+    n_candidates = min(n_candidates, factor ** (n_possible - 1 + MAX_EXTRA_ROUNDS))
+    n_required = _levels(n_candidates, factor)
+
+    n_rounds = min(n_possible, n_required)
+    aggressive = 1 < n_possible < n_required
+    min_resources = n_rows // factor ** (n_rounds - 1)
+
+    if _sklearn_levels(n_candidates, factor) < n_required:
+        n_candidates += 1
+    first_ratio = n_rows // min_resources
+    if min_resources > 1 and _sklearn_levels(first_ratio, factor) < _levels(first_ratio, factor):
+        min_resources -= 1
+    return n_candidates, min_resources, aggressive
+
+
+def search_model(name, X, y, n_candidates=32, n_splits=5, factor=3, n_jobs=None, random_state=42):
+    """
+    Búsqueda de hiperparámetros de un modelo con successive halving:
+    n_candidates configuraciones al azar se evalúan con StratifiedKFold sobre una parte
+    de los datos; solo el mejor 1/factor pasa a la siguiente ronda con factor veces más
+    filas, y la última ronda usa todo el set (ver halving_schedule). Los folds corren en
+    paralelo (n_jobs).
+    El StandardScaler va dentro del Pipeline (sin fuga de datos entre folds) y se cachea
+    en un directorio temporal de la búsqueda: el mismo fold escalado se reutiliza para
+    todos los candidatos, y la caché se borra al terminar.
+    Retorna el HalvingRandomSearchCV ajustado.
+    """
+    make_estimator, distributions = SEARCH_SPACES[name]
+    params = {f"model__{key}": value for key, value in distributions.items()}
+
+    cv = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=random_state)
+    n_candidates, min_resources, aggressive = halving_schedule(len(y), n_candidates, n_splits,
+                                                               len(np.unique(y)), factor)
+
+    with tempfile.TemporaryDirectory(prefix="search_scalers_") as scaler_cache:
+        pipeline = Pipeline([("scaler", StandardScaler()), ("model", make_estimator())], memory=scaler_cache)
+        search = HalvingRandomSearchCV(
+            pipeline, params, n_candidates=n_candidates, factor=factor, cv=cv,
+            scoring="f1_weighted", n_jobs=resolve_workers(n_jobs), random_state=random_state,
+            min_resources=min_resources, aggressive_elimination=aggressive,
+            refit=False, error_score=np.nan
+        )
+        search.fit(np.asarray(X), np.asarray(y))
+    return search
+
+
+def _leaderboard_rows(name, search):
+    results = search.cv_results_
+    for i, params in enumerate(results["params"]):
+        yield {
+            "model": name,
+            "iteration": int(results["iter"][i]),
+            "n_samples": int(results["n_resources"][i]),
+            "mean_f1_weighted": results["mean_test_score"][i],
+            "std_f1_weighted": results["std_test_score"][i],
+            "params": json.dumps({key.removeprefix("model__"): value for key, value in params.items()}),
+        }
+
+
+def search_models(names, X, y, tables_path="Results/tables/", n_candidates=32, n_splits=5,
+                  factor=3, n_jobs=None, random_state=42):
+    """
+    Corre search_model para cada modelo y guarda el leaderboard en
+    tables_path/model_search_leaderboard.csv (todas las configuraciones evaluadas,
+    de la última ronda a la primera y por score).
+    Retorna dict nombre → mejores hiperparámetros (sin el prefijo del Pipeline).
+    """
+    os.makedirs(tables_path, exist_ok=True)
+    print(f"\n🔎 Hyperparameter search (successive halving, {n_splits}-fold, "
+          f"up to {n_candidates} candidates per model) | Workers: {resolve_workers(n_jobs)}")
+
+    rows, best = [], {}
+    for name in names:
+        search = search_model(name, X, y, n_candidates, n_splits, factor, n_jobs, random_state)
+        # Tipos de Python (no np.float64) para que los hiperparámetros se vean bien en logs y caché
+        best[name] = {key.removeprefix("model__"): value.item() if isinstance(value, np.generic) else value
+                      for key, value in search.best_params_.items()}
+        rows.extend(_leaderboard_rows(name, search))
+        print(f"✔ {name}: best F1 (weighted) = {search.best_score_:.4f} | {best[name]} "
+              f"| candidates / rows per round: {search.n_candidates_} / {search.n_resources_}")
+
+    leaderboard = pd.DataFrame(rows).sort_values(
+        ["model", "iteration", "mean_f1_weighted"], ascending=[True, False, False])
+    leaderboard_path = os.path.join(tables_path, LEADERBOARD_NAME)
+    leaderboard.to_csv(leaderboard_path, index=False)
+    print(f"✔ Leaderboard saved in: {leaderboard_path}\n")
+
+    return best
@@ -0,0 +1,130 @@
+import os
+import glob
+import hashlib
+import tempfile
+import joblib
+import numpy as np
+from joblib import Parallel, delayed
+
+from src.utils.parallel import resolve_workers
+
+DEFAULT_CACHE_DIR = "Results/models/cache"
+
+# Modelos a los que les sirven los núcleos que sobran (n_jobs paraleliza el fit).
+# Lista explícita: en otros (p. ej. LogisticRegression) n_jobs no tiene efecto y está deprecado.
+PARALLEL_ESTIMATORS = ("RandomForestClassifier", "ExtraTreesClassifier")
+
+
+def data_fingerprint(*arrays):
+    """Hash del contenido de las matrices/etiquetas (mismo dato → mismo fingerprint)."""
+    h = hashlib.blake2b(digest_size=16)
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr)
+        h.update(str((arr.shape, arr.dtype.str)).encode())
+        if arr.dtype == object:
+            h.update("\x1f".join(map(str, arr.ravel())).encode())
+        else:
+            h.update(arr.tobytes())
+    return h.hexdigest()
+
+
+def model_key(name, model, fingerprint):
+    """Llave de caché de un modelo: nombre + hiperparámetros + fingerprint de los datos."""
+    params = sorted((k, repr(v)) for k, v in model.get_params().items())
+    text = f"{name}|{type(model).__name__}|{params}|{fingerprint}"
+    return hashlib.blake2b(text.encode(), digest_size=12).hexdigest()
+
+
+def _share(arr, path):
+    """Guarda la matriz una vez en disco (.npy) para que los workers la abran con memmap."""
+    np.save(path, np.ascontiguousarray(arr))
+    return path
+
+
+def _prune_cache(cache_dir, fingerprint):
+    """
+    Borra de la caché los modelos entrenados con otros datos (otro fingerprint)
+    y las matrices .npy que dejaban versiones anteriores: la caché no crece sin límite.
+    """
+    for path in glob.glob(os.path.join(cache_dir, "*.joblib")):
+        if not os.path.basename(path).startswith(fingerprint + "_"):
+            os.remove(path)
+    for path in glob.glob(os.path.join(cache_dir, "X_*.npy")):
+        os.remove(path)
+
+
+def _fit_one(name, model, X_train_path, y_train, X_test_path, model_path):
+    """
+    Worker: entrena un modelo sobre la matriz compartida (memory-mapped),
+    predice el test set y guarda el modelo en la caché.
+    """
+    X_train = np.load(X_train_path, mmap_mode="r")
+    X_test = np.load(X_test_path, mmap_mode="r")
+
+    model.fit(X_train, y_train)
+    preds = model.predict(X_test)
+
+    joblib.dump(model, model_path)
+    return name, model, preds
+
+
+def _split_cores(models, n_jobs):
+    """
+    Reparte los núcleos: cada modelo corre en su propio proceso y los de
+    PARALLEL_ESTIMATORS (p. ej. RandomForest) usan los núcleos que sobran.
+    """
+    spare = max(1, n_jobs - (len(models) - 1))
+    for model in models.values():
+        if type(model).__name__ in PARALLEL_ESTIMATORS and model.get_params().get("n_jobs") is None:
+            model.set_params(n_jobs=spare)
+
+
+def train_models(models, X_train, y_train, X_test, n_jobs=None, cache_dir=DEFAULT_CACHE_DIR,
+                 use_cache=True):
+    """
+    Entrena varios modelos a la vez (un proceso por modelo) sobre las mismas matrices.
+    - X_train / X_test se escriben una sola vez como .npy en un directorio temporal y cada
+      worker las abre con memmap (no se copian a cada proceso); se borran al terminar.
+    - Cada modelo entrenado se guarda en cache_dir con una llave = datos + hiperparámetros:
+      si nada cambió, se carga del disco en vez de reentrenar. Solo se conservan los
+      modelos de los datos actuales (los de otro fingerprint se borran).
+    Retorna dict nombre → (modelo entrenado, predicciones sobre X_test), en el orden de models.
+    """
+    n_jobs = resolve_workers(n_jobs)
+    os.makedirs(cache_dir, exist_ok=True)
+
+    y_train = np.asarray(y_train)
+    fingerprint = data_fingerprint(X_train, y_train)
+
+    _prune_cache(cache_dir, fingerprint)
+
+    results = {}
+    pending = {}
+
+    for name, model in models.items():
+        model_path = os.path.join(cache_dir, f"{fingerprint}_{name}_{model_key(name, model, fingerprint)}.joblib")
+
+        if use_cache and os.path.exists(model_path):
+            print(f"♻ Loading cached model: {name}")
+            cached = joblib.load(model_path)
+            results[name] = (cached, cached.predict(X_test))
+        else:
+            pending[name] = (model, model_path)
+
+    if pending:
+        print(f"🏋️ Training {len(pending)} model(s) in parallel: {', '.join(pending)}")
+        _split_cores({name: model for name, (model, _) in pending.items()}, n_jobs)
+
+        with tempfile.TemporaryDirectory(prefix="train_models_") as tmp_dir:
+            X_train_path = _share(X_train, os.path.join(tmp_dir, "X_train.npy"))
+            X_test_path = _share(X_test, os.path.join(tmp_dir, "X_test.npy"))
+
+            fitted = Parallel(n_jobs=min(n_jobs, len(pending)))(
+                delayed(_fit_one)(name, model, X_train_path, y_train, X_test_path, model_path)
+                for name, (model, model_path) in pending.items()
+            )
+
+        for name, model, preds in fitted:
+            results[name] = (model, preds)
+
+    return {name: results[name] for name in models}
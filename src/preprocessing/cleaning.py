@@ -1,10 +1,33 @@
 import os
 import cv2
 import numpy as np
+from operator import itemgetter
+
+from src.preprocessing.duplicates import MAX_DISTANCE, dhash, find_duplicates
+from src.utils.cache import StageCache, MANIFEST_NAME, CACHED, hash_bytes
+from src.utils.imageio import read_bytes, decode_image, image_size, reduced_flag, write_bytes
+from src.utils.parallel import list_images, parallel_map, print_species_summary, resolve_workers
+
+# Lado mínimo de la versión reducida usada para el test de varianza (modo rápido)
+REDUCED_MIN_SIDE = 64
+
 
 def is_valid_image(path, min_width=200, min_height=200):
     """Check if an image is readable, has minimum size, and is not fully black/white."""
-    img = cv2.imread(path)
+    valid, reason, _ = validate_bytes(_read_or_empty(path), min_width, min_height)
+    return valid, reason
+
+
+def _read_or_empty(path):
+    # Archivo inexistente o ilegible → bytes vacíos → se rechaza como "Unreadable/Corrupted"
+    try:
+        return read_bytes(path)
+    except OSError:
+        return b""
+
+
+def check_image(img, min_width=200, min_height=200):
+    """Same checks as is_valid_image, but on an already decoded image (BGR)."""
 
     # 1. Archivo dañado o ilegible
     if img is None:
@@ -24,50 +47,142 @@ def is_valid_image(path, min_width=200, min_height=200):
     return True, "OK"
 
 
-def clean_dataset(input_dir, output_dir="Data/processed/clean"):
+def validate_bytes(data, min_width=200, min_height=200):
+    """
+    Validación barata a partir de los bytes del archivo:
+    - el tamaño se lee de la cabecera JPEG/PNG (sin decodificar)
+    - el test de varianza se hace sobre una decodificación reducida en grises
+      (el JPEG se decodifica directo a 1/2, 1/4 o 1/8 en el dominio DCT)
+    Retorna (valid, reason, gray reducida o None).
+    """
+    size = image_size(data)
+
+    if size is None:
+        # Formato/cabecera no reconocidos: validación completa
+        img = decode_image(data, cv2.IMREAD_COLOR)
+        valid, reason = check_image(img, min_width, min_height)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if valid else None
+        return valid, reason, gray
+
+    w, h = size
+    if w < min_width or h < min_height:
+        return False, f"Too small ({w}x{h})", None
+
+    gray = decode_image(data, reduced_flag(w, h, REDUCED_MIN_SIDE, REDUCED_MIN_SIDE, grayscale=True))
+    if gray is None:
+        return False, "Unreadable/Corrupted", None
+
+    if np.std(gray) < 2:
+        return False, "Almost blank (low variance)", None
+
+    return True, "OK", gray
+
+
+def _copy_file(path, out_path, data, link):
+    """Copia el archivo válido tal cual (o crea un hardlink si link=True)."""
+    if link:
+        try:
+            if os.path.exists(out_path):
+                os.remove(out_path)
+            os.link(path, out_path)
+            return
+        except OSError:
+            # Otro disco / sistema de archivos sin hardlinks → copia normal
+            pass
+
+    write_bytes(out_path, data)
+
+
+def _clean_one(task):
+    """
+    Worker: valida una imagen y la copia si es válida.
+    Retorna (digest, reason, phash); phash es el hash perceptual de las imágenes válidas.
+    """
+    path, out_path, min_width, min_height, known_hash, fast, link = task
+
+    data = _read_or_empty(path)
+    digest = hash_bytes(data)
+    if digest == known_hash:
+        return digest, CACHED, None
+
+    if fast:
+        valid, reason, gray = validate_bytes(data, min_width, min_height)
+    else:
+        # Modo completo: decodifica la imagen entera (comportamiento original)
+        img = decode_image(data, cv2.IMREAD_COLOR)
+        valid, reason = check_image(img, min_width, min_height)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY) if valid else None
+
+    if not valid:
+        return digest, reason, None
+
+    # Copiar imagen válida al destino (bytes originales, sin recodificar)
+    _copy_file(path, out_path, data, link)
+
+    return digest, reason, dhash(gray)
+
+
+def clean_dataset(input_dir, output_dir="Data/processed/clean", min_width=200, min_height=200,
+                  n_workers=None, use_cache=True, fast=True, link=False,
+                  find_dups=True, max_distance=MAX_DISTANCE):
     """
     Cleans dataset by filtering corrupted, tiny, or blank images.
     Keeps same folder structure (one folder per species).
+    Images are processed in parallel (n_workers=None → all cores).
+    With use_cache=True, images whose content and parameters did not change
+    since the last run are skipped (see src/utils/cache.py).
+    - fast=True: size from the JPEG/PNG header + variance test on a reduced decode
+      (fast=False decodes every image at full resolution).
+    - Valid images are copied byte-for-byte; link=True creates hardlinks instead.
+    - find_dups=True flags exact and near-duplicate frames (camera-trap bursts)
+      in duplicates.csv. They are only flagged, not removed.
     """
     os.makedirs(output_dir, exist_ok=True)
 
-    rejected_log = []  # para registrar imágenes descartadas
-
     print("\n🔍 Starting DATA CLEANING...")
     print(f"Input  directory: {input_dir}")
-    print(f"Output directory: {output_dir}\n")
+    print(f"Output directory: {output_dir}")
+    print(f"Mode: {'fast (header + reduced decode)' if fast else 'full decode'}"
+          f"{' | hardlinks' if link else ''}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
 
-    # Recorrer especies
-    for species in os.listdir(input_dir):
-        species_path = os.path.join(input_dir, species)
+    images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
 
-        if not os.path.isdir(species_path):
-            continue
+    cache = StageCache(os.path.join(output_dir, MANIFEST_NAME),
+                       {"stage": "clean", "min_width": min_width, "min_height": min_height,
+                        "fast": fast, "phash": "dhash64"},
+                       enabled=use_cache)
 
-        print(f"Processing species: {species}")
+    # Crear carpetas destino
+    for species in {species for species, _, _ in images}:
+        os.makedirs(os.path.join(output_dir, species), exist_ok=True)
 
-        # Crear carpeta destino
-        out_species_dir = os.path.join(output_dir, species)
-        os.makedirs(out_species_dir, exist_ok=True)
+    tasks = []
+    for key, (species, file, path) in zip(keys, images):
+        out_path = os.path.join(output_dir, species, file)
+        tasks.append((path, out_path, min_width, min_height, cache.known_hash(key, out_path), fast, link))
 
-        # Recorrer imágenes
-        for file in os.listdir(species_path):
-            path = os.path.join(species_path, file)
+    results = parallel_map(_clean_one, tasks, n_workers, prefetch=itemgetter(0))
 
-            if not file.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
+    # Hash perceptual por imagen (de la caché si la imagen se saltó)
+    hashes = []
+    for key, (digest, reason, phash) in zip(keys, results):
+        if reason == CACHED:
+            cache.mark_cached()
+            phash = cache.entry(key).get("phash")
+        else:
+            cache.record(key, digest, reason, phash=phash)
+        hashes.append((key, digest, phash))
 
-            valid, reason = is_valid_image(path)
+    cache.save(keys)
 
-            if valid:
-                # Copiar imagen válida al destino
-                img = cv2.imread(path)
-                cv2.imwrite(os.path.join(out_species_dir, file), img)
-            else:
-                # Registrar imagen descartada
-                rejected_log.append((path, reason))
+    print_species_summary(images)
+    print(cache.summary(len(images)))
 
-        print(f"✔ Finished {species}")
+    # Registrar imágenes descartadas (incluye las que vienen de la caché)
+    rejected_log = [(path, cache.reason(key)) for key, (_, _, path) in zip(keys, images)
+                    if cache.reason(key) != "OK"]
 
     # Guardar log de imágenes rechazadas con codificación UTF-8
     log_path = os.path.join(output_dir, "rejected_images.txt")
@@ -75,6 +190,20 @@ def clean_dataset(input_dir, output_dir="Data/processed/clean"):
         for path, reason in rejected_log:
             f.write(f"{path} -> {reason}\n")
 
+    # Duplicados exactos y casi duplicados entre las imágenes válidas
+    if find_dups:
+        valid = [item for item in hashes if cache.reason(item[0]) == "OK"]
+        duplicates = find_duplicates(valid, max_distance)
+
+        dup_path = os.path.join(output_dir, "duplicates.csv")
+        with open(dup_path, "w", encoding="utf-8") as f:
+            f.write("image,duplicate_of,distance,kind\n")
+            for key, original, distance, kind in duplicates:
+                f.write(f"{key},{original},{distance},{kind}\n")
+
+        n_exact = sum(1 for d in duplicates if d[3] == "exact")
+        print(f"Duplicates: {n_exact} exact | {len(duplicates) - n_exact} near (saved in {dup_path})")
+
     print("\n✨ CLEANING COMPLETED")
     print(f"Valid images saved in: {output_dir}")
     print(f"Rejected images logged in: {log_path}\n")
@@ -1,50 +1,72 @@
 import os
 import cv2
+from operator import itemgetter
 
-def crop_images(input_dir, output_dir="Data/processed/cropped", crop_ratio=0.10):
+from src.utils.cache import StageCache, MANIFEST_NAME, CACHED, load_if_changed
+from src.utils.imageio import write_image
+from src.utils.parallel import list_images, parallel_map, print_species_summary, resolve_workers
+
+
+def crop_image(img, crop_ratio=0.10):
+    """Recorta el % inferior de una imagen ya cargada en memoria."""
+    h = img.shape[0]
+
+    # Calcular altura nueva quitando el % inferior
+    crop_h = int(h * (1 - crop_ratio))
+
+    return img[:crop_h, :]  # recorte arriba → abajo
+
+
+def _crop_one(task):
+    """Worker: recorta una imagen y la guarda. Retorna (digest, reason)."""
+    img_path, out_path, crop_ratio, known_hash = task
+
+    img, digest = load_if_changed(img_path, known_hash, cv2.IMREAD_COLOR)
+    if digest == known_hash:
+        return digest, CACHED
+
+    if img is None:
+        return digest, "Unreadable/Corrupted"
+
+    write_image(out_path, crop_image(img, crop_ratio))
+    return digest, "OK"
+
+
+def crop_images(input_dir, output_dir="Data/processed/cropped", crop_ratio=0.10,
+                n_workers=None, use_cache=True):
     """
     Recorta el % inferior de cada imagen del dataset.
     Mantiene la estructura de carpetas por especie.
+    Las imágenes se procesan en paralelo (n_workers=None → todos los núcleos).
+    Con use_cache=True solo se procesan imágenes nuevas o modificadas.
     """
     os.makedirs(output_dir, exist_ok=True)
 
     print("\n✂️ Starting CROPPING...")
     print(f"Input  directory: {input_dir}")
     print(f"Output directory: {output_dir}")
-    print(f"Crop ratio: {crop_ratio * 100}%\n")
-
-    for species in os.listdir(input_dir):
-        species_path = os.path.join(input_dir, species)
-
-        if not os.path.isdir(species_path):
-            continue
-
-        print(f"Processing species: {species}")
-
-        out_species_dir = os.path.join(output_dir, species)
-        os.makedirs(out_species_dir, exist_ok=True)
-
-        for file in os.listdir(species_path):
-            if not file.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
-
-            img_path = os.path.join(species_path, file)
-            img = cv2.imread(img_path)
+    print(f"Crop ratio: {crop_ratio * 100}%")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
 
-            if img is None:
-                continue
+    images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
 
-            h, w = img.shape[:2]
+    cache = StageCache(os.path.join(output_dir, MANIFEST_NAME),
+                       {"stage": "crop", "crop_ratio": crop_ratio}, enabled=use_cache)
 
-            # Calcular altura nueva quitando el % inferior
-            crop_h = int(h * (1 - crop_ratio))
+    for species in {species for species, _, _ in images}:
+        os.makedirs(os.path.join(output_dir, species), exist_ok=True)
 
-            cropped_img = img[:crop_h, :]  # recorte arriba → abajo
+    tasks = []
+    for key, (species, file, path) in zip(keys, images):
+        out_path = os.path.join(output_dir, species, file)
+        tasks.append((path, out_path, crop_ratio, cache.known_hash(key, out_path)))
 
-            out_path = os.path.join(out_species_dir, file)
-            cv2.imwrite(out_path, cropped_img)
+    results = parallel_map(_crop_one, tasks, n_workers, prefetch=itemgetter(0))
+    cache.update(keys, results)
 
-        print(f"✔ Finished {species}")
+    print_species_summary(images)
+    print(cache.summary(len(images)))
 
     print("\n✨ CROPPING COMPLETED!")
     print(f"Cropped images saved in: {output_dir}\n")
@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+
+# Distancia de Hamming máxima (sobre 64 bits) para considerar dos fotos casi iguales
+MAX_DISTANCE = 4
+
+
+def dhash(gray):
+    """
+    Hash perceptual (dHash, 64 bits) de una imagen en grises.
+    Compara cada píxel con su vecino de la derecha en una versión 9x8:
+    es estable ante recompresión, cambios de brillo leves y pequeños desplazamientos
+    (típico de las fotos en ráfaga de una cámara trampa).
+    Retorna el hash como string hexadecimal de 16 caracteres.
+    """
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = small[:, 1:] > small[:, :-1]
+    return np.packbits(bits).tobytes().hex()
+
+
+def hamming(a, b):
+    return bin(int(a, 16) ^ int(b, 16)).count("1")
+
+
+class DuplicateIndex:
+    """
+    Índice de hashes perceptuales para encontrar fotos casi duplicadas sin comparar
+    todas contra todas.
+    El hash de 64 bits se parte en max_distance + 1 bandas: si dos hashes difieren en
+    a lo sumo max_distance bits, al menos una banda es idéntica (palomar), así que
+    solo se comparan los hashes que comparten alguna banda.
+    """
+
+    def __init__(self, max_distance=MAX_DISTANCE):
+        self.max_distance = max_distance
+        n_bands = max_distance + 1
+        self.band_bits = 64 // n_bands
+        self.n_bands = n_bands
+        self.buckets = [{} for _ in range(n_bands)]
+        self.exact = {}
+
+    def _bands(self, phash):
+        value = int(phash, 16)
+        mask = (1 << self.band_bits) - 1
+        return [(value >> (b * self.band_bits)) & mask for b in range(self.n_bands)]
+
+    def query(self, phash):
+        """Retorna (key, distancia) del elemento más parecido dentro del umbral, o None."""
+        best = None
+        seen = set()
+        for band, bucket in zip(self._bands(phash), self.buckets):
+            for key, other in bucket.get(band, ()):
+                if key in seen:
+                    continue
+                seen.add(key)
+                d = hamming(phash, other)
+                if d <= self.max_distance and (best is None or d < best[1]):
+                    best = (key, d)
+        return best
+
+    def add(self, key, phash):
+        for band, bucket in zip(self._bands(phash), self.buckets):
+            bucket.setdefault(band, []).append((key, phash))
+
+
+def find_duplicates(items, max_distance=MAX_DISTANCE):
+    """
+    Marca duplicados exactos (mismo hash de contenido) y casi duplicados (dHash cercano).
+    items: lista ordenada de (key, digest, phash). La primera aparición de cada grupo
+    queda como original y el resto apunta a ella.
+    Ojo: con cámara fija, dos fotos de la misma escena con un animal pequeño también
+    quedan cerca; por eso los duplicados solo se marcan, no se borran.
+    Retorna una lista de (key, original, distancia, "exact" | "near").
+    """
+    index = DuplicateIndex(max_distance)
+    by_digest = {}
+    duplicates = []
+
+    for key, digest, phash in items:
+        if digest in by_digest:
+            duplicates.append((key, by_digest[digest], 0, "exact"))
+            continue
+        by_digest[digest] = key
+
+        if phash is None:
+            continue
+
+        match = index.query(phash)
+        if match is not None:
+            duplicates.append((key, match[0], match[1], "near"))
+        else:
+            index.add(key, phash)
+
+    return duplicates
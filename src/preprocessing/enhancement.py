@@ -1,69 +1,245 @@
 import os
+import time
 import cv2
 import numpy as np
 
-def enhance_images(input_dir, output_dir="Data/processed/enhanced", 
-                   apply_equalization=True, apply_clahe=True, apply_normalization=True):
+from src.utils.cache import StageCache, MANIFEST_NAME, CACHED, load_if_changed
+from src.utils.imageio import write_image
+from src.utils.instrumentation import count
+from src.utils.parallel import list_images, parallel_map, print_species_summary, resolve_workers
+
+
+class EnhancementEngine:
     """
-    Aplica mejoras de contraste:
-    - Histogram Equalization (global)
-    - CLAHE (local adaptative)
-    - Normalization 0–255
-    Mantiene estructura por especie.
-    Solo funciona con imágenes en escala de grises.
+    Mejora de contraste reutilizable (una por worker):
+    - un solo objeto CLAHE
+    - buffers preasignados por tamaño de imagen; cada paso escribe con dst= (sin copias)
+    - la normalización min-max se salta cuando la imagen ya va de 0 a 255
+      (después de equalizeHist casi siempre es así: el resultado sería idéntico)
+    - acumula el costo de cada paso en `timings` (y en los contadores del RunReport)
     """
-    
-    os.makedirs(output_dir, exist_ok=True)
 
-    print("\n⚡ Starting ENHANCEMENT...")
-    print(f"Input  directory: {input_dir}")
-    print(f"Output directory: {output_dir}")
-    print(f"Options: Equalization={apply_equalization}, CLAHE={apply_clahe}, Normalization={apply_normalization}\n")
+    STEPS = ("equalization", "clahe", "normalization")
+
+    def __init__(self, clahe=None, apply_equalization=True, apply_normalization=True):
+        self.clahe = clahe
+        self.apply_equalization = apply_equalization
+        self.apply_normalization = apply_normalization
+        self._buffers = {}
+
+        self.timings = dict.fromkeys(self.STEPS, 0.0)
+        self.n_images = 0
+        self.n_normalization_skipped = 0
+
+    @classmethod
+    def create(cls, apply_equalization=True, apply_clahe=True, apply_normalization=True,
+               clip_limit=2.0, tile_grid_size=(8, 8)):
+        clahe = cv2.createCLAHE(clipLimit=clip_limit, tileGridSize=tuple(tile_grid_size)) if apply_clahe else None
+        return cls(clahe, apply_equalization, apply_normalization)
+
+    def _buffer(self, name, shape):
+        key = (name, shape)
+        if key not in self._buffers:
+            self._buffers[key] = np.empty(shape, dtype=np.uint8)
+        return self._buffers[key]
+
+    def _timed(self, step, start):
+        elapsed = time.perf_counter() - start
+        self.timings[step] += elapsed
+        count(**{f"enhance_{step}_s": elapsed})
+
+    def apply(self, gray, out=None):
+        """
+        Mejora una imagen en grises (uint8). Mismo resultado que enhance_image.
+        Si no se pasa out, el resultado queda en un buffer interno que se reutiliza
+        en la siguiente llamada (copiarlo si hay que conservarlo).
+        """
+        if out is None:
+            out = self._buffer("out", gray.shape)
+
+        self.n_images += 1
+        current = gray
+
+        # --- Histogram Equalization ---
+        if self.apply_equalization:
+            start = time.perf_counter()
+            # Si después viene CLAHE, se ecualiza en el buffer auxiliar (CLAHE no es in-place)
+            dst = self._buffer("scratch", gray.shape) if self.clahe is not None else out
+            cv2.equalizeHist(current, dst=dst)
+            current = dst
+            self._timed("equalization", start)
+
+        # --- CLAHE ---
+        if self.clahe is not None:
+            start = time.perf_counter()
+            self.clahe.apply(current, dst=out)
+            current = out
+            self._timed("clahe", start)
+
+        # --- Normalization ---
+        if self.apply_normalization:
+            start = time.perf_counter()
+            low, high, _, _ = cv2.minMaxLoc(current)
+            if low == 0 and high == 255:
+                # Ya ocupa todo el rango: la normalización no cambia nada
+                self.n_normalization_skipped += 1
+                count(enhance_normalization_skipped=1)
+            else:
+                cv2.normalize(current, out, alpha=0, beta=255, norm_type=cv2.NORM_MINMAX)
+                current = out
+            self._timed("normalization", start)
+
+        if current is not out:
+            np.copyto(out, current)
+
+        return out
+
+    def apply_batch(self, images, out=None):
+        """
+        Mejora un lote (N, h, w) de imágenes del mismo tamaño.
+        El resultado va a out (N, h, w) si se pasa; si no, a un buffer interno reutilizable.
+        """
+        if out is None:
+            out = self._buffer("batch", images.shape)
+
+        for i in range(len(images)):
+            self.apply(images[i], out=out[i])
+
+        return out
+
+    def report(self):
+        """Costo acumulado por paso (segundos totales y ms por imagen)."""
+        n = max(self.n_images, 1)
+        lines = [f"{step}: {t:.3f}s ({1000 * t / n:.2f} ms/img)" for step, t in self.timings.items() if t > 0]
+        if self.apply_normalization:
+            lines.append(f"normalization skipped (no-op): {self.n_normalization_skipped}/{self.n_images}")
+        return " | ".join(lines)
+
+
+def enhance_image(gray, clahe=None, apply_equalization=True, apply_normalization=True):
+    """
+    Aplica la mejora de contraste a una sola imagen en escala de grises.
+    Si se pasa un objeto CLAHE se aplica entre la ecualización y la normalización.
+    """
+    return EnhancementEngine(clahe, apply_equalization, apply_normalization).apply(gray)
+
 
-    # Crear objeto CLAHE (solo si está activado)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8,8)) if apply_clahe else None
+def enhancement_params(apply_equalization=True, apply_clahe=True, apply_normalization=True,
+                       clip_limit=2.0, tile_grid_size=(8, 8)):
+    """Parámetros de la mejora de contraste (para la caché de etapas)."""
+    return {
+        "equalization": apply_equalization,
+        "clahe": apply_clahe,
+        "clip_limit": clip_limit,
+        "tile_grid_size": list(tile_grid_size),
+        "normalization": apply_normalization
+    }
 
-    for species in os.listdir(input_dir):
-        species_path = os.path.join(input_dir, species)
-        
-        if not os.path.isdir(species_path):
-            continue
 
-        print(f"Processing species: {species}")
+# Motor de mejora de cada worker (cv2.CLAHE no se puede enviar entre procesos)
+_ENGINE = None
 
-        out_species_dir = os.path.join(output_dir, species)
-        os.makedirs(out_species_dir, exist_ok=True)
 
-        for file in os.listdir(species_path):
-            if not file.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
+def init_worker_engine(apply_equalization=True, apply_clahe=True, apply_normalization=True,
+                       clip_limit=2.0, tile_grid_size=(8, 8)):
+    """Initializer de cada worker: crea su propio EnhancementEngine (CLAHE + buffers)."""
+    global _ENGINE
+    _ENGINE = EnhancementEngine.create(apply_equalization, apply_clahe, apply_normalization,
+                                       clip_limit, tile_grid_size)
 
-            img_path = os.path.join(species_path, file)
-            gray = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
 
-            if gray is None:
-                continue
+def get_worker_engine():
+    """EnhancementEngine creado por init_worker_engine en este proceso."""
+    return _ENGINE
 
-            enhanced = gray.copy()
 
-            # --- Histogram Equalization ---
-            if apply_equalization:
-                enhanced = cv2.equalizeHist(enhanced)
+# Imágenes por tarea enviada a cada worker
+BATCH_SIZE = 32
 
-            # --- CLAHE ---
-            if apply_clahe:
-                enhanced = clahe.apply(enhanced)
 
-            # --- Normalization ---
-            if apply_normalization:
-                enhanced = cv2.normalize(enhanced, None, alpha=0, beta=255, 
-                                         norm_type=cv2.NORM_MINMAX)
+def _batch_paths(tasks):
+    return [task[0] for task in tasks]
 
+
+def _enhance_batch(tasks):
+    """
+    Worker: mejora un lote de imágenes y las guarda. Retorna (digest, reason) por imagen.
+    Las imágenes del mismo tamaño se procesan juntas sobre un buffer preasignado.
+    """
+    results, grays = [], {}
+
+    for i, (img_path, out_path, known_hash) in enumerate(tasks):
+        gray, digest = load_if_changed(img_path, known_hash, cv2.IMREAD_GRAYSCALE)
+        if digest == known_hash:
+            results.append((digest, CACHED))
+        elif gray is None:
+            results.append((digest, "Unreadable/Corrupted"))
+        else:
+            results.append((digest, "OK"))
+            grays[i] = gray
+
+    by_shape = {}
+    for i, gray in grays.items():
+        by_shape.setdefault(gray.shape, []).append(i)
+
+    for idxs in by_shape.values():
+        enhanced = _ENGINE.apply_batch(np.stack([grays[i] for i in idxs]))
+        for j, i in enumerate(idxs):
             # Guardar imagen mejorada
-            out_path = os.path.join(out_species_dir, file)
-            cv2.imwrite(out_path, enhanced)
+            write_image(tasks[i][1], enhanced[j])
+
+    return results
+
+
+def enhance_images(input_dir, output_dir="Data/processed/enhanced", 
+                   apply_equalization=True, apply_clahe=True, apply_normalization=True,
+                   clip_limit=2.0, tile_grid_size=(8, 8), n_workers=None, use_cache=True):
+    """
+    Aplica mejoras de contraste:
+    - Histogram Equalization (global)
+    - CLAHE (local adaptative)
+    - Normalization 0–255
+    Mantiene estructura por especie.
+    Solo funciona con imágenes en escala de grises.
+    Las imágenes se procesan en paralelo (n_workers=None → todos los núcleos).
+    Con use_cache=True solo se procesan imágenes nuevas o modificadas.
+    """
+    
+    os.makedirs(output_dir, exist_ok=True)
 
-        print(f"✔ Finished {species}")
+    print("\n⚡ Starting ENHANCEMENT...")
+    print(f"Input  directory: {input_dir}")
+    print(f"Output directory: {output_dir}")
+    print(f"Options: Equalization={apply_equalization}, CLAHE={apply_clahe}, Normalization={apply_normalization}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
+
+    images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
+
+    cache = StageCache(os.path.join(output_dir, MANIFEST_NAME),
+                       {"stage": "enhance", **enhancement_params(apply_equalization, apply_clahe,
+                                                                 apply_normalization, clip_limit,
+                                                                 tile_grid_size)},
+                       enabled=use_cache)
+
+    for species in {species for species, _, _ in images}:
+        os.makedirs(os.path.join(output_dir, species), exist_ok=True)
+
+    tasks = []
+    for key, (species, file, path) in zip(keys, images):
+        out_path = os.path.join(output_dir, species, file)
+        tasks.append((path, out_path, cache.known_hash(key, out_path)))
+
+    # Cada worker crea su EnhancementEngine (CLAHE + buffers) y procesa lotes
+    batches = [tasks[i:i + BATCH_SIZE] for i in range(0, len(tasks), BATCH_SIZE)]
+    results = parallel_map(_enhance_batch, batches, n_workers, initializer=init_worker_engine,
+                           initargs=(apply_equalization, apply_clahe, apply_normalization,
+                                     clip_limit, tile_grid_size),
+                           prefetch=_batch_paths)
+    cache.update(keys, [result for batch in results for result in batch])
+
+    print_species_summary(images)
+    print(cache.summary(len(images)))
 
     print("\n✨ ENHANCEMENT COMPLETED!")
     print(f"Enhanced images saved in: {output_dir}\n")
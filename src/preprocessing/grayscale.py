@@ -1,46 +1,68 @@
 import os
 import cv2
+from operator import itemgetter
 
-def convert_to_grayscale(input_dir, output_dir="Data/processed/grayscale"):
+from src.utils.cache import StageCache, MANIFEST_NAME, CACHED, load_if_changed
+from src.utils.imageio import write_image
+from src.utils.parallel import list_images, parallel_map, print_species_summary, resolve_workers
+
+
+def to_grayscale(img):
+    """Convierte una imagen BGR a escala de grises (si ya es gris la deja igual)."""
+    if img.ndim == 2:
+        return img
+    return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+
+def _grayscale_one(task):
+    """Worker: convierte una imagen a escala de grises y la guarda. Retorna (digest, reason)."""
+    img_path, out_path, known_hash = task
+
+    img, digest = load_if_changed(img_path, known_hash, cv2.IMREAD_COLOR)
+    if digest == known_hash:
+        return digest, CACHED
+
+    if img is None:
+        return digest, "Unreadable/Corrupted"
+
+    write_image(out_path, to_grayscale(img))
+    return digest, "OK"
+
+
+def convert_to_grayscale(input_dir, output_dir="Data/processed/grayscale",
+                         n_workers=None, use_cache=True):
     """
     Convierte todas las imágenes del dataset a escala de grises.
     Mantiene la estructura de carpetas por especie.
+    Las imágenes se procesan en paralelo (n_workers=None → todos los núcleos).
+    Con use_cache=True solo se procesan imágenes nuevas o modificadas.
     """
     os.makedirs(output_dir, exist_ok=True)
 
     print("\n🖤 Starting GRAYSCALE CONVERSION...")
     print(f"Input  directory: {input_dir}")
-    print(f"Output directory: {output_dir}\n")
-
-    for species in os.listdir(input_dir):
-        species_path = os.path.join(input_dir, species)
-
-        if not os.path.isdir(species_path):
-            continue
-
-        print(f"Processing species: {species}")
-
-        out_species_dir = os.path.join(output_dir, species)
-        os.makedirs(out_species_dir, exist_ok=True)
+    print(f"Output directory: {output_dir}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
 
-        for file in os.listdir(species_path):
-            if not file.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
+    images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
 
-            img_path = os.path.join(species_path, file)
-            img = cv2.imread(img_path)
+    cache = StageCache(os.path.join(output_dir, MANIFEST_NAME),
+                       {"stage": "grayscale"}, enabled=use_cache)
 
-            if img is None:
-                continue
+    for species in {species for species, _, _ in images}:
+        os.makedirs(os.path.join(output_dir, species), exist_ok=True)
 
-            # Convertir a escala de grises
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    tasks = []
+    for key, (species, file, path) in zip(keys, images):
+        out_path = os.path.join(output_dir, species, file)
+        tasks.append((path, out_path, cache.known_hash(key, out_path)))
 
-            # Guardar imagen
-            out_path = os.path.join(out_species_dir, file)
-            cv2.imwrite(out_path, gray)
+    results = parallel_map(_grayscale_one, tasks, n_workers, prefetch=itemgetter(0))
+    cache.update(keys, results)
 
-        print(f"✔ Finished {species}")
+    print_species_summary(images)
+    print(cache.summary(len(images)))
 
     print("\n✨ GRAYSCALE COMPLETED!")
     print(f"Grayscale images saved in: {output_dir}\n")
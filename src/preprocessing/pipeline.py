@@ -0,0 +1,307 @@
+import os
+import cv2
+import numpy as np
+
+from src.preprocessing.cleaning import check_image
+from src.preprocessing.crop import crop_image
+from src.preprocessing.resize import resize_image
+from src.preprocessing.grayscale import to_grayscale
+from src.preprocessing.enhancement import (
+    enhance_image,
+    enhancement_params,
+    init_worker_engine,
+    get_worker_engine
+)
+from src.utils.cache import StageCache, MANIFEST_NAME, CACHED, hash_bytes
+from src.utils.imageio import read_bytes, decode_image, decode_for_size, image_size, write_image
+from src.utils.prefetch import io_pipeline
+from src.utils.parallel import list_images, parallel_imap, print_species_summary, resolve_workers
+from src.utils.tensor_store import DEFAULT_TENSOR_STORE, TensorStoreWriter, is_tensor_store, open_tensor_store
+
+# Parámetros por defecto del preprocesamiento (los mismos que usa main.py).
+# Se guardan junto al modelo para que la inferencia procese igual que el entrenamiento.
+PREPROCESSING_DEFAULTS = {
+    "crop_ratio": 0.10,
+    "size": (256, 256),
+    "apply_equalization": True,
+    "apply_clahe": True,
+    "apply_normalization": True,
+    "clip_limit": 2.0,
+    "tile_grid_size": (8, 8),
+    "reduced_decode": True,
+    # De dónde leyó la extracción de features las imágenes mejoradas:
+    # "files" (JPG/PNG de write_image, con la pérdida del encoder) o "tensors" (sin pérdida).
+    # La inferencia repite el mismo paso para ver los mismos píxeles que el entrenamiento.
+    "storage": "files",
+}
+
+# Orden de las etapas intermedias (mismo nombre que las carpetas de Data/processed)
+INTERMEDIATE_STAGES = ("clean", "cropped", "resized", "grayscale")
+
+# Formatos de salida: una imagen por archivo, tensor store (shards .npy) o ambos
+OUTPUT_FORMATS = ("files", "tensors", "both")
+
+# Imágenes por tarea enviada a cada worker
+BATCH_SIZE = 32
+
+
+def _enhance(gray, clahe, apply_equalization, apply_normalization, engine):
+    if engine is not None:
+        return engine.apply(gray)
+    return enhance_image(gray, clahe, apply_equalization, apply_normalization)
+
+
+def preprocess_image(img, crop_ratio=0.10, size=(256, 256), min_width=200, min_height=200,
+                     clahe=None, apply_equalization=True, apply_normalization=True,
+                     keep_intermediates=False, engine=None):
+    """
+    Aplica todo el preprocesamiento a una imagen ya decodificada (BGR):
+    validación → recorte → resize → escala de grises → mejora de contraste.
+    Si se pasa un EnhancementEngine se usa en lugar de clahe/apply_*; la imagen
+    retornada vive en un buffer del engine hasta la siguiente llamada.
+
+    Retorna (enhanced, reason, intermediates):
+    - enhanced: imagen final o None si la imagen fue rechazada
+    - reason: "OK" o el motivo del rechazo (igual que is_valid_image)
+    - intermediates: dict etapa → imagen (solo si keep_intermediates=True)
+    """
+    intermediates = {} if keep_intermediates else None
+
+    valid, reason = check_image(img, min_width, min_height)
+    if not valid:
+        return None, reason, intermediates
+
+    cropped = crop_image(img, crop_ratio)
+    resized = resize_image(cropped, size)
+    gray = to_grayscale(resized)
+    enhanced = _enhance(gray, clahe, apply_equalization, apply_normalization, engine)
+
+    if keep_intermediates:
+        intermediates["clean"] = img
+        intermediates["cropped"] = cropped
+        intermediates["resized"] = resized
+        intermediates["grayscale"] = gray
+
+    return enhanced, reason, intermediates
+
+
+def preprocess_bytes(data, crop_ratio=0.10, size=(256, 256), min_width=200, min_height=200,
+                     clahe=None, apply_equalization=True, apply_normalization=True,
+                     reduced_decode=True, keep_intermediates=False, engine=None):
+    """
+    Igual que preprocess_image, pero a partir de los bytes del archivo.
+    Con reduced_decode=True el tamaño mínimo se valida con la cabecera y la imagen
+    se decodifica directo en grises a la menor escala DCT (1/2, 1/4, 1/8) que,
+    recortada, sigue siendo mayor que size; el test de varianza se hace sobre esa versión.
+    Las etapas intermedias (keep_intermediates) necesitan la imagen a color completa,
+    así que en ese caso se decodifica todo como antes.
+    """
+    header = image_size(data) if reduced_decode and not keep_intermediates else None
+
+    if header is None:
+        return preprocess_image(decode_image(data, cv2.IMREAD_COLOR), crop_ratio, size,
+                                min_width, min_height, clahe, apply_equalization,
+                                apply_normalization, keep_intermediates, engine)
+
+    w, h = header
+    if w < min_width or h < min_height:
+        return None, f"Too small ({w}x{h})", None
+
+    gray = decode_for_size(data, size, crop_ratio, grayscale=True)
+    if gray is None:
+        return None, "Unreadable/Corrupted", None
+
+    if np.std(gray) < 2:
+        return None, "Almost blank (low variance)", None
+
+    resized = resize_image(crop_image(gray, crop_ratio), size)
+    return _enhance(resized, clahe, apply_equalization, apply_normalization, engine), "OK", None
+
+
+def _preprocess_one(task):
+    """
+    Worker: preprocesa una imagen de principio a fin.
+    Retorna (digest, reason, enhanced); enhanced solo si return_array=True (tensor store).
+    out_path=None → no se escribe el archivo.
+    """
+    (path, out_path, debug_paths, crop_ratio, size, reduced_decode, return_array, known_hash) = task
+
+    try:
+        data = read_bytes(path)
+    except OSError:
+        # Archivo inexistente o ilegible: bytes vacíos → se rechaza como "Unreadable/Corrupted"
+        data = b""
+    digest = hash_bytes(data)
+    if digest == known_hash:
+        return digest, CACHED, None
+
+    enhanced, reason, intermediates = preprocess_bytes(
+        data, crop_ratio, size,
+        reduced_decode=reduced_decode,
+        keep_intermediates=debug_paths is not None,
+        engine=get_worker_engine()
+    )
+
+    if enhanced is None:
+        return digest, reason, None
+
+    if out_path is not None:
+        write_image(out_path, enhanced)
+
+    if debug_paths is not None:
+        for stage, stage_img in intermediates.items():
+            write_image(debug_paths[stage], stage_img)
+
+    # El resultado está en el buffer del engine: se copia solo si hay que devolverlo
+    return digest, reason, enhanced.copy() if return_array else None
+
+
+def _preprocess_batch(tasks):
+    """
+    Worker: procesa un lote de imágenes (menos envíos entre procesos).
+    Los archivos del lote se leen por adelantado y las salidas se escriben en segundo plano.
+    """
+    with io_pipeline([task[0] for task in tasks]):
+        return [_preprocess_one(task) for task in tasks]
+
+
+def run_preprocessing(input_dir, output_dir="Data/processed/enhanced",
+                      crop_ratio=0.10, size=(256, 256),
+                      apply_equalization=True, apply_clahe=True, apply_normalization=True,
+                      clip_limit=2.0, tile_grid_size=(8, 8),
+                      save_intermediates=False, intermediates_dir="Data/processed",
+                      reduced_decode=True, output_format="files", tensor_path=DEFAULT_TENSOR_STORE,
+                      n_workers=None, use_cache=True):
+    """
+    Pipeline de preprocesamiento fusionado.
+    Cada imagen se decodifica UNA sola vez y se procesa en memoria
+    (cleaning, crop, resize, grayscale, enhancement); solo se escribe la imagen final.
+    Con save_intermediates=True también se guardan las etapas intermedias
+    en intermediates_dir/<etapa>/<especie>/ (útil para depurar).
+    Con reduced_decode=True cada JPEG se decodifica en grises y a escala reducida
+    (ver preprocess_bytes), salvo si se guardan las etapas intermedias.
+    output_format:
+    - "files": una imagen por archivo en output_dir/<especie>/ (comportamiento original)
+    - "tensors": todas las imágenes en un tensor store (shards .npy + índice) en tensor_path,
+      que los extractores leen con memmap sin decodificar
+    - "both": las dos cosas
+    En output_dir siempre quedan el manifest de la caché y rejected_images.txt.
+    Mantiene estructura por especie.
+    Las imágenes se procesan en paralelo (n_workers=None → todos los núcleos).
+    Con use_cache=True solo se procesan imágenes nuevas o modificadas
+    (o todas si cambia algún parámetro).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    print("\n🚀 Starting FUSED PREPROCESSING...")
+    print(f"Input  directory: {input_dir}")
+    print(f"Output directory: {output_dir}")
+    print(f"Crop ratio: {crop_ratio * 100}% | Resize size: {size}")
+    print(f"Options: Equalization={apply_equalization}, CLAHE={apply_clahe}, Normalization={apply_normalization}")
+    print(f"Save intermediates: {save_intermediates} | Output format: {output_format}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
+
+    images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
+
+    params = {
+        "stage": "fused",
+        "crop_ratio": crop_ratio,
+        "size": list(size),
+        "save_intermediates": save_intermediates,
+        "reduced_decode": reduced_decode,
+        "interpolation": "area",
+        **enhancement_params(apply_equalization, apply_clahe, apply_normalization,
+                             clip_limit, tile_grid_size)
+    }
+    cache = StageCache(os.path.join(output_dir, MANIFEST_NAME), params, enabled=use_cache)
+
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}, got {output_format!r}")
+
+    write_files = output_format in ("files", "both")
+    write_tensors = output_format in ("tensors", "both")
+
+    # Tensor store anterior: de ahí salen las imágenes que no cambiaron
+    previous = None
+    previous_pos = {}
+    if write_tensors and use_cache and is_tensor_store(tensor_path):
+        previous = open_tensor_store(tensor_path)
+        if previous.shape == tuple(size[::-1]):
+            previous_pos = previous.positions()
+
+    for species in {species for species, _, _ in images}:
+        if write_files:
+            os.makedirs(os.path.join(output_dir, species), exist_ok=True)
+
+        if save_intermediates:
+            for stage in INTERMEDIATE_STAGES:
+                os.makedirs(os.path.join(intermediates_dir, stage, species), exist_ok=True)
+
+    tasks = []
+    for key, (species, file, path) in zip(keys, images):
+        out_path = os.path.join(output_dir, species, file) if write_files else None
+
+        debug_paths = None
+        if save_intermediates:
+            debug_paths = {stage: os.path.join(intermediates_dir, stage, species, file)
+                           for stage in INTERMEDIATE_STAGES}
+
+        known_hash = cache.known_hash(key, out_path)
+        if write_tensors and cache.reason(key) == "OK" and key not in previous_pos:
+            known_hash = None
+
+        tasks.append((path, out_path, debug_paths, crop_ratio, size, reduced_decode,
+                      write_tensors, known_hash))
+
+    writer = TensorStoreWriter(tensor_path, size[::-1]) if write_tensors else None
+
+    batches = (tasks[i:i + BATCH_SIZE] for i in range(0, len(tasks), BATCH_SIZE))
+    results = []
+    done = 0
+
+    # Resultados en orden y en streaming: el tensor store se llena a medida que llegan
+    for batch_results in parallel_imap(_preprocess_batch, batches, n_workers,
+                                       initializer=init_worker_engine,
+                                       initargs=(apply_equalization, apply_clahe, apply_normalization,
+                                                 clip_limit, tile_grid_size)):
+        for digest, reason, enhanced in batch_results:
+            key = keys[done]
+            species, file, _ = images[done]
+            done += 1
+            results.append((digest, reason))
+
+            if writer is None:
+                continue
+
+            if reason == CACHED:
+                if cache.reason(key) == "OK":
+                    pos = previous_pos[key]
+                    writer.add(species, file, previous.image(pos), previous.hashes[pos])
+            elif enhanced is not None:
+                writer.add(species, file, enhanced, hash_bytes(enhanced.tobytes()))
+
+    if writer is not None:
+        writer.close()
+
+    cache.update(keys, results)
+
+    print_species_summary(images)
+    print(cache.summary(len(images)))
+
+    # Registrar imágenes descartadas (incluye las que vienen de la caché)
+    rejected_log = [(path, cache.reason(key)) for key, (_, _, path) in zip(keys, images)
+                    if cache.reason(key) != "OK"]
+
+    # Guardar log de imágenes rechazadas con codificación UTF-8
+    log_path = os.path.join(output_dir, "rejected_images.txt")
+    with open(log_path, "w", encoding="utf-8") as f:
+        for path, reason in rejected_log:
+            f.write(f"{path} -> {reason}\n")
+
+    print("\n✨ FUSED PREPROCESSING COMPLETED!")
+    if write_files:
+        print(f"Enhanced images saved in: {output_dir}")
+    if write_tensors:
+        print(f"Tensor store saved in: {tensor_path}")
+    print(f"Rejected images logged in: {log_path}\n")
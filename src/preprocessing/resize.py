@@ -1,47 +1,131 @@
 import os
 import cv2
+from operator import itemgetter
 
-def resize_images(input_dir, output_dir="Data/processed/resized", size=(256, 256)):
+from src.preprocessing.crop import crop_image
+from src.utils.cache import StageCache, MANIFEST_NAME, CACHED, load_if_changed
+from src.utils.imageio import write_image
+from src.utils.parallel import list_images, parallel_map, print_species_summary, resolve_workers
+
+
+def resize_image(img, size=(256, 256)):
+    """
+    Redimensiona una imagen ya cargada en memoria.
+    Usa interpolación por área: al achicar promedia los píxeles (sin aliasing).
+    """
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
+
+
+def _resize_one(task):
+    """Worker: redimensiona una imagen y la guarda. Retorna (digest, reason)."""
+    img_path, out_path, size, known_hash = task
+
+    img, digest = load_if_changed(img_path, known_hash, cv2.IMREAD_COLOR, size=size)
+    if digest == known_hash:
+        return digest, CACHED
+
+    if img is None:
+        return digest, "Unreadable/Corrupted"
+
+    write_image(out_path, resize_image(img, size))
+    return digest, "OK"
+
+
+def _crop_resize_one(task):
+    """Worker: recorta y redimensiona una imagen (decodificación reducida). Retorna (digest, reason)."""
+    img_path, out_path, crop_ratio, size, grayscale, known_hash = task
+
+    flags = cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+    img, digest = load_if_changed(img_path, known_hash, flags, size=size, crop_ratio=crop_ratio)
+    if digest == known_hash:
+        return digest, CACHED
+
+    if img is None:
+        return digest, "Unreadable/Corrupted"
+
+    write_image(out_path, resize_image(crop_image(img, crop_ratio), size))
+    return digest, "OK"
+
+
+def resize_images(input_dir, output_dir="Data/processed/resized", size=(256, 256),
+                  n_workers=None, use_cache=True):
     """
     Redimensiona todas las imágenes del dataset al tamaño indicado (por defecto 256x256).
     Mantiene la estructura de carpetas por especie.
+    Las imágenes se procesan en paralelo (n_workers=None → todos los núcleos).
+    Con use_cache=True solo se procesan imágenes nuevas o modificadas.
     """
     os.makedirs(output_dir, exist_ok=True)
 
     print("\n📐 Starting RESIZE...")
     print(f"Input  directory: {input_dir}")
     print(f"Output directory: {output_dir}")
-    print(f"Resize size: {size}\n")
+    print(f"Resize size: {size}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
 
-    for species in os.listdir(input_dir):
-        species_path = os.path.join(input_dir, species)
+    images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
 
-        if not os.path.isdir(species_path):
-            continue
+    cache = StageCache(os.path.join(output_dir, MANIFEST_NAME),
+                       {"stage": "resize", "size": list(size), "interpolation": "area", "decode": "reduced"},
+                       enabled=use_cache)
 
-        print(f"Processing species: {species}")
+    for species in {species for species, _, _ in images}:
+        os.makedirs(os.path.join(output_dir, species), exist_ok=True)
 
-        out_species_dir = os.path.join(output_dir, species)
-        os.makedirs(out_species_dir, exist_ok=True)
+    tasks = []
+    for key, (species, file, path) in zip(keys, images):
+        out_path = os.path.join(output_dir, species, file)
+        tasks.append((path, out_path, size, cache.known_hash(key, out_path)))
 
-        for file in os.listdir(species_path):
-            if not file.lower().endswith((".jpg", ".jpeg", ".png")):
-                continue
+    results = parallel_map(_resize_one, tasks, n_workers, prefetch=itemgetter(0))
+    cache.update(keys, results)
 
-            img_path = os.path.join(species_path, file)
-            img = cv2.imread(img_path)
+    print_species_summary(images)
+    print(cache.summary(len(images)))
 
-            if img is None:
-                continue
+    print("\n✨ RESIZE COMPLETED!")
+    print(f"Resized images saved in: {output_dir}\n")
 
-            # Redimensionar imagen
-            resized = cv2.resize(img, size)
 
-            # Guardar imagen
-            out_path = os.path.join(out_species_dir, file)
-            cv2.imwrite(out_path, resized)
+def crop_resize_images(input_dir, output_dir="Data/processed/resized", crop_ratio=0.10, size=(256, 256),
+                       grayscale=False, n_workers=None, use_cache=True):
+    """
+    Recorte + resize en una sola etapa (reemplaza crop_images → resize_images).
+    Cada JPEG se decodifica directamente a la menor escala (1/2, 1/4, 1/8) que después
+    del recorte sigue siendo mayor que size, y luego se recorta y se achica por área.
+    No se escribe la imagen recortada a resolución completa.
+    Con grayscale=True se decodifica directo en grises (si la etapa siguiente no usa color).
+    """
+    os.makedirs(output_dir, exist_ok=True)
 
-        print(f"✔ Finished {species}")
+    print("\n✂️📐 Starting CROP + RESIZE...")
+    print(f"Input  directory: {input_dir}")
+    print(f"Output directory: {output_dir}")
+    print(f"Crop ratio: {crop_ratio * 100}% | Resize size: {size} | Grayscale: {grayscale}")
+    print(f"Workers: {resolve_workers(n_workers)}\n")
 
-    print("\n✨ RESIZE COMPLETED!")
+    images = list_images(input_dir)
+    keys = [f"{species}/{file}" for species, file, _ in images]
+
+    cache = StageCache(os.path.join(output_dir, MANIFEST_NAME),
+                       {"stage": "crop_resize", "crop_ratio": crop_ratio, "size": list(size),
+                        "grayscale": grayscale, "interpolation": "area", "decode": "reduced"},
+                       enabled=use_cache)
+
+    for species in {species for species, _, _ in images}:
+        os.makedirs(os.path.join(output_dir, species), exist_ok=True)
+
+    tasks = []
+    for key, (species, file, path) in zip(keys, images):
+        out_path = os.path.join(output_dir, species, file)
+        tasks.append((path, out_path, crop_ratio, size, grayscale, cache.known_hash(key, out_path)))
+
+    results = parallel_map(_crop_resize_one, tasks, n_workers, prefetch=itemgetter(0))
+    cache.update(keys, results)
+
+    print_species_summary(images)
+    print(cache.summary(len(images)))
+
+    print("\n✨ CROP + RESIZE COMPLETED!")
     print(f"Resized images saved in: {output_dir}\n")
@@ -0,0 +1,134 @@
+import os
+import json
+import hashlib
+
+import cv2
+
+from src.utils.imageio import read_bytes, decode_image, decode_for_size
+
+MANIFEST_NAME = ".cache_manifest.json"
+
+# Resultado que retorna un worker cuando la imagen no cambió y se saltó
+CACHED = "cached"
+
+
+def hash_bytes(data):
+    """Hash del contenido de un archivo (rápido, 128 bits)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def params_key(params):
+    """Representación estable de los parámetros de una etapa (para comparar)."""
+    return json.dumps(params, sort_keys=True, default=str)
+
+
+def load_if_changed(path, known_hash, flags, size=None, crop_ratio=0.0):
+    """
+    Lee el archivo y calcula su hash.
+    - Si coincide con known_hash retorna (None, digest): no hace falta decodificar.
+    - Si no, retorna (img, digest) con la imagen ya decodificada (o None si está dañada).
+    Así el archivo se lee una sola vez aunque haya que procesarlo.
+    Con size, la imagen se decodifica reducida (ver decode_for_size) cuando
+    la etapa igual la va a achicar a ese tamaño.
+    """
+    data = read_bytes(path)
+    digest = hash_bytes(data)
+
+    if digest == known_hash:
+        return None, digest
+
+    if size is not None:
+        return decode_for_size(data, size, crop_ratio, grayscale=flags == cv2.IMREAD_GRAYSCALE), digest
+
+    return decode_image(data, flags), digest
+
+
+class StageCache:
+    """
+    Manifest de caché por imagen para una etapa del pipeline.
+    Guarda, por cada imagen ("species/file"), el hash de su contenido de entrada
+    y los parámetros con que se procesó. Si ambos coinciden en la siguiente corrida
+    (y la salida sigue existiendo), la imagen no se vuelve a procesar.
+    """
+
+    def __init__(self, manifest_path, params, enabled=True):
+        self.manifest_path = manifest_path
+        self.params = params_key(params)
+        self.enabled = enabled
+        self.entries = {}
+        self.meta = {}
+        self.n_cached = 0
+
+        if enabled and os.path.exists(manifest_path):
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            self.entries = manifest.get("entries", {})
+            self.meta = manifest.get("meta", {})
+
+    def entry(self, key):
+        """Entrada guardada para la imagen (None si no hay o si cambiaron los parámetros)."""
+        if not self.enabled:
+            return None
+
+        entry = self.entries.get(key)
+        if entry is None or entry.get("params") != self.params:
+            return None
+
+        return entry
+
+    def known_hash(self, key, out_path=None):
+        """
+        Hash esperado de la entrada si la imagen se puede saltar, si no None.
+        Si la imagen fue válida se exige además que su salida exista.
+        """
+        entry = self.entry(key)
+        if entry is None:
+            return None
+
+        if entry.get("reason", "OK") == "OK" and out_path is not None and not os.path.exists(out_path):
+            return None
+
+        return entry["hash"]
+
+    def reason(self, key):
+        entry = self.entries.get(key, {})
+        return entry.get("reason", "OK")
+
+    def record(self, key, digest, reason="OK", **fields):
+        """Registra el resultado de procesar una imagen."""
+        self.entries[key] = {"hash": digest, "params": self.params, "reason": reason, **fields}
+
+    def mark_cached(self):
+        self.n_cached += 1
+
+    def update(self, keys, results):
+        """
+        Actualiza el manifest con los resultados de los workers
+        ((digest, reason) por imagen, en el mismo orden que keys) y lo guarda.
+        """
+        for key, (digest, reason) in zip(keys, results):
+            if reason == CACHED:
+                self.mark_cached()
+            else:
+                self.record(key, digest, reason)
+
+        self.save(keys)
+
+    def save(self, keys):
+        """Guarda el manifest, eliminando las imágenes que ya no están en el dataset."""
+        if not self.enabled:
+            return
+
+        keys = set(keys)
+        self.entries = {key: entry for key, entry in self.entries.items() if key in keys}
+
+        os.makedirs(os.path.dirname(self.manifest_path) or ".", exist_ok=True)
+
+        # Escritura atómica: un corte a mitad de escritura no deja el manifest corrupto
+        tmp_path = self.manifest_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"meta": self.meta, "entries": self.entries}, f)
+        os.replace(tmp_path, self.manifest_path)
+
+    def summary(self, n_total):
+        return f"Cached (skipped): {self.n_cached} | Processed: {n_total - self.n_cached}"
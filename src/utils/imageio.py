@@ -0,0 +1,155 @@
+import os
+import struct
+import cv2
+import numpy as np
+
+from src.utils.instrumentation import count, timed
+from src.utils.prefetch import take_prefetched, submit_write
+
+# Decodificación reducida de libjpeg (escalado en el dominio DCT), de mayor a menor factor
+REDUCED_COLOR = ((8, cv2.IMREAD_REDUCED_COLOR_8),
+                 (4, cv2.IMREAD_REDUCED_COLOR_4),
+                 (2, cv2.IMREAD_REDUCED_COLOR_2))
+REDUCED_GRAYSCALE = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8),
+                     (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                     (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+
+
+def read_bytes(path):
+    """
+    Lee el archivo completo (bytes codificados, sin decodificar).
+    Dentro de io_pipeline los bytes ya vienen leídos en segundo plano
+    (read_s mide entonces solo la espera).
+    """
+    with timed("read_s"):
+        future = take_prefetched(path)
+        if future is not None:
+            data = future.result()
+        else:
+            with open(path, "rb") as f:
+                data = f.read()
+    count(images=1, bytes_read=len(data))
+    return data
+
+
+def decode_image(data, flags=cv2.IMREAD_COLOR):
+    """Decodifica bytes JPEG/PNG igual que cv2.imread (None si no se puede leer)."""
+    if not data:
+        return None
+    with timed("decode_s"):
+        return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+
+
+def reduced_flag(width, height, min_width, min_height, grayscale=False):
+    """
+    Flag de decodificación con la mayor reducción (1/8, 1/4, 1/2) que todavía deja
+    al menos min_width x min_height píxeles; sin reducción si ninguna alcanza.
+    """
+    for factor, flag in (REDUCED_GRAYSCALE if grayscale else REDUCED_COLOR):
+        if width // factor >= min_width and height // factor >= min_height:
+            return flag
+    return cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR
+
+
+def decode_for_size(data, size, crop_ratio=0.0, grayscale=False):
+    """
+    Decodifica a la menor resolución que, después de recortar el crop_ratio inferior,
+    sigue siendo al menos size (ancho, alto). El costo de decodificar es proporcional
+    a los píxeles: una foto de 4 MP para un resize a 256x256 se decodifica a 1/4 u 1/8.
+    """
+    header = image_size(data)
+    if header is None:
+        return decode_image(data, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
+
+    w, h = header
+    flag = reduced_flag(w, int(h * (1 - crop_ratio)), size[0], size[1], grayscale)
+    return decode_image(data, flag)
+
+
+def read_image(path, flags=cv2.IMREAD_COLOR):
+    """Equivalente a cv2.imread, pero contando bytes y tiempos de lectura/decodificación."""
+    try:
+        data = read_bytes(path)
+    except OSError:
+        return None
+    return decode_image(data, flags)
+
+
+def write_bytes(path, data):
+    """
+    Escribe bytes ya codificados tal cual (copia exacta, sin recodificar).
+    Dentro de io_pipeline la escritura se encola en un hilo aparte.
+    """
+    with timed("write_s"):
+        if not submit_write(path, data):
+            with open(path, "wb") as f:
+                f.write(data)
+    count(bytes_written=len(data))
+
+
+def image_size(data):
+    """
+    Lee (ancho, alto) desde la cabecera JPEG (marcador SOF) o PNG (IHDR) sin decodificar.
+    Retorna None si el formato no se reconoce o la cabecera está incompleta.
+    """
+    if data[:8] == b"\x89PNG\r\n\x1a\n":
+        if len(data) < 24 or data[12:16] != b"IHDR":
+            return None
+        return struct.unpack(">II", data[16:24])
+
+    if data[:2] != b"\xff\xd8":
+        return None
+
+    i = 2
+    while i + 4 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+
+        # Relleno (0xFF repetidos) y marcadores sin longitud
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in (0x01, 0xD8) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+
+        length = struct.unpack(">H", data[i + 2:i + 4])[0]
+
+        # SOF0..SOF15 (excepto DHT 0xC4, JPG 0xC8, DAC 0xCC): alto y ancho
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            if i + 9 > len(data):
+                return None
+            h, w = struct.unpack(">HH", data[i + 5:i + 9])
+            return w, h
+
+        # Inicio de los datos comprimidos sin haber visto SOF
+        if marker == 0xDA:
+            return None
+
+        i += 2 + length
+
+    return None
+
+
+def write_image(path, img):
+    """Equivalente a cv2.imwrite (el formato sale de la extensión), contando bytes escritos."""
+    with timed("encode_s"):
+        ok, buf = cv2.imencode(os.path.splitext(path)[1], img)
+    if not ok:
+        return False
+
+    write_bytes(path, buf.tobytes())
+    return True
+
+
+def reencode_image(img, ext):
+    """
+    Codifica y vuelve a decodificar la imagen con el mismo encoder que write_image
+    (ext: ".jpg", ".png", ...): los mismos píxeles que se leen del archivo guardado.
+    """
+    with timed("encode_s"):
+        ok, buf = cv2.imencode(ext, img)
+    if not ok:
+        return img
+    return decode_image(buf.tobytes(), cv2.IMREAD_UNCHANGED)
@@ -0,0 +1,241 @@
+import os
+import csv
+import json
+import time
+import resource
+import cProfile
+from datetime import datetime
+from contextlib import contextmanager
+
+# Contadores del proceso actual (en cada worker se reinician por tarea).
+# Los llenan read_bytes / decode_image / write_image y se suman a la etapa activa:
+# los de los workers vía call_counted/merge, los del proceso principal al cerrar la etapa.
+_COUNTERS = {}
+
+# Contadores que StageMetrics.summary ya reporta con nombre propio
+_BASE_COUNTERS = {"images", "bytes_read", "bytes_written", "read_s", "decode_s",
+                  "encode_s", "write_s", "worker_s"}
+
+# Etapa que se está midiendo en el proceso principal (None si no hay reporte activo)
+_ACTIVE_STAGE = None
+
+
+def count(**amounts):
+    """Suma cantidades a los contadores del proceso (bytes_read=..., images=...)."""
+    for key, value in amounts.items():
+        _COUNTERS[key] = _COUNTERS.get(key, 0) + value
+
+
+@contextmanager
+def timed(key):
+    """Suma el tiempo del bloque al contador key (en segundos)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        count(**{key: time.perf_counter() - start})
+
+
+def is_active():
+    return _ACTIVE_STAGE is not None
+
+
+def call_counted(func, item):
+    """
+    Ejecuta func(item) en un worker y retorna (resultado, contadores de esa tarea).
+    parallel_map lo usa cuando hay una etapa midiéndose, para juntar los contadores
+    de todos los procesos en la etapa.
+    Con n_workers=1 corre en el proceso principal: lo que ya se había contado ahí
+    (fuera de las tareas) se conserva para sumarlo al cerrar la etapa.
+    """
+    outside = dict(_COUNTERS)
+    _COUNTERS.clear()
+    with timed("worker_s"):
+        result = func(item)
+    counters = dict(_COUNTERS)
+    _COUNTERS.clear()
+    _COUNTERS.update(outside)
+    return result, counters
+
+
+def merge(counters):
+    """Suma los contadores de una tarea a la etapa activa."""
+    if _ACTIVE_STAGE is None:
+        return
+    for key, value in counters.items():
+        _ACTIVE_STAGE.counters[key] = _ACTIVE_STAGE.counters.get(key, 0) + value
+
+
+def _peak_rss_mb(who):
+    # ru_maxrss está en KB en Linux
+    return resource.getrusage(who).ru_maxrss / 1024
+
+
+def _cpu_seconds(who):
+    usage = resource.getrusage(who)
+    return usage.ru_utime + usage.ru_stime
+
+
+# =====================================
+# PROFILERS
+# =====================================
+
+@contextmanager
+def _cprofile(output_prefix):
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(output_prefix + ".prof")
+
+
+@contextmanager
+def _pyinstrument(output_prefix):
+    # Profiler por muestreo (opcional: pip install pyinstrument)
+    from pyinstrument import Profiler
+
+    profiler = Profiler()
+    profiler.start()
+    try:
+        yield
+    finally:
+        profiler.stop()
+        with open(output_prefix + ".html", "w", encoding="utf-8") as f:
+            f.write(profiler.output_html())
+
+
+# nombre → función(output_prefix) que retorna un context manager
+PROFILERS = {
+    "cprofile": _cprofile,
+    "pyinstrument": _pyinstrument,
+}
+
+
+def register_profiler(name, factory):
+    """Agrega un profiler: factory(output_prefix) debe retornar un context manager."""
+    PROFILERS[name] = factory
+
+
+# =====================================
+# RUN REPORT
+# =====================================
+
+class StageMetrics:
+    """Métricas de una etapa. `images` se puede fijar a mano si la etapa no lee imágenes."""
+
+    def __init__(self, name):
+        self.name = name
+        self.counters = {}
+        self.images = None
+        self.result = {}
+
+    def summary(self):
+        c = self.counters
+        images = self.images if self.images is not None else int(c.get("images", 0))
+        wall = self.result["wall_s"]
+
+        io_s = c.get("read_s", 0) + c.get("decode_s", 0) + c.get("encode_s", 0) + c.get("write_s", 0)
+        return {
+            "stage": self.name,
+            **self.result,
+            "images": images,
+            "images_per_s": images / wall if wall > 0 else 0.0,
+            "bytes_read": int(c.get("bytes_read", 0)),
+            "bytes_written": int(c.get("bytes_written", 0)),
+            "read_s": c.get("read_s", 0.0),
+            "decode_s": c.get("decode_s", 0.0),
+            "encode_s": c.get("encode_s", 0.0),
+            "write_s": c.get("write_s", 0.0),
+            # tiempo de los workers que no fue lectura/(de)codificación/escritura
+            "compute_s": max(0.0, c.get("worker_s", 0.0) - io_s),
+            # contadores propios de la etapa (p. ej. enhance_clahe_s)
+            **{key: c[key] for key in sorted(c) if key not in _BASE_COUNTERS},
+        }
+
+
+class RunReport:
+    """
+    Reporte de tiempos y throughput de una corrida del pipeline.
+    Uso:
+        report = RunReport(profile={"features": "cprofile"})
+        with report.stage("features"):
+            extract_features(...)
+        report.save()
+    Por etapa registra: wall time, CPU (proceso + workers), pico de RSS, imágenes/s,
+    bytes leídos/escritos y la división lectura/decodificación vs cómputo.
+    Los profilers solo miden el proceso principal: para perfilar el código de los
+    workers conviene correr esa etapa con n_workers=1.
+    """
+
+    def __init__(self, output_dir="Results/run_reports", profile=None):
+        self.output_dir = output_dir
+        self.profile = profile or {}
+        self.run_id = datetime.now().strftime("run_%Y%m%d_%H%M%S")
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name):
+        global _ACTIVE_STAGE
+
+        metrics = StageMetrics(name)
+        previous = _ACTIVE_STAGE
+        _ACTIVE_STAGE = metrics
+        # Contadores del proceso principal durante la etapa (p. ej. escrituras del tensor store)
+        outside = dict(_COUNTERS)
+        _COUNTERS.clear()
+
+        profiler = None
+        if name in self.profile:
+            os.makedirs(self.output_dir, exist_ok=True)
+            profiler = PROFILERS[self.profile[name]](os.path.join(self.output_dir, f"{self.run_id}_{name}"))
+
+        wall_start = time.perf_counter()
+        cpu_self = _cpu_seconds(resource.RUSAGE_SELF)
+        cpu_children = _cpu_seconds(resource.RUSAGE_CHILDREN)
+
+        try:
+            if profiler is not None:
+                with profiler:
+                    yield metrics
+            else:
+                yield metrics
+        finally:
+            merge(_COUNTERS)
+            _COUNTERS.clear()
+            _COUNTERS.update(outside)
+            metrics.result = {
+                "wall_s": time.perf_counter() - wall_start,
+                "cpu_s": _cpu_seconds(resource.RUSAGE_SELF) - cpu_self,
+                "cpu_workers_s": _cpu_seconds(resource.RUSAGE_CHILDREN) - cpu_children,
+                "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+                "peak_rss_workers_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+            }
+            _ACTIVE_STAGE = previous
+            self.stages.append(metrics)
+
+            s = metrics.summary()
+            print(f"⏱ {name}: {s['wall_s']:.2f}s wall | {s['images']} images "
+                  f"({s['images_per_s']:.1f}/s) | CPU {s['cpu_s'] + s['cpu_workers_s']:.2f}s")
+
+    def save(self):
+        """Guarda el reporte como JSON y CSV en output_dir. Retorna la ruta del JSON."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        rows = [stage.summary() for stage in self.stages]
+
+        json_path = os.path.join(self.output_dir, f"{self.run_id}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump({"run_id": self.run_id, "stages": rows}, f, indent=2)
+
+        if rows:
+            csv_path = os.path.join(self.output_dir, f"{self.run_id}.csv")
+            with open(csv_path, "w", encoding="utf-8", newline="") as f:
+                # cada etapa puede tener contadores propios: columnas = unión
+                fieldnames = list(dict.fromkeys(key for row in rows for key in row))
+                writer = csv.DictWriter(f, fieldnames=fieldnames)
+                writer.writeheader()
+                writer.writerows(rows)
+
+        print(f"\n⏱ Run report saved in: {json_path}\n")
+        return json_path
@@ -0,0 +1,151 @@
+import os
+from collections import deque
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+
+from src.utils import instrumentation
+from src.utils.prefetch import run_prefetched
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+
+def list_images(input_dir):
+    """
+    Lista las imágenes del dataset (una carpeta por especie).
+    Retorna una lista ordenada de (species, file, path) para que el orden
+    de salida sea siempre el mismo, sin importar el sistema de archivos.
+    """
+    images = []
+
+    for species in sorted(os.listdir(input_dir)):
+        species_path = os.path.join(input_dir, species)
+
+        if not os.path.isdir(species_path):
+            continue
+
+        for file in sorted(os.listdir(species_path)):
+            if not file.lower().endswith(IMAGE_EXTENSIONS):
+                continue
+
+            images.append((species, file, os.path.join(species_path, file)))
+
+    return images
+
+
+def resolve_workers(n_workers=None):
+    """None → todos los núcleos disponibles; siempre al menos 1."""
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    return max(1, int(n_workers))
+
+
+def _init_worker(initializer, initargs):
+    # Cada proceso ya es un worker: evitar que OpenCV lance sus propios hilos
+    cv2.setNumThreads(1)
+
+    if initializer is not None:
+        initializer(*initargs)
+
+
+def _counted(func):
+    """
+    Si hay una etapa midiéndose (RunReport), cada tarea retorna también sus contadores
+    (bytes, tiempos de lectura/decodificación) para sumarlos en el proceso principal.
+    Retorna (función a ejecutar, función que desempaca cada resultado).
+    """
+    if not instrumentation.is_active():
+        return func, lambda result: result
+
+    def unpack(result):
+        value, counters = result
+        instrumentation.merge(counters)
+        return value
+
+    return partial(instrumentation.call_counted, func), unpack
+
+
+def parallel_map(func, items, n_workers=None, chunksize=None, initializer=None, initargs=(),
+                 prefetch=None):
+    """
+    Aplica func a cada elemento de items usando un ProcessPoolExecutor.
+    - Los elementos se envían por bloques (chunksize) para reducir overhead.
+    - El resultado conserva el orden de items (salida determinística).
+    - Con n_workers=1 se ejecuta en el proceso actual (útil para depurar).
+    - prefetch: función item → ruta del archivo que func va a leer (p. ej. itemgetter(0)).
+      Cada bloque corre dentro de io_pipeline: los archivos se leen por adelantado en
+      hilos y las escrituras van a un writer asíncrono (lectura, cómputo y escritura
+      se solapan; útil en NFS).
+    func, initializer y prefetch deben ser picklables (funciones de módulo, itemgetter).
+    """
+    items = list(items)
+    n_workers = resolve_workers(n_workers)
+
+    if prefetch is not None and items:
+        if chunksize is None:
+            chunksize = max(1, len(items) // (min(n_workers, len(items)) * 4))
+
+        chunks = [items[i:i + chunksize] for i in range(0, len(items), chunksize)]
+        results = parallel_map(partial(run_prefetched, func, prefetch), chunks, n_workers,
+                               chunksize=1, initializer=initializer, initargs=initargs)
+        return [result for chunk in results for result in chunk]
+    func, unpack = _counted(func)
+
+    if n_workers == 1 or len(items) <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        return [unpack(func(item)) for item in items]
+
+    n_workers = min(n_workers, len(items))
+
+    if chunksize is None:
+        # ~4 bloques por worker: balancea carga sin demasiados envíos
+        chunksize = max(1, len(items) // (n_workers * 4))
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(initializer, initargs)) as executor:
+        return [unpack(result) for result in executor.map(func, items, chunksize=chunksize)]
+
+
+def parallel_imap(func, items, n_workers=None, max_pending=None, initializer=None, initargs=()):
+    """
+    Versión "streaming" de parallel_map: generador que entrega los resultados
+    en el mismo orden que items, a medida que están listos.
+    Nunca hay más de max_pending tareas en vuelo (por defecto 2 por worker),
+    así items puede ser un generador enorme sin cargarlo todo en memoria.
+    """
+    n_workers = resolve_workers(n_workers)
+    func, unpack = _counted(func)
+
+    if n_workers == 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for item in items:
+            yield unpack(func(item))
+        return
+
+    if max_pending is None:
+        max_pending = 2 * n_workers
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker,
+                             initargs=(initializer, initargs)) as executor:
+        pending = deque()
+
+        for item in items:
+            pending.append(executor.submit(func, item))
+            if len(pending) >= max_pending:
+                yield unpack(pending.popleft().result())
+
+        while pending:
+            yield unpack(pending.popleft().result())
+
+
+def print_species_summary(images):
+    """Imprime cuántas imágenes se procesaron por especie."""
+    counts = {}
+    for species, _, _ in images:
+        counts[species] = counts.get(species, 0) + 1
+
+    for species, n in counts.items():
+        print(f"✔ Finished {species} ({n} images)")
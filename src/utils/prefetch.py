@@ -0,0 +1,151 @@
+import threading
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+# Hilos de lectura/escritura por proceso. En NFS la latencia por archivo domina,
+# así que conviene tener varias lecturas en vuelo aunque la CPU esté ocupada.
+READ_THREADS = 8
+WRITE_THREADS = 4
+
+# Máximo de archivos leídos por adelantado / escrituras pendientes (backpressure)
+MAX_AHEAD = 32
+MAX_PENDING_WRITES = 32
+
+# Prefetcher y writer activos en este proceso (None fuera de io_pipeline)
+_PREFETCHER = None
+_WRITER = None
+
+
+def _read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+class Prefetcher:
+    """
+    Lee archivos por adelantado con un pool de hilos, en el orden en que se van a usar.
+    Nunca hay más de max_ahead archivos leídos y sin consumir (memoria acotada).
+    Si una tarea no llega a leer su archivo (p. ej. se saltó), ese archivo se descarta
+    cuando se pide uno posterior, así no ocupa lugar en la ventana.
+    """
+
+    def __init__(self, paths, n_threads=READ_THREADS, max_ahead=MAX_AHEAD):
+        self.paths = deque(paths)
+        self.max_ahead = max_ahead
+        self.inflight = deque()      # (path, future) en orden de uso
+        self.pending = set()
+        self.executor = ThreadPoolExecutor(max_workers=n_threads)
+        self._fill()
+
+    def _fill(self):
+        while self.paths and len(self.inflight) < self.max_ahead:
+            path = self.paths.popleft()
+            self.inflight.append((path, self.executor.submit(_read_file, path)))
+            self.pending.add(path)
+
+    def take(self, path):
+        """Future con los bytes de path, o None si no está en la ventana de prefetch."""
+        if path not in self.pending:
+            return None
+
+        while self.inflight:
+            queued, future = self.inflight.popleft()
+            self.pending.discard(queued)
+            if queued == path:
+                self._fill()
+                return future
+            future.cancel()
+
+        return None
+
+    def close(self):
+        for _, future in self.inflight:
+            future.cancel()
+        self.executor.shutdown(wait=True)
+
+
+class AsyncWriter:
+    """
+    Escribe archivos en hilos aparte, para que el cómputo no espere al disco.
+    submit() bloquea si ya hay max_pending escrituras en vuelo (backpressure).
+    close() espera a que terminen todas y relanza el primer error.
+    """
+
+    def __init__(self, n_threads=WRITE_THREADS, max_pending=MAX_PENDING_WRITES):
+        self.executor = ThreadPoolExecutor(max_workers=n_threads)
+        self.slots = threading.BoundedSemaphore(max_pending)
+        self.futures = []
+
+    def _write(self, path, data):
+        try:
+            with open(path, "wb") as f:
+                f.write(data)
+        finally:
+            self.slots.release()
+
+    def submit(self, path, data):
+        self.slots.acquire()
+        self.futures.append(self.executor.submit(self._write, path, data))
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        for future in self.futures:
+            future.result()
+
+
+def take_prefetched(path):
+    """Usado por read_bytes: future del archivo si se está prefetcheando, si no None."""
+    if _PREFETCHER is None:
+        return None
+    return _PREFETCHER.take(path)
+
+
+def submit_write(path, data):
+    """Usado por write_bytes: True si la escritura quedó en cola en el writer asíncrono."""
+    if _WRITER is None:
+        return False
+    _WRITER.submit(path, data)
+    return True
+
+
+@contextmanager
+def io_pipeline(paths=(), read_threads=READ_THREADS, write_threads=WRITE_THREADS,
+                max_ahead=MAX_AHEAD, max_pending=MAX_PENDING_WRITES):
+    """
+    Dentro del bloque:
+    - read_bytes(path) de cualquiera de paths toma los bytes ya leídos en segundo plano
+    - write_bytes / write_image encolan la escritura en hilos aparte
+    Al salir se espera a que todas las escrituras terminen.
+    Así lectura, cómputo y escritura se solapan sin cambiar el código de las etapas.
+    """
+    global _PREFETCHER, _WRITER
+
+    previous = (_PREFETCHER, _WRITER)
+    _PREFETCHER = Prefetcher(paths, read_threads, max_ahead)
+    _WRITER = AsyncWriter(write_threads, max_pending)
+
+    try:
+        yield
+    finally:
+        prefetcher, writer = _PREFETCHER, _WRITER
+        _PREFETCHER, _WRITER = previous
+        prefetcher.close()
+        writer.close()
+
+
+def run_prefetched(func, path_of, items):
+    """
+    Aplica func a cada item dentro de io_pipeline, prefetcheando path_of(item)
+    (una ruta, o una lista de rutas si el item es un lote).
+    Lo usa parallel_map(prefetch=...) en cada worker para su bloque de items.
+    """
+    paths = []
+    for item_paths in map(path_of, items):
+        if isinstance(item_paths, str):
+            paths.append(item_paths)
+        elif item_paths is not None:
+            paths.extend(item_paths)
+
+    with io_pipeline(paths):
+        return [func(item) for item in items]
@@ -0,0 +1,146 @@
+import os
+import json
+import shutil
+from functools import lru_cache
+
+import numpy as np
+
+from src.utils.instrumentation import count
+
+# Carpeta por defecto del tensor store de imágenes preprocesadas
+DEFAULT_TENSOR_STORE = "Data/processed/enhanced_tensors"
+
+INDEX_NAME = "index.json"
+
+# Imágenes por shard (1024 x 256 x 256 uint8 = 64 MB por archivo)
+SHARD_SIZE = 1024
+
+
+def is_tensor_store(path):
+    return os.path.isfile(os.path.join(path, INDEX_NAME))
+
+
+class TensorStoreWriter:
+    """
+    Escribe imágenes del mismo tamaño y tipo en shards .npy contiguos
+    (shard-00000.npy, ...) + index.json con especie, archivo y hash de cada imagen.
+    Se escribe en una carpeta temporal y se reemplaza la anterior al cerrar,
+    así el store viejo se puede seguir leyendo mientras se arma el nuevo.
+    """
+
+    def __init__(self, path, shape, dtype=np.uint8, shard_size=SHARD_SIZE):
+        self.path = path
+        self.tmp_path = path.rstrip("/\\") + ".tmp"
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.shard_size = shard_size
+
+        self.species, self.filenames, self.hashes, self.shards = [], [], [], []
+        self.buffer = np.empty((shard_size, *self.shape), dtype=self.dtype)
+        self.n_buffered = 0
+
+        shutil.rmtree(self.tmp_path, ignore_errors=True)
+        os.makedirs(self.tmp_path)
+
+    def add(self, species, filename, img, digest):
+        if img.shape != self.shape:
+            raise ValueError(f"Image {species}/{filename} has shape {img.shape}, expected {self.shape}")
+
+        self.buffer[self.n_buffered] = img
+        self.n_buffered += 1
+        self.species.append(species)
+        self.filenames.append(filename)
+        self.hashes.append(digest)
+
+        if self.n_buffered == self.shard_size:
+            self._flush()
+
+    def _flush(self):
+        if self.n_buffered == 0:
+            return
+        name = f"shard-{len(self.shards):05d}.npy"
+        np.save(os.path.join(self.tmp_path, name), self.buffer[:self.n_buffered])
+        count(bytes_written=self.buffer[:self.n_buffered].nbytes)
+        self.shards.append(name)
+        self.n_buffered = 0
+
+    def close(self):
+        self._flush()
+
+        index = {
+            "shape": list(self.shape),
+            "dtype": self.dtype.str,
+            "shard_size": self.shard_size,
+            "shards": self.shards,
+            "species": self.species,
+            "filename": self.filenames,
+            "hash": self.hashes,
+        }
+        with open(os.path.join(self.tmp_path, INDEX_NAME), "w", encoding="utf-8") as f:
+            json.dump(index, f)
+
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(self.tmp_path, self.path)
+        return self.path
+
+
+class TensorStore:
+    """
+    Lectura del tensor store. Los shards se abren con memmap: image(i) y block(start, stop)
+    retornan vistas sin copiar (solo se leen del disco las páginas que se usan).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, INDEX_NAME), encoding="utf-8") as f:
+            index = json.load(f)
+
+        self.shape = tuple(index["shape"])
+        self.shard_size = index["shard_size"]
+        self.shard_files = index["shards"]
+        self.species = index["species"]
+        self.filenames = index["filename"]
+        self.hashes = index["hash"]
+        self._shards = {}
+
+    def __len__(self):
+        return len(self.filenames)
+
+    def keys(self):
+        return [f"{species}/{file}" for species, file in zip(self.species, self.filenames)]
+
+    def positions(self):
+        """dict "species/file" → posición en el store."""
+        return {key: i for i, key in enumerate(self.keys())}
+
+    def shard(self, s):
+        if s not in self._shards:
+            self._shards[s] = np.load(os.path.join(self.path, self.shard_files[s]), mmap_mode="r")
+        return self._shards[s]
+
+    def image(self, i):
+        return self.shard(i // self.shard_size)[i % self.shard_size]
+
+    def block(self, start, stop):
+        """
+        Imágenes [start, stop) como un solo array sin copiar,
+        si están en el mismo shard; si no, None.
+        """
+        s = start // self.shard_size
+        if (stop - 1) // self.shard_size != s:
+            return None
+        offset = s * self.shard_size
+        return self.shard(s)[start - offset:stop - offset]
+
+
+@lru_cache(maxsize=8)
+def _open_cached(path, mtime_ns):
+    return TensorStore(path)
+
+
+def open_tensor_store(path):
+    """
+    TensorStore compartido por proceso (los workers abren cada store una sola vez).
+    Si el store se reescribió, el índice nuevo tiene otro mtime y se vuelve a abrir.
+    """
+    return _open_cached(path, os.stat(os.path.join(path, INDEX_NAME)).st_mtime_ns)
@@ -0,0 +1,259 @@
+import os
+import json
+import numpy as np
+
+from src.utils.parallel import parallel_map, resolve_workers
+
+# Modos de las figuras:
+# - "inline":   se dibujan en el momento (comportamiento original)
+# - "deferred": se guarda la especificación + datos y se dibujan después con render_figures
+# - "off":      solo métricas, no se guarda ni se dibuja nada
+FIGURE_MODES = ("inline", "deferred", "off")
+
+# Carpeta (dentro de la carpeta de la figura) donde quedan las especificaciones diferidas
+SPEC_DIR = "specs"
+
+_MODE = "inline"
+
+
+def set_figure_mode(mode):
+    """Cambia el modo de las figuras del proceso (ver FIGURE_MODES)."""
+    global _MODE
+    if mode not in FIGURE_MODES:
+        raise ValueError(f"figure mode must be one of {FIGURE_MODES}, got {mode!r}")
+    _MODE = mode
+
+
+def get_figure_mode():
+    return _MODE
+
+
+def _pyplot():
+    # Backend sin pantalla: sirve en servidores y en varios procesos a la vez
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    return plt
+
+
+# =====================================
+# RENDERERS
+# =====================================
+# Cada renderer recibe (data, params, output_path): data es un dict de arrays y
+# params un dict JSON. Importan matplotlib/seaborn/sklearn recién al dibujar.
+
+def _render_scatter(data, params, output_path):
+    plt = _pyplot()
+    points, labels = data["points"], data["labels"]
+    three_d = points.shape[1] >= 3 and params.get("zlabel") is not None
+
+    fig = plt.figure(figsize=params.get("figsize", (8, 6)))
+    if three_d:
+        from mpl_toolkits.mplot3d import Axes3D  # registra la proyección 3d
+        ax = fig.add_subplot(111, projection="3d")
+    else:
+        ax = fig.add_subplot(111)
+
+    for label in np.unique(labels):
+        idx = labels == label
+        coords = [points[idx, 0], points[idx, 1]] + ([points[idx, 2]] if three_d else [])
+        ax.scatter(*coords, label=label, s=params.get("s", 20))
+
+    ax.set_title(params.get("title", ""))
+    ax.set_xlabel(params.get("xlabel", ""))
+    ax.set_ylabel(params.get("ylabel", ""))
+    if three_d:
+        ax.set_zlabel(params["zlabel"])
+    ax.legend(fontsize=params.get("legend_fontsize", 8))
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close(fig)
+
+
+def _render_line(data, params, output_path):
+    plt = _pyplot()
+    plt.figure(figsize=params.get("figsize", (8, 5)))
+    plt.plot(data["y"], marker=params.get("marker"))
+    plt.xlabel(params.get("xlabel", ""))
+    plt.ylabel(params.get("ylabel", ""))
+    plt.title(params.get("title", ""))
+    plt.grid(params.get("grid", False))
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close()
+
+
+def _render_heatmap(data, params, output_path):
+    import pandas as pd
+    import seaborn as sns
+    plt = _pyplot()
+
+    matrix = data["matrix"]
+    if "rows" in data:
+        matrix = pd.DataFrame(matrix, index=data["rows"], columns=data["columns"])
+
+    plt.figure(figsize=params.get("figsize", (10, 8)))
+    sns.heatmap(matrix, cmap=params.get("cmap"), annot=params.get("annot", False),
+                fmt=params.get("fmt", ".2g"),
+                xticklabels=params.get("xticklabels", "auto"),
+                yticklabels=params.get("yticklabels", "auto"))
+    plt.title(params.get("title", ""))
+    if "xlabel" in params:
+        plt.xlabel(params["xlabel"])
+        plt.ylabel(params["ylabel"])
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close()
+
+
+def _render_curves(data, params, output_path):
+    from sklearn.metrics import roc_curve, auc, precision_recall_curve, average_precision_score
+    plt = _pyplot()
+
+    y_bin, y_score, classes = data["y_true_bin"], data["y_score"], params["classes"]
+    roc = params["curve"] == "roc"
+
+    plt.figure(figsize=(10, 8))
+    for i in range(len(classes)):
+        if roc:
+            fpr, tpr, _ = roc_curve(y_bin[:, i], y_score[:, i])
+            plt.plot(fpr, tpr, lw=2, label=f"{classes[i]} (AUC = {auc(fpr, tpr):.2f})")
+        else:
+            precision, recall, _ = precision_recall_curve(y_bin[:, i], y_score[:, i])
+            ap = average_precision_score(y_bin[:, i], y_score[:, i])
+            plt.plot(recall, precision, lw=2, label=f"{classes[i]} (AP = {ap:.2f})")
+
+    if roc:
+        plt.plot([0, 1], [0, 1], "k--")
+        plt.xlabel("False Positive Rate")
+        plt.ylabel("True Positive Rate")
+    else:
+        plt.xlabel("Recall")
+        plt.ylabel("Precision")
+    plt.title(params.get("title", ""))
+    plt.legend(fontsize=8)
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close()
+
+
+def _render_bar(data, params, output_path):
+    import seaborn as sns
+    plt = _pyplot()
+
+    plt.figure(figsize=params.get("figsize", (7, 5)))
+    sns.barplot(x=params["labels"], y=data["values"])
+    plt.title(params.get("title", ""))
+    if "ylim" in params:
+        plt.ylim(*params["ylim"])
+    plt.tight_layout()
+    plt.savefig(output_path)
+    plt.close()
+
+
+# tipo de figura → renderer(data, params, output_path)
+RENDERERS = {
+    "scatter": _render_scatter,
+    "line": _render_line,
+    "heatmap": _render_heatmap,
+    "curves": _render_curves,
+    "bar": _render_bar,
+}
+
+
+def register_renderer(kind, func):
+    """Agrega un tipo de figura. func(data, params, output_path) debe ser función de módulo."""
+    RENDERERS[kind] = func
+
+
+# =====================================
+# SPECS
+# =====================================
+
+def _spec_paths(output_path):
+    folder, name = os.path.split(output_path)
+    stem = os.path.splitext(name)[0]
+    spec_dir = os.path.join(folder, SPEC_DIR)
+    return spec_dir, os.path.join(spec_dir, stem + ".json"), os.path.join(spec_dir, stem + ".npz")
+
+
+def _as_arrays(data):
+    # Etiquetas como strings (los arrays object no se pueden guardar sin pickle)
+    arrays = {}
+    for key, value in data.items():
+        value = np.asarray(value)
+        arrays[key] = value.astype(str) if value.dtype == object else value
+    return arrays
+
+
+def figure(kind, output_path, data, **params):
+    """
+    Pide una figura: kind es un tipo de RENDERERS, data un dict de arrays y params
+    opciones JSON (título, ejes...). Según el modo se dibuja ya, se guarda
+    (spec JSON + datos .npz en <carpeta>/specs/) para render_figures, o se ignora.
+    """
+    if _MODE == "off":
+        return None
+
+    if _MODE == "inline":
+        RENDERERS[kind](_as_arrays(data), params, output_path)
+        return output_path
+
+    spec_dir, spec_path, data_path = _spec_paths(output_path)
+    os.makedirs(spec_dir, exist_ok=True)
+    np.savez(data_path, **_as_arrays(data))
+    with open(spec_path, "w", encoding="utf-8") as f:
+        json.dump({"kind": kind, "output": os.path.basename(output_path), "params": params}, f)
+    return spec_path
+
+
+def _render_spec(spec_path):
+    """Worker: dibuja una figura a partir de su spec + datos."""
+    with open(spec_path, encoding="utf-8") as f:
+        spec = json.load(f)
+
+    data_path = os.path.splitext(spec_path)[0] + ".npz"
+    with np.load(data_path) as npz:
+        data = {key: npz[key] for key in npz.files}
+
+    output_path = os.path.join(os.path.dirname(os.path.dirname(spec_path)), spec["output"])
+    RENDERERS[spec["kind"]](data, spec["params"], output_path)
+    return output_path
+
+
+def pending_figures(figures_dir="Results/figures/"):
+    """Specs de figures_dir/specs cuya imagen no existe o es más vieja que el spec."""
+    spec_dir = os.path.join(figures_dir, SPEC_DIR)
+    if not os.path.isdir(spec_dir):
+        return []
+
+    pending = []
+    for name in sorted(os.listdir(spec_dir)):
+        if not name.endswith(".json"):
+            continue
+        spec_path = os.path.join(spec_dir, name)
+        with open(spec_path, encoding="utf-8") as f:
+            output_path = os.path.join(figures_dir, json.load(f)["output"])
+        if not os.path.exists(output_path) or os.path.getmtime(output_path) < os.path.getmtime(spec_path):
+            pending.append(spec_path)
+    return pending
+
+
+def render_figures(figures_dir="Results/figures/", n_workers=None, force=False):
+    """
+    Dibuja las figuras diferidas de figures_dir en paralelo (backend Agg, un proceso
+    por worker). Con force=True se redibujan todas, si no solo las pendientes.
+    """
+    if force:
+        spec_dir = os.path.join(figures_dir, SPEC_DIR)
+        specs = sorted(os.path.join(spec_dir, name) for name in os.listdir(spec_dir)
+                       if name.endswith(".json")) if os.path.isdir(spec_dir) else []
+    else:
+        specs = pending_figures(figures_dir)
+
+    print(f"\n🎨 Rendering {len(specs)} figures from {figures_dir} | Workers: {resolve_workers(n_workers)}")
+
+    outputs = parallel_map(_render_spec, specs, n_workers)
+
+    print(f"✔ {len(outputs)} figures saved in: {figures_dir}\n")
+    return outputs
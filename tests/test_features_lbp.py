@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from src.analysis.features_lbp import lbp_codes, lbp_features_batch
+
+skimage_feature = pytest.importorskip("skimage.feature")
+skimage_measure = pytest.importorskip("skimage.measure")
+
+RADII = (1, 2, 3)
+
+
+def _images(n=3, size=48, seed=0):
+    # Ruido suavizado + bloques planos: hay patrones uniformes y no uniformes, y empates
+    rng = np.random.default_rng(seed)
+    imgs = rng.integers(0, 256, size=(n, size, size)).astype(np.float64)
+    imgs = (imgs + np.roll(imgs, 1, axis=1) + np.roll(imgs, 1, axis=2)) / 3
+    imgs[:, :8, :8] = 128
+    return imgs.astype(np.uint8)
+
+
+@pytest.mark.parametrize("radius", RADII)
+def test_lbp_codes_match_skimage(radius):
+    images = _images()
+    labels = lbp_codes(images, 8 * radius, radius)
+    for img, got in zip(images, labels):
+        expected = skimage_feature.local_binary_pattern(img, 8 * radius, radius, "uniform")
+        np.testing.assert_array_equal(got, expected.astype(np.uint8))
+
+
+def test_lbp_features_all_radii_in_one_pass():
+    images = _images()
+    features = lbp_features_batch(images, radii=RADII)
+
+    for k, radius in enumerate(RADII):
+        points = 8 * radius
+        suffix = "" if k == 0 else f"_r{radius}"
+        for i, img in enumerate(images):
+            lbp = skimage_feature.local_binary_pattern(img, points, radius, "uniform")
+            hist, _ = np.histogram(lbp.ravel(), bins=np.arange(0, points + 3), density=True)
+
+            assert features[f"lbp_uniform_ratio{suffix}"][i] == pytest.approx(hist[:-1].sum())
+            assert features[f"lbp_dom_bin_ratio{suffix}"][i] == pytest.approx(hist.max() / hist.sum())
+            assert features[f"lbp_entropy{suffix}"][i] == pytest.approx(
+                skimage_measure.shannon_entropy(hist + 1e-12))
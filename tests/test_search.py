@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from src.models.search import _levels, search_model
+
+
+@pytest.mark.parametrize("factor", [2, 3, 4])
+def test_levels_exact_at_powers(factor):
+    for k in range(1, 16):
+        assert _levels(factor ** k, factor) == k + 1
+        assert _levels(factor ** k - 1, factor) == k
+        assert _levels(factor ** k + 1, factor) == k + 1
+
+@pytest.mark.parametrize("n_rows, n_candidates, n_classes, n_rounds", [
+    (243 * 30, 243, 3, 6),   # log(243, 3) = 4.999... en floats: antes daba 5 rondas
+    (243 * 30, 32, 3, 4),
+    (30000, 32, 8, 4),
+    (1000, 32, 8, 4),        # 3 rondas posibles + aggressive_elimination
+])
+def test_last_round_uses_all_rows(n_rows, n_candidates, n_classes, n_rounds):
+    rng = np.random.default_rng(0)
+    y = np.arange(n_rows) % n_classes
+    X = y[:, None] + rng.normal(size=(n_rows, 2))
+
+    search = search_model("LogisticRegression", X, y, n_candidates=n_candidates, n_jobs=1)
+
+    assert len(search.n_resources_) == n_rounds
+    assert search.n_candidates_[-1] < 3
+    # La última ronda usa todo el set (salvo el resto de dividir por factor^(rondas-1))
+    assert n_rows - search.n_resources_[-1] < 2 * 3 ** (n_rounds - 1)
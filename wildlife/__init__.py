@@ -0,0 +1,7 @@
+"""
+Pipeline de clasificación de fotos de cámaras trampa.
+
+Uso:  python -m wildlife run --stages preprocessing,features
+      python -m wildlife predict Data/nuevas/ --output predicciones.csv
+      python -m wildlife clean Data/raw/train_features Data/processed/clean
+"""
@@ -0,0 +1,121 @@
+import os
+import sys
+import argparse
+
+# Raíz del proyecto en el path (para importar src/ desde cualquier carpeta)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from wildlife.stages import STAGES, DEFAULT_STAGES, PipelineContext, run_pipeline
+
+# Los imports de cada comando van dentro de su función: el arranque solo carga
+# argparse y el registro de etapas, y cada comando importa lo que usa.
+
+
+def _csv_list(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def _profile(values):
+    # ["features=cprofile", ...] → {"features": "cprofile"}
+    profile = {}
+    for value in values or ():
+        name, _, profiler = value.partition("=")
+        profile[name] = profiler or "cprofile"
+    return profile
+
+
+def cmd_run(args):
+    if args.list:
+        for name, (_, help) in STAGES.items():
+            print(f"{name:<18} {help}")
+        return
+
+    stages = args.stages
+    if args.tiled:
+        stages = ["features_tiled" if name == "features" else name for name in stages]
+
+    ctx = PipelineContext(stages, n_workers=args.workers, use_cache=not args.no_cache,
+                          preprocessed_format=args.format, save_intermediates=args.save_intermediates,
+                          stats_streaming=args.stats_streaming, pca_streaming=args.pca_streaming,
+                          figures=args.figures, model_search=args.search,
+                          svm_mode=args.svm, tiled=args.tiled)
+    run_pipeline(ctx, profile=_profile(args.profile))
+
+
+def cmd_predict(argv):
+    from src.models.inference import main as predict_main
+    predict_main(argv, prog="python -m wildlife predict")
+
+
+def cmd_clean(args):
+    from src.preprocessing.cleaning import clean_dataset
+    clean_dataset(args.input, args.output, min_width=args.min_width, min_height=args.min_height,
+                  n_workers=args.workers, use_cache=not args.no_cache, fast=not args.full_decode,
+                  link=args.link, find_dups=not args.no_duplicates)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m wildlife",
+                                     description="Camera-trap species classification pipeline.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    # --- run ---
+    run = commands.add_parser("run", help="Run pipeline stages")
+    run.add_argument("--stages", type=_csv_list, default=list(DEFAULT_STAGES),
+                     help=f"Comma-separated stages (default: {','.join(DEFAULT_STAGES)})")
+    run.add_argument("--list", action="store_true", help="List the available stages and exit")
+    run.add_argument("--workers", type=int, default=None, help="Worker processes (default: all cores)")
+    run.add_argument("--no-cache", action="store_true", help="Reprocess every image")
+    run.add_argument("--format", choices=("files", "tensors", "both"), default="files",
+                     help="Output of the fused preprocessing")
+    run.add_argument("--save-intermediates", action="store_true")
+    run.add_argument("--stats-streaming", action="store_true",
+                     help="Statistics/correlation from accumulated moments")
+    run.add_argument("--pca-streaming", action="store_true", help="IncrementalPCA over blocks")
+    run.add_argument("--figures", choices=("inline", "deferred", "off"), default="deferred",
+                     help="Draw figures inline, defer them to the 'figures' stage, or skip them (metrics only)")
+    run.add_argument("--search", action="store_true",
+                     help="Hyperparameter search (successive halving + stratified k-fold) before training")
+    run.add_argument("--svm", choices=("auto", "exact", "approx"), default="auto",
+                     help="Exact SVC, approximate kernel SVM (Nystroem + logistic regression) or auto by train size")
+    run.add_argument("--tiled", action="store_true",
+                     help="Use multi-scale tiled features on the full-resolution crops "
+                          "(runs features_tiled instead of features)")
+    run.add_argument("--profile", action="append", metavar="STAGE=PROFILER",
+                     help="Profile a stage, e.g. features=cprofile (repeatable)")
+    run.set_defaults(func=cmd_run)
+
+    # --- predict ---
+    predict = commands.add_parser("predict", add_help=False,
+                                  help="Classify new images (same options as src.models.inference)")
+    predict.add_argument("argv", nargs=argparse.REMAINDER)
+
+    # --- clean ---
+    clean = commands.add_parser("clean", help="Filter corrupted, tiny or blank images")
+    clean.add_argument("input", nargs="?", default="Data/raw/train_features")
+    clean.add_argument("output", nargs="?", default="Data/processed/clean")
+    clean.add_argument("--min-width", type=int, default=200)
+    clean.add_argument("--min-height", type=int, default=200)
+    clean.add_argument("--workers", type=int, default=None)
+    clean.add_argument("--no-cache", action="store_true")
+    clean.add_argument("--full-decode", action="store_true", help="Decode every image at full resolution")
+    clean.add_argument("--link", action="store_true", help="Hardlink valid images instead of copying")
+    clean.add_argument("--no-duplicates", action="store_true", help="Skip duplicate detection")
+    clean.set_defaults(func=cmd_clean)
+
+    return parser
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else list(argv)
+
+    # predict pasa todos sus argumentos (incluido --help) al CLI de inferencia
+    if argv[:1] == ["predict"]:
+        return cmd_predict(argv[1:])
+
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
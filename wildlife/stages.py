@@ -0,0 +1,301 @@
+"""
+Registro de etapas del pipeline.
+
+Cada etapa es una función run(ctx) que importa sus módulos adentro: registrar una
+etapa no importa nada pesado (matplotlib, sklearn, skimage, pandas...), así que
+solo se cargan las librerías de las etapas que realmente se ejecutan.
+"""
+
+# Rutas por defecto del pipeline (las mismas que usaba main.py)
+PATHS = {
+    "raw": "Data/raw/train_features",
+    "clean": "Data/processed/clean",
+    "cropped": "Data/processed/cropped",
+    "resized": "Data/processed/resized",
+    "grayscale": "Data/processed/grayscale",
+    "enhanced": "Data/processed/enhanced",
+    "tensors": "Data/processed/enhanced_tensors",
+    "intermediates": "Data/processed",
+    "store": "Data/features/store",
+    "tiled_store": "Data/features/store_tiled",
+    "features_csv": "Data/features/features_all.csv",
+    "figures": "Results/figures/",
+    "run_reports": "Results/run_reports",
+}
+
+# nombre → (run(ctx), descripción), en el orden en que se ejecutan
+STAGES = {}
+
+# Etapas de una corrida normal (main.py con los switches por defecto)
+DEFAULT_STAGES = ("preprocessing", "features", "stats", "correlation", "pca", "classification", "figures")
+
+# Extractores separados (un CSV cada uno): el análisis usa el CSV unido
+LEGACY_FEATURE_STAGES = ("features_spatial", "features_fft", "features_lbp")
+
+ANALYSIS_STAGES = ("stats", "correlation", "pca", "classification")
+
+
+def register_stage(name, run, help=""):
+    """Agrega (o reemplaza) una etapa. run(ctx) debe importar lo que necesite adentro."""
+    STAGES[name] = (run, help)
+
+
+def stage(name, help=""):
+    """Decorador equivalente a register_stage."""
+    def decorator(run):
+        register_stage(name, run, help)
+        return run
+    return decorator
+
+
+class PipelineContext:
+    """
+    Opciones y rutas compartidas por las etapas de una corrida
+    (lo que antes eran variables locales de main.py).
+    """
+
+    def __init__(self, stages, n_workers=None, use_cache=True, preprocessed_format="files",
+                 save_intermediates=False, stats_streaming=False, pca_streaming=False,
+                 figures="deferred", model_search=False, svm_mode="auto", tiled=False,
+                 paths=None):
+        self.stages = list(stages)
+        self.n_workers = n_workers
+        self.use_cache = use_cache
+        self.preprocessed_format = preprocessed_format
+        self.save_intermediates = save_intermediates
+        self.stats_streaming = stats_streaming
+        self.pca_streaming = pca_streaming
+        # "inline" | "deferred" (se dibujan en la etapa figures) | "off" (solo métricas)
+        self.figures = figures
+        self.model_search = model_search
+        self.svm_mode = svm_mode
+        # Features por tiles multi-escala (features_tiled) en vez de la imagen 256x256
+        self.tiled = tiled
+        self.paths = {**PATHS, **(paths or {})}
+        self._features = None
+        self._moments = None
+
+    @property
+    def legacy_features(self):
+        return any(name in self.stages for name in LEGACY_FEATURE_STAGES)
+
+    @property
+    def features_input(self):
+        # La extracción de features lee del tensor store si existe en esta corrida
+        if self.preprocessed_format in ("tensors", "both"):
+            return self.paths["tensors"]
+        return self.paths["enhanced"]
+
+    @property
+    def features_path(self):
+        # Feature store (Parquet); con los extractores separados se usa el CSV unido
+        if self.legacy_features:
+            return self.paths["features_csv"]
+        return self.paths["tiled_store"] if self.tiled else self.paths["store"]
+
+    def feature_buffer(self):
+        """
+        Tabla de features en un FeatureBuffer float32, cargada una sola vez y compartida
+        por estadísticas, correlación, PCA y clasificación.
+        """
+        if self._features is None:
+            from src.analysis.stats import load_feature_buffer
+            self._features = load_feature_buffer(self.features_path)
+        return self._features
+
+    def features(self):
+        """
+        Tabla de features para estadísticas/correlación:
+        FeatureBuffer, o FeatureMoments si stats_streaming=True.
+        """
+        if not self.stats_streaming:
+            return self.feature_buffer()
+        if self._moments is None:
+            from src.analysis.moments import update_moments
+            self._moments = update_moments(self.features_path, n_workers=self.n_workers)
+        return self._moments
+
+
+def resolve_stages(names):
+    """
+    Valida los nombres y los ordena como en el pipeline.
+    Con extractores separados + análisis se agrega merge_features (une los CSV).
+    """
+    unknown = [name for name in names if name not in STAGES]
+    if unknown:
+        raise ValueError(f"Unknown stages {unknown}. Available: {', '.join(STAGES)}")
+
+    names = set(names)
+    if names & set(LEGACY_FEATURE_STAGES) and names & set(ANALYSIS_STAGES):
+        names.add("merge_features")
+
+    return [name for name in STAGES if name in names]
+
+
+def run_pipeline(ctx, profile=None):
+    """Corre las etapas de ctx en orden, cada una medida en el RunReport."""
+    from src.utils.instrumentation import RunReport
+    from src.visualization.figures import set_figure_mode
+
+    set_figure_mode(ctx.figures)
+    ctx.stages = resolve_stages(ctx.stages)
+    report = RunReport(ctx.paths["run_reports"], profile=profile)
+
+    for name in ctx.stages:
+        run, _ = STAGES[name]
+        with report.stage(name):
+            run(ctx)
+
+    return report.save()
+
+
+# =====================================
+# PREPROCESSING
+# =====================================
+
+@stage("preprocessing", "Fused preprocessing: clean → crop → resize → grayscale → enhance in one pass")
+def _preprocessing(ctx):
+    from src.preprocessing.pipeline import run_preprocessing
+    run_preprocessing(ctx.paths["raw"], ctx.paths["enhanced"],
+                      crop_ratio=0.10, size=(256, 256),
+                      save_intermediates=ctx.save_intermediates,
+                      intermediates_dir=ctx.paths["intermediates"],
+                      output_format=ctx.preprocessed_format, tensor_path=ctx.paths["tensors"],
+                      n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+@stage("cleaning", "Filter corrupted, tiny or blank images")
+def _cleaning(ctx):
+    from src.preprocessing.cleaning import clean_dataset
+    clean_dataset(ctx.paths["raw"], ctx.paths["clean"], n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+@stage("crop", "Crop borders (camera-trap info bars)")
+def _crop(ctx):
+    from src.preprocessing.crop import crop_images
+    crop_images(ctx.paths["clean"], ctx.paths["cropped"], n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+@stage("resize", "Resize to 256x256")
+def _resize(ctx):
+    from src.preprocessing.resize import resize_images
+    resize_images(ctx.paths["cropped"], ctx.paths["resized"], size=(256, 256),
+                  n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+@stage("crop_resize", "Crop + resize in one stage (reduced JPEG decode)")
+def _crop_resize(ctx):
+    from src.preprocessing.resize import crop_resize_images
+    crop_resize_images(ctx.paths["clean"], ctx.paths["resized"], crop_ratio=0.10, size=(256, 256),
+                       n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+@stage("grayscale", "Convert to grayscale")
+def _grayscale(ctx):
+    from src.preprocessing.grayscale import convert_to_grayscale
+    convert_to_grayscale(ctx.paths["resized"], ctx.paths["grayscale"],
+                         n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+@stage("enhancement", "Histogram equalization + CLAHE + normalization")
+def _enhancement(ctx):
+    from src.preprocessing.enhancement import enhance_images
+    enhance_images(ctx.paths["grayscale"], ctx.paths["enhanced"],
+                   n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+# =====================================
+# FEATURES
+# =====================================
+
+@stage("features", "All features (spatial + FFT + LBP) in a single pass into the feature store")
+def _features(ctx):
+    from src.analysis.features import extract_features
+    extract_features(ctx.features_input, ctx.paths["store"], n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+@stage("features_tiled", "Multi-scale tiled features on the full-resolution crops (small animals)")
+def _features_tiled(ctx):
+    from src.analysis.features_tiled import extract_tiled_features
+    extract_tiled_features(ctx.paths["raw"], ctx.paths["tiled_store"],
+                           n_workers=ctx.n_workers, use_cache=ctx.use_cache)
+
+
+@stage("features_spatial", "Spatial features only (CSV)")
+def _features_spatial(ctx):
+    from src.analysis.features_spatial import extract_spatial_features
+    extract_spatial_features(ctx.paths["enhanced"], n_workers=ctx.n_workers)
+
+
+@stage("features_fft", "Frequency features only (CSV)")
+def _features_fft(ctx):
+    from src.analysis.features_fft import extract_frequency_features
+    extract_frequency_features(ctx.paths["enhanced"], n_workers=ctx.n_workers)
+
+
+@stage("features_lbp", "LBP features only (CSV)")
+def _features_lbp(ctx):
+    from src.analysis.features_lbp import extract_lbp_features
+    extract_lbp_features(ctx.paths["enhanced"], n_workers=ctx.n_workers)
+
+
+@stage("merge_features", "Merge the separate feature CSVs (added automatically)")
+def _merge_features(ctx):
+    from src.analysis.stats import load_all_features
+    from src.analysis.feature_buffer import FeatureBuffer
+    merged = load_all_features(output_csv=ctx.paths["features_csv"])
+    ctx._features = FeatureBuffer.from_frame(merged)
+
+
+# =====================================
+# ANALYSIS
+# =====================================
+
+@stage("stats", "Descriptive statistics per species")
+def _stats(ctx):
+    from src.analysis.stats import compute_statistics
+    compute_statistics(ctx.features())
+
+
+@stage("correlation", "Correlation matrix + heatmap")
+def _correlation(ctx):
+    from src.analysis.stats import compute_correlations
+    compute_correlations(ctx.features())
+
+
+@stage("pca", "PCA 2D/3D projections and explained variance")
+def _pca(ctx):
+    from src.analysis.pca import run_pca
+    # En streaming la tabla se recorre por bloques desde el disco
+    features = None if ctx.pca_streaming else ctx.feature_buffer()
+    run_pca(ctx.features_path, streaming=ctx.pca_streaming, features=features)
+
+
+@stage("classification", "Train and evaluate the classifiers (+ model bundle and plots)")
+def _classification(ctx):
+    from src.models.classifier import train_and_evaluate_models
+    from src.preprocessing.pipeline import PREPROCESSING_DEFAULTS
+    # Las features se extrajeron del tensor store (sin pérdida) o de los JPG mejorados
+    storage = "tensors" if ctx.features_input == ctx.paths["tensors"] else "files"
+    preprocessing = {**PREPROCESSING_DEFAULTS, "storage": storage}
+    tiling = None
+    if ctx.tiled:
+        from src.analysis.features_tiled import load_tiling
+        # La configuración con que se extrajo el store (no los valores por defecto)
+        tiling = load_tiling(ctx.paths["tiled_store"])
+    train_and_evaluate_models(ctx.features_path, preprocessing=preprocessing, n_jobs=ctx.n_workers,
+                              search=ctx.model_search, svm_mode=ctx.svm_mode,
+                              features=ctx.feature_buffer(), tiling=tiling)
+
+
+# =====================================
+# FIGURES
+# =====================================
+
+@stage("figures", "Render the deferred figures in parallel (Agg backend)")
+def _figures(ctx):
+    if ctx.figures == "off":
+        print("Figures disabled (metrics only)")
+        return
+    from src.visualization.figures import render_figures
+    render_figures(ctx.paths["figures"], n_workers=ctx.n_workers)